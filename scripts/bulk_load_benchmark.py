@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import db as DB
+import db.queries as q
+from db import DBConnection
+from services.provider import ServiceProvider
+
+BENCH_CHANNEL_ID = 0
+BENCH_USER_DID_BASE = 10 ** 17
+
+
+def user_rows(count: int, offset: int) -> List[Dict[str, Any]]:
+    return [{
+        'did': BENCH_USER_DID_BASE + offset + i,
+        'name': f'bench-user-{offset + i}',
+        'disc': i % 10000,
+        'display_name': None,
+        'roles': None
+    } for i in range(count)]
+
+
+def message_rows(count: int, offset: int, user_id: int, events: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [{
+        'type_id': events['new_message'],
+        'user_id': user_id,
+        'message_id': offset + i,
+        'channel_id': BENCH_CHANNEL_ID,
+        'created_at': datetime.utcnow()
+    } for i in range(count)]
+
+
+def reaction_rows(count: int, user_id: int, msg_event_id: int, events: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [{
+        'type_id': events['new_reaction'],
+        'user_id': user_id,
+        'message_event_id': msg_event_id,
+        'created_at': datetime.utcnow()
+    } for _ in range(count)]
+
+
+async def measure(name: str, rows: int, func: Callable[[], Awaitable[None]]) -> float:
+    start = time.perf_counter()
+    await func()
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f'{name:<40} {rows:>8} rows {elapsed:>8.3f} s {rate:>12.1f} rows/s')
+    return rate
+
+
+async def benchmark(connection: DBConnection, services: ServiceProvider, count: int) -> None:
+    events = services.event.event_type_map
+
+    async def per_row(model_type, rows):
+        for row in rows:
+            await services.event.create(model_type, row)
+
+    # Users
+    await measure('users: session.add per row', count, lambda: per_row(DB.User, user_rows(count, 0)))
+    await measure('users: bulk load', count, lambda: connection.bulk_load(DB.User, user_rows(count, count)))
+    user = await services.user.get_optional(q.select_user_by_did(BENCH_USER_DID_BASE))
+
+    # Message events
+    await measure('message_events: session.add per row', count,
+                  lambda: per_row(DB.MessageEvent, message_rows(count, 0, user.id, events)))
+    await measure('message_events: bulk load', count,
+                  lambda: connection.bulk_load(DB.MessageEvent, message_rows(count, count, user.id, events)))
+    msg = await services.event.get_new_message_event_by_did(0)
+
+    # Reaction events
+    await measure('reaction_events: session.add per row', count,
+                  lambda: per_row(DB.ReactionEvent, reaction_rows(count, user.id, msg.id, events)))
+    await measure('reaction_events: bulk load', count,
+                  lambda: connection.bulk_load(DB.ReactionEvent, reaction_rows(count, user.id, msg.id, events)))
+
+
+async def cleanup(services: ServiceProvider) -> None:
+    async with services.event.session() as session:
+        async with session.begin():
+            await session.execute(q.delete_message_events_by_channel_id(BENCH_CHANNEL_ID))
+            await session.execute(q.delete_all(DB.User).where(DB.User.did >= BENCH_USER_DID_BASE))
+
+
+def main(argv):
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Overlord bulk load benchmark (per-row ORM inserts vs bulk load)')
+    parser.add_argument('-n', '--rows', type=int, default=10000, help='rows per table')
+    parser.add_argument('-u', '--url', type=str, default=os.getenv('DATABASE_ACCESS_URL'), help='database url')
+    args = parser.parse_args(argv[1:])
+
+    if 'sqlite' in args.url:
+        q.MODE = q.MODE_SQLITE
+    if 'postgresql' in args.url:
+        q.MODE = q.MODE_POSTGRESQL
+    connection = DBConnection(args.url)
+    services = ServiceProvider(connection)
+
+    async def run():
+        try:
+            await benchmark(connection, services, args.rows)
+        finally:
+            await cleanup(services)
+
+    asyncio.get_event_loop().run_until_complete(run())
+    return 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
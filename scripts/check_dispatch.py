@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import os
+import sys
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('RESOURCE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'res'))
+
+from overlord.dispatch import ExtensionWorkQueue, OVERFLOW_BLOCK, metered_handler
+
+# name -> coroutine returning error description or None
+CHECKS: Dict[str, Callable] = {}
+
+
+def check(func: Callable) -> Callable:
+    CHECKS[func.__name__] = func
+    return func
+
+
+@check
+async def queued_error_is_reported():
+    reported: List[tuple] = []
+
+    async def on_error(event, *args, **kwargs):
+        reported.append((event, args, sys.exc_info()[0]))
+
+    async def handler(msg):
+        raise ValueError(msg)
+
+    queue = ExtensionWorkQueue('check', 10, 1, OVERFLOW_BLOCK, on_error)
+    await (await queue.submit(metered_handler('on_message', 'check', handler), ('boom',), {}))
+    await queue.close()
+    if reported != [('on_message', ('boom',), ValueError)]:
+        return f'expected on_error(on_message, boom) with ValueError, got {reported}'
+
+
+@check
+async def queue_survives_error_handler_failure():
+    handled = []
+
+    async def on_error(event, *args, **kwargs):
+        raise RuntimeError('error handler failed')
+
+    async def handler(msg):
+        if msg == 'fail':
+            raise ValueError(msg)
+        handled.append(msg)
+
+    queue = ExtensionWorkQueue('check', 10, 1, OVERFLOW_BLOCK, on_error)
+    futures = [await queue.submit(handler, (msg,), {}) for msg in ('fail', 'ok')]
+    await asyncio.gather(*futures)
+    await queue.close()
+    if handled != ['ok']:
+        return f'worker stopped after error handler failure, handled: {handled}'
+
+
+async def run_checks() -> int:
+    failed = 0
+    for name, func in CHECKS.items():
+        error = await func()
+        if error is None:
+            print(f'{name:<40} OK')
+        else:
+            failed += 1
+            print(f'{name:<40} FAIL {error}')
+    return failed
+
+
+def main(argv):
+    return 1 if asyncio.run(run_checks()) else 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import inspect
+import os
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import db as DB
+import db.queries as q
+from db import DBConnection
+
+# Queries expected to read whole (small or target) tables
+FULL_SCAN_QUERIES = {'select_event_types', 'select_stat_types', 'select_user_fingerprint_rows',
+                     'update_all_users_absent', 'delete_all'}
+
+# Helpers composing other queries rather than being executed on their own
+COMPOSING_QUERIES = {'date_to_secs', 'date_to_secs_sqlite', 'date_to_secs_mysql', 'date_to_secs_postgresql'}
+
+# Hot-path queries and the index their plan must use
+EXPECTED_INDEXES = {
+    'select_message_event_by_did': 'cix_message_events_message',
+    'select_message_event_ids_by_dids': 'cix_message_events_message',
+    'select_reaction_event_count_per_user': 'cix_reaction_events_type',
+    'select_user_by_display_name': 'ix_users_display_name',
+    'select_user_by_q_name': 'cix_users_name',
+}
+
+QUERY_PREFIXES = ('select_', 'insert_', 'update_', 'delete_')
+
+STAT_ID = 1
+EVENT_ID = 1
+
+
+def reload_stat_query(select_query: Callable) -> Callable[[], Any]:
+    return lambda: q.insert_user_stat_from_select(select_query(EVENT_ID, [('type_id', STAT_ID)]))
+
+
+# Cases return either a statement or a (statement, executemany params) tuple
+QUERY_CASES: Dict[str, Callable[[], Any]] = {
+    'select_role': lambda: q.select_role('role'),
+    'select_event_type': lambda: q.select_event_type('new_message'),
+    'select_event_types': lambda: q.select_event_types(),
+    'select_stat_types': lambda: q.select_stat_types(),
+    'select_user_by_did': lambda: q.select_user_by_did(1),
+    'select_user_by_display_name': lambda: q.select_user_by_display_name('user'),
+    'select_user_by_q_name': lambda: q.select_user_by_q_name('user', 1),
+    'select_message_event_by_did': lambda: q.select_message_event_by_did(EVENT_ID, 1),
+    'select_message_event_ids_by_dids': lambda: q.select_message_event_ids_by_dids(EVENT_ID, [1, 2, 3]),
+    'select_last_member_event_by_user_did': lambda: q.select_last_member_event_by_user_did(1),
+    'select_last_member_event_by_user_id': lambda: q.select_last_member_event_by_user_id(1),
+    'select_any_last_vc_event_by_user_id': lambda: q.select_any_last_vc_event_by_user_id(1, 1),
+    'select_last_vc_event_by_user_id': lambda: q.select_last_vc_event_by_user_id(1, EVENT_ID, 1),
+    'select_user_stat_by_user_id': lambda: q.select_user_stat_by_user_id(STAT_ID, 1),
+    'select_user_ids_by_dids': lambda: q.select_user_ids_by_dids([1, 2, 3]),
+    'select_user_fingerprint_rows': lambda: q.select_user_fingerprint_rows(),
+    'select_vc_events_updated_at': lambda: q.select_vc_events_updated_at([1, 2, 3]),
+    'select_last_event_time': lambda: q.select_last_event_time(DB.MessageEvent),
+    'select_open_vc_sessions': lambda: q.select_open_vc_sessions(EVENT_ID),
+    'select_user_stat_user_ids': lambda: q.select_user_stat_user_ids(STAT_ID, [1, 2, 3]),
+    'select_membership_time_per_user': reload_stat_query(q.select_membership_time_per_user),
+    'select_message_event_count_per_user': reload_stat_query(q.select_message_event_count_per_user),
+    'select_reaction_event_count_per_user': reload_stat_query(q.select_reaction_event_count_per_user),
+    'select_vc_time_per_user': reload_stat_query(q.select_vc_time_per_user),
+    'insert_user_stat_from_select': reload_stat_query(q.select_message_event_count_per_user),
+    'insert_vc_event': lambda: q.insert_vc_event({'type_id': EVENT_ID, 'user_id': 1, 'channel_id': 1}),
+    'update_all_users_absent': lambda: q.update_all_users_absent(),
+    'update_user_absent': lambda: q.update_user_absent(1),
+    'update_user_absent_by_did': lambda: q.update_user_absent_by_did(1),
+    'update_users_absent_by_dids': lambda: q.update_users_absent_by_dids([1, 2, 3]),
+    'update_inc_user_member_stat': lambda: q.update_inc_user_member_stat(1, STAT_ID),
+    'update_dec_user_member_stat': lambda: q.update_dec_user_member_stat(1, STAT_ID),
+    'update_vc_event_closed': lambda: q.update_vc_event_closed(1, datetime.utcnow()),
+    'update_vc_events_updated_at': lambda: (q.update_vc_events_updated_at(),
+                                            [{'event_id': 1, 'updated_at': datetime.utcnow()}]),
+    'update_add_user_stats': lambda: (q.update_add_user_stats(STAT_ID), [{'stat_user_id': 1, 'delta': 60}]),
+    'delete_absent_users': lambda: q.delete_absent_users(),
+    'delete_message_events_by_channel_id': lambda: q.delete_message_events_by_channel_id(1),
+    'delete_users_stat': lambda: q.delete_users_stat(STAT_ID),
+    'delete_vc_event': lambda: q.delete_vc_event(1),
+    'delete_all': lambda: q.delete_all(DB.UserStat),
+}
+
+
+def capture_statements(connection: DBConnection, query: Any) -> List[Tuple[str, Any]]:
+    statements = []
+    query, params = query if isinstance(query, tuple) else (query, None)
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters[0] if executemany else parameters))
+
+    engine = connection._db_sync_engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        with connection.sync_session() as session:
+            session.execute(query, params)
+            session.rollback()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def query_plan(connection: DBConnection, statement: str, parameters: Any) -> List[str]:
+    raw = connection._db_sync_engine.raw_connection()
+    try:
+        plan = raw.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    finally:
+        raw.close()
+    return [row[-1] for row in plan]
+
+
+def full_scans(details: List[str]) -> List[str]:
+    # Materialized subqueries are scanned in full by design, their own plan rows are checked separately
+    materialized = {d.split(' ', 1)[1] for d in details if d.startswith('MATERIALIZE ')}
+    return [d for d in details if d.startswith('SCAN ') and 'USING' not in d and 'CONSTANT ROW' not in d
+            and d.split(' ', 1)[1] not in materialized]
+
+
+def main(argv):
+    q.MODE = q.MODE_SQLITE
+    connection = DBConnection('sqlite:///:memory:')
+
+    queries = {name for name, _ in inspect.getmembers(q, inspect.isfunction)
+               if name.startswith(QUERY_PREFIXES) and name not in COMPOSING_QUERIES}
+    failed = sorted(name for name in queries if name not in QUERY_CASES)
+    for name in failed:
+        print(f'{name:<40} NO CASE')
+
+    for name in sorted(queries & QUERY_CASES.keys()):
+        details = []
+        for statement, parameters in capture_statements(connection, QUERY_CASES[name]()):
+            details += query_plan(connection, statement, parameters)
+        scans = full_scans(details)
+        index = EXPECTED_INDEXES.get(name)
+        if scans and name not in FULL_SCAN_QUERIES:
+            failed.append(name)
+            print(f'{name:<40} FAIL {"; ".join(scans)}')
+        elif index is not None and not any(f'INDEX {index} ' in d for d in details):
+            failed.append(name)
+            print(f'{name:<40} FAIL {index} not used: {"; ".join(details)}')
+        else:
+            print(f'{name:<40} OK{" (full scan expected)" if scans else ""}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
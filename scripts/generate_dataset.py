@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, select, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import db as DB
+import db.queries as q
+from db import DBConnection
+from db.models.base import Base
+from services.provider import ServiceProvider
+
+DISCORD_EPOCH = datetime(2015, 1, 1)
+
+# Tables populated with explicit primary keys
+GENERATED_MODELS = [DB.Role, DB.User, DB.MemberEvent, DB.MessageEvent, DB.ReactionEvent, DB.VoiceChatEvent]
+
+# Longest generated voice session
+VC_SESSION_LIMIT = 12 * 3600
+
+
+def snowflake(at: datetime, seq: int) -> int:
+    return (int((at - DISCORD_EPOCH).total_seconds() * 1000) << 22) | (seq & 0x3fffff)
+
+
+def zipf_cum_weights(count: int, skew: float) -> List[float]:
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+#####################
+# Dataset generator #
+#####################
+
+class DatasetGenerator(object):
+
+    users: int
+    roles: int
+    messages: int
+    reactions: int
+    vc_sessions: int
+
+    user_ids: List[int]
+    new_message_ids: array
+
+    def __init__(self, args, events: Dict[str, int], role_names: Sequence[str] = ()) -> None:
+        self.rnd = random.Random(args.seed)
+        self.events = events
+        self.users = args.users
+        self.roles = args.roles
+        self.messages = args.messages
+        self.reactions = args.reactions
+        self.vc_sessions = args.vc_sessions
+        self.edit_ratio = args.edit_ratio
+        self.delete_ratio = args.delete_ratio
+        self.reaction_delete_ratio = args.reaction_delete_ratio
+        self.leave_ratio = args.leave_ratio
+        self.storm_share = args.storm_share
+        self.vc_alpha = args.vc_alpha
+        self.end = datetime.strptime(args.end, '%Y-%m-%d')
+        self.start = self.end - timedelta(days=args.days)
+        self.span = (self.end - self.start).total_seconds()
+        self.role_names = list(dict.fromkeys(role_names)) + [f'role-{i}' for i in range(args.roles)]
+        self.role_names = self.role_names[:max(args.roles, len(role_names))]
+        # Activity rank is not correlated with user id
+        self.user_ids = list(range(1, self.users + 1))
+        self.rnd.shuffle(self.user_ids)
+        self._user_weights = zipf_cum_weights(self.users, args.skew)
+        self._channel_ids = [snowflake(self.start, i) for i in range(args.channels)]
+        self._channel_weights = zipf_cum_weights(args.channels, 1.0)
+        self._vc_channel_ids = [snowflake(self.start, args.channels + i) for i in range(args.vc_channels)]
+        self._vc_channel_weights = zipf_cum_weights(args.vc_channels, 1.0)
+        self.new_message_ids = array('q')
+        self._message_seq = 0
+
+    def _pick_users(self, k: int) -> List[int]:
+        return self.rnd.choices(self.user_ids, cum_weights=self._user_weights, k=k)
+
+    def _at(self, offset: float) -> datetime:
+        return self.start + timedelta(seconds=min(offset, self.span))
+
+    def message_time(self, i: int) -> datetime:
+        # Messages are spread evenly, so message time is recomputed instead of stored
+        return self._at(self.span * (i + 0.5) / self.messages)
+
+    ##########
+    # Tables #
+    ##########
+
+    def role_rows(self) -> Iterator[Dict[str, Any]]:
+        for idx, name in enumerate(self.role_names):
+            yield {'id': idx + 1, 'did': snowflake(self.start, 10 ** 6 + idx), 'name': name, 'idx': idx}
+
+    def user_rows(self) -> Iterator[Dict[str, Any]]:
+        rnd = self.rnd
+        role_count = len(self.role_names)
+        for id_ in range(1, self.users + 1):
+            # Members join before activity window, so no message predates its author
+            joined_at = self.start - timedelta(seconds=rnd.expovariate(1 / self.span))
+            left = rnd.random() < self.leave_ratio
+            # Lower roles are much more common
+            roles = ''.join('1' if rnd.random() < 0.5 / (j + 1) else '0' for j in range(role_count))
+            name = f'user-{id_}'
+            yield {
+                'id': id_,
+                'did': snowflake(joined_at, id_),
+                'name': name,
+                'disc': id_ % 10000,
+                'display_name': None if left else (f'nick-{id_}' if rnd.random() < 0.3 else name),
+                'roles': None if left else roles,
+                'created_at': joined_at,
+                'updated_at': joined_at
+            }
+
+    def member_event_rows(self, users: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        id_ = 0
+        for user in users:
+            id_ += 1
+            yield {'id': id_, 'type_id': self.events['member_join'], 'user_id': user['id'],
+                   'created_at': user['created_at']}
+            if user['roles'] is None:
+                id_ += 1
+                yield {'id': id_, 'type_id': self.events['member_leave'], 'user_id': user['id'],
+                       'created_at': self._at(self.rnd.uniform(0, self.span))}
+
+    def message_event_rows(self) -> Iterator[Dict[str, Any]]:
+        rnd = self.rnd
+        id_ = 0
+        batch = 10000
+        for offset in range(0, self.messages, batch):
+            count = min(batch, self.messages - offset)
+            authors = self._pick_users(count)
+            channels = rnd.choices(self._channel_ids, cum_weights=self._channel_weights, k=count)
+            for i in range(count):
+                at = self.message_time(offset + i)
+                id_ += 1
+                self.new_message_ids.append(id_)
+                self._message_seq += 1
+                row = {'type_id': self.events['new_message'], 'user_id': authors[i],
+                       'message_id': snowflake(at, self._message_seq), 'channel_id': channels[i]}
+                yield dict(row, id=id_, created_at=at, updated_at=at)
+                if rnd.random() < self.edit_ratio:
+                    id_ += 1
+                    edited_at = self._at((at - self.start).total_seconds() + rnd.expovariate(1 / 300))
+                    yield dict(row, id=id_, type_id=self.events['message_edit'], created_at=edited_at,
+                               updated_at=edited_at)
+                if rnd.random() < self.delete_ratio:
+                    id_ += 1
+                    deleted_at = self._at((at - self.start).total_seconds() + rnd.expovariate(1 / 3600))
+                    yield dict(row, id=id_, type_id=self.events['message_delete'], created_at=deleted_at,
+                               updated_at=deleted_at)
+
+    def reaction_event_rows(self) -> Iterator[Dict[str, Any]]:
+        rnd = self.rnd
+        if not self.new_message_ids:
+            return
+        # Storms: a small set of messages collects a large share of all reactions
+        storm_messages = [rnd.randrange(self.messages) for _ in range(max(1, self.messages // 10000))]
+        storm_weights = zipf_cum_weights(len(storm_messages), 1.0)
+        id_ = 0
+        batch = 10000
+        for offset in range(0, self.reactions, batch):
+            count = min(batch, self.reactions - offset)
+            users = self._pick_users(count)
+            for i in range(count):
+                if rnd.random() < self.storm_share:
+                    message = storm_messages[bisect(storm_weights, rnd.random() * storm_weights[-1])]
+                    delay = rnd.expovariate(1 / 120)
+                else:
+                    message = rnd.randrange(self.messages)
+                    delay = rnd.expovariate(1 / 3600)
+                reacted_at = self._at((self.message_time(message) - self.start).total_seconds() + delay)
+                id_ += 1
+                row = {'type_id': self.events['new_reaction'], 'user_id': users[i],
+                       'message_event_id': self.new_message_ids[message]}
+                yield dict(row, id=id_, created_at=reacted_at, updated_at=reacted_at)
+                if rnd.random() < self.reaction_delete_ratio:
+                    id_ += 1
+                    removed_at = self._at((reacted_at - self.start).total_seconds() + rnd.expovariate(1 / 60))
+                    yield dict(row, id=id_, type_id=self.events['reaction_delete'], created_at=removed_at,
+                               updated_at=removed_at)
+
+    def vc_event_rows(self) -> Iterator[Dict[str, Any]]:
+        rnd = self.rnd
+        id_ = 0
+        batch = 10000
+        for offset in range(0, self.vc_sessions, batch):
+            count = min(batch, self.vc_sessions - offset)
+            users = self._pick_users(count)
+            channels = rnd.choices(self._vc_channel_ids, cum_weights=self._vc_channel_weights, k=count)
+            for i in range(count):
+                joined = rnd.uniform(0, self.span)
+                # Pareto session length: mostly minutes, sometimes many hours
+                duration = min(60 * rnd.paretovariate(self.vc_alpha), VC_SESSION_LIMIT)
+                joined_at, left_at = self._at(joined), self._at(joined + duration)
+                row = {'user_id': users[i], 'channel_id': channels[i]}
+                # Join row keeps leave time in updated_at, as closed sessions do
+                yield dict(row, id=id_ + 1, type_id=self.events['vc_join'], created_at=joined_at, updated_at=left_at)
+                yield dict(row, id=id_ + 2, type_id=self.events['vc_leave'], created_at=left_at, updated_at=left_at)
+                id_ += 2
+
+
+###########
+# Loading #
+###########
+
+async def load(connection: DBConnection, model_type, rows: Iterator[Dict[str, Any]], batch: int) -> int:
+    count = 0
+    start = time.perf_counter()
+    for chunk in chunks(rows, batch):
+        await connection.bulk_load(model_type, chunk)
+        count += len(chunk)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print(f'{model_type.table_name():<20} {count:>10} rows {elapsed:>9.2f} s {rate:>12.1f} rows/s')
+    return count
+
+
+def reset_sequences(url: str) -> None:
+    # Explicit ids do not advance PostgreSQL serial sequences
+    if 'postgresql' not in url:
+        return
+    engine = create_engine(url.replace('+asyncpg', ''))
+    with engine.begin() as conn:
+        for model_type in GENERATED_MODELS:
+            table = model_type.table_name()
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                              f"COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+    engine.dispose()
+
+
+def config_role_names(path: Optional[str]) -> List[str]:
+    if path is None:
+        return []
+    from main import Configuration
+    config = Configuration(path).config
+    rank = config.extension.rank
+    return config.bot.control.roles + rank.ignored + rank.required + list(rank.role.keys())
+
+
+async def generate(args, connection: DBConnection, services: ServiceProvider) -> None:
+    generator = DatasetGenerator(args, services.event.event_type_map, config_role_names(args.config))
+    started_at = time.perf_counter()
+    await load(connection, DB.Role, generator.role_rows(), args.batch)
+    users = list(generator.user_rows())
+    await load(connection, DB.User, iter(users), args.batch)
+    await load(connection, DB.MemberEvent, generator.member_event_rows(users), args.batch)
+    await load(connection, DB.MessageEvent, generator.message_event_rows(), args.batch)
+    await load(connection, DB.ReactionEvent, generator.reaction_event_rows(), args.batch)
+    await load(connection, DB.VoiceChatEvent, generator.vc_event_rows(), args.batch)
+    reset_sequences(args.url)
+    if args.stats:
+        stats_started_at = time.perf_counter()
+        for name in services.stat.user_stat_type_map:
+            await services.stat.reload_stat(name)
+        print(f'{"user_stats":<20} reloaded in {time.perf_counter() - stats_started_at:.2f} s')
+    print(f'Done in {time.perf_counter() - started_at:.2f} s')
+
+
+def main(argv):
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Overlord synthetic large-guild dataset generator')
+    parser.add_argument('-u', '--url', type=str, default=os.getenv('DATABASE_ACCESS_URL'), help='database url')
+    parser.add_argument('-s', '--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--users', type=int, default=10000, help='users count')
+    parser.add_argument('--roles', type=int, default=20, help='roles count')
+    parser.add_argument('--messages', type=int, default=1000000, help='new message events count')
+    parser.add_argument('--reactions', type=int, default=300000, help='new reaction events count')
+    parser.add_argument('--vc-sessions', type=int, default=100000, help='voice sessions count')
+    parser.add_argument('--channels', type=int, default=30, help='text channels count')
+    parser.add_argument('--vc-channels', type=int, default=8, help='voice channels count')
+    parser.add_argument('--days', type=int, default=365, help='dataset time span in days')
+    parser.add_argument('--end', type=str, default='2021-06-01', help='dataset end date (YYYY-MM-DD)')
+    parser.add_argument('--skew', type=float, default=1.1, help='user activity zipf exponent')
+    parser.add_argument('--vc-alpha', type=float, default=1.2, help='voice session length pareto shape')
+    parser.add_argument('--storm-share', type=float, default=0.3, help='share of reactions in reaction storms')
+    parser.add_argument('--edit-ratio', type=float, default=0.05, help='edited messages ratio')
+    parser.add_argument('--delete-ratio', type=float, default=0.03, help='deleted messages ratio')
+    parser.add_argument('--reaction-delete-ratio', type=float, default=0.05, help='removed reactions ratio')
+    parser.add_argument('--leave-ratio', type=float, default=0.1, help='users left guild ratio')
+    parser.add_argument('-c', '--config', type=str, default=None, help='bot config to take role names from')
+    parser.add_argument('--batch', type=int, default=50000, help='rows per bulk load')
+    parser.add_argument('--reset', action='store_true', help='drop all tables before generation')
+    parser.add_argument('--stats', action='store_true', help='reload user stats after generation')
+    args = parser.parse_args(argv[1:])
+
+    if args.url is None:
+        print('Database url is not set (DATABASE_ACCESS_URL or --url)')
+        return 1
+    if 'sqlite' in args.url:
+        q.MODE = q.MODE_SQLITE
+    if 'postgresql' in args.url:
+        q.MODE = q.MODE_POSTGRESQL
+    if args.reset:
+        engine = create_engine(args.url.replace('+asyncpg', ''))
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+    connection = DBConnection(args.url)
+    services = ServiceProvider(connection)
+
+    with connection.sync_session() as session:
+        if session.execute(select(DB.User.id).limit(1)).first() is not None:
+            print('Database already has users, use --reset to regenerate')
+            return 1
+
+    asyncio.get_event_loop().run_until_complete(generate(args, connection, services))
+    return 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('RESOURCE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'res'))
+
+import db.converters as conv
+from util import parse_control_message
+from util.config import ConfigManager
+from util.extbot import filter_roles, is_role_applied
+from util.resources import STRINGS as R
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, 'scripts', 'micro_benchmark_baseline.json')
+DEFAULT_CONFIG = os.path.join(ROOT_DIR, 'overlord_example.cfg')
+
+# name -> factory returning zero-argument callable
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Callable[[], Any]]], Callable[[], Callable[[], Any]]]:
+    def decorator(factory: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+def run_coroutine(coro) -> Any:
+    # Benchmarked coroutines never suspend, so the event loop is left out of measurement
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError('Benchmarked coroutine suspended')
+
+
+############
+# Fixtures #
+############
+
+ROLE_COUNT = 40
+
+
+def fake_roles() -> List[SimpleNamespace]:
+    return [SimpleNamespace(id=10 ** 17 + i, name=f'role-{i}') for i in range(ROLE_COUNT)]
+
+
+def fake_member(roles: List[SimpleNamespace]) -> SimpleNamespace:
+    return SimpleNamespace(id=10 ** 17 + 1000, name='member', discriminator='0042', display_name='Member Nick',
+                           joined_at=datetime(2021, 1, 1), roles=roles[::4])
+
+
+def role_rows_did_map(roles: List[SimpleNamespace]) -> Dict[int, Dict[str, Any]]:
+    return {role.id: {'did': role.id, 'name': role.name, 'idx': i} for i, role in enumerate(roles)}
+
+
+def load_config():
+    from main import Configuration
+    return Configuration(DEFAULT_CONFIG)
+
+
+class StubStats(object):
+
+    def __init__(self, values: Dict[str, int]) -> None:
+        self.values = values
+
+    async def get(self, user, stat_name: str) -> int:
+        return self.values.get(stat_name, 0)
+
+
+##############
+# Benchmarks #
+##############
+
+@benchmark('conv.role_mask')
+def bench_role_mask():
+    roles = fake_roles()
+    member, role_map = fake_member(roles), role_rows_did_map(roles)
+    return lambda: conv.role_mask(member, role_map)
+
+
+@benchmark('conv.member_row')
+def bench_member_row():
+    roles = fake_roles()
+    member, role_map = fake_member(roles), role_rows_did_map(roles)
+    return lambda: conv.member_row(member, role_map)
+
+
+@benchmark('parse_control_message')
+def bench_parse_control_message():
+    message = SimpleNamespace(content='$ rank-set "Some User#0042" 3 --flag\nsecond line\nthird line')
+    return lambda: parse_control_message('$', message)
+
+
+@benchmark('filter_roles')
+def bench_filter_roles():
+    member = fake_member(fake_roles())
+    names = [f'role-{i}' for i in range(0, ROLE_COUNT, 3)]
+    return lambda: filter_roles(member, names)
+
+
+@benchmark('is_role_applied')
+def bench_is_role_applied():
+    member = fake_member(fake_roles())
+    # Worst case: role is missing, every member role is checked
+    return lambda: is_role_applied(member, 'missing-role')
+
+
+@benchmark('RankingExtension.find_user_rank_name')
+def bench_find_user_rank_name():
+    from extensions import RankingExtension
+    stats = StubStats({'membership': 120, 'new_message_count': 3000, 'delete_message_count': 100, 'vc_time': 36000})
+    services = SimpleNamespace(stat=stats, user=None, role=None)
+    ext = RankingExtension(bot=SimpleNamespace(services=services))
+    ext.config = load_config().config.extension.rank
+    user = SimpleNamespace(id=1)
+    return lambda: run_coroutine(ext.find_user_rank_name(user))
+
+
+@benchmark('XStrings.get')
+def bench_xstrings_get():
+    return lambda: R.MESSAGE.ERROR.INVALID_ARGUMENT
+
+
+@benchmark('XStrings.get (cold)')
+def bench_xstrings_get_cold():
+    def cold():
+        R.switch_lang('en')
+        return R.MESSAGE.ERROR.INVALID_ARGUMENT
+    return cold
+
+
+@benchmark('ConfigManager.set_raw')
+def bench_set_raw():
+    manager = load_config()
+    return lambda: manager.set_raw('bot', 'keep_absent_users = true')
+
+
+@benchmark('ConfigManager.serialize_obj')
+def bench_serialize_obj():
+    raw_dict = load_config().config.to_dict()
+    return lambda: ConfigManager.serialize_obj(raw_dict)
+
+
+@benchmark('ConfigView.construct')
+def bench_config_construct():
+    manager = load_config()
+    raw_dict = manager.raw_dict
+    return lambda: manager.model(raw_dict)
+
+
+@benchmark('ConfigView.to_dict')
+def bench_config_to_dict():
+    config = load_config().config
+    return lambda: config.to_dict()
+
+
+@benchmark('ConfigView.get')
+def bench_config_get():
+    config = load_config().config
+    return lambda: config.get('bot.database.slow_query_ms')
+
+
+@benchmark('ConfigView rank access')
+def bench_config_rank_access():
+    ranks = load_config().config.extension.rank.role
+
+    def access():
+        # Per-message access pattern of RankingExtension.find_user_rank_name
+        for rank in ranks.values():
+            _ = rank.weight, rank.membership, rank.messages, rank.vc
+    return access
+
+
+@benchmark('OverlordCommand._convert_argv')
+def bench_convert_argv():
+    from overlord.command import OverlordCommand
+
+    async def cmd(ext, msg, count: int, ratio: float, name: str, rest):
+        pass
+
+    command = OverlordCommand(cmd, 'bench')
+    msg = SimpleNamespace(channel=None)
+    argv = ['42', '0.5', 'name', 'rest']
+    return lambda: run_coroutine(command._convert_argv(msg, None, argv))
+
+
+##########
+# Runner #
+##########
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> float:
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # Scale number of calls up to requested time per repetition
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-6:
+        return f'{seconds * 1e9:.1f} ns'
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.2f} us'
+    return f'{seconds * 1e3:.2f} ms'
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f).get('results', {})
+
+
+def save_baseline(path: str, results: Dict[str, float]) -> None:
+    data = {
+        'python': platform.python_version(),
+        'machine': f'{platform.system()} {platform.machine()}',
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Overlord hot path micro-benchmarks')
+    parser.add_argument('-k', '--filter', type=str, default=None, help='run benchmarks containing substring')
+    parser.add_argument('-b', '--baseline', type=str, default=DEFAULT_BASELINE, help='baseline file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25, help='allowed slowdown ratio over baseline')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='repetitions (best one is taken)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per repetition')
+    parser.add_argument('--save', action='store_true', help='store results as new baseline')
+    args = parser.parse_args(argv[1:])
+
+    baseline = load_baseline(args.baseline)
+    results: Dict[str, float] = {}
+    regressions = []
+    print(f'{"benchmark":<40} {"time":>12} {"baseline":>12} {"change":>8}')
+    for name, factory in BENCHMARKS.items():
+        if args.filter is not None and args.filter not in name:
+            continue
+        results[name] = value = measure(factory(), args.repeat, args.min_time)
+        base: Optional[float] = baseline.get(name)
+        if base is None:
+            print(f'{name:<40} {format_time(value):>12} {"-":>12} {"-":>8}')
+            continue
+        change = value / base - 1
+        mark = ''
+        if change > args.threshold:
+            regressions.append(name)
+            mark = ' REGRESSION'
+        print(f'{name:<40} {format_time(value):>12} {format_time(base):>12} {change:>+8.1%}{mark}')
+
+    if args.save:
+        # Partial runs update only measured entries
+        save_baseline(args.baseline, dict(baseline, **results))
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed over {args.threshold:.0%}: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
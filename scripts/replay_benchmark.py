@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate, chain
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+# Work dir is changed during run, resources path must be absolute
+os.environ['RESOURCE_PATH'] = os.path.abspath(os.getenv('RESOURCE_PATH') or
+                                              os.path.join(os.path.dirname(os.path.dirname(__file__)), 'res'))
+
+import discord
+from discord.user import ClientUser
+from sqlalchemy import create_engine, event
+
+import db.queries as q
+from db import DBConnection
+from db.models.base import Base
+from services.provider import ServiceProvider
+from util.recorder import read_capture
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG = os.path.join(ROOT_DIR, 'overlord_example.cfg')
+
+SNOWFLAKE_BASE = 700000000000000000
+BASE_TIME = datetime(2021, 1, 1)
+
+# (seconds since stream start, gateway event name, raw payload)
+GatewayEvent = Tuple[float, str, Dict[str, Any]]
+
+# Synthetic event mix (relative weights)
+EVENT_MIX = {
+    'MESSAGE_CREATE': 60,
+    'MESSAGE_UPDATE': 8,
+    'MESSAGE_DELETE': 4,
+    'MESSAGE_REACTION_ADD': 14,
+    'MESSAGE_REACTION_REMOVE': 3,
+    'VOICE_STATE_UPDATE': 9,
+    'GUILD_MEMBER_UPDATE': 2,
+}
+
+# Guild state events, fed before ready and not measured
+STATE_EVENTS = ('READY', 'GUILD_CREATE', 'GUILD_MEMBERS_CHUNK')
+
+
+def iso(dt: datetime) -> str:
+    return dt.isoformat() + '+00:00'
+
+
+def zipf_cum_weights(count: int, skew: float) -> List[float]:
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+#########################
+# Synthetic guild model #
+#########################
+
+class SyntheticGuild(object):
+
+    guild_id: int
+    bot_payload: Dict[str, Any]
+    members: List[Dict[str, Any]]
+    roles: List[Dict[str, Any]]
+    text_channels: List[Dict[str, Any]]
+    voice_channels: List[Dict[str, Any]]
+
+    def __init__(self, config, members: int, seed: int, skew: float) -> None:
+        self._rnd = random.Random(seed)
+        self._next_id = SNOWFLAKE_BASE
+        self._skew = skew
+        self.guild_id = self.snowflake()
+        bot_config = config.bot
+        rank_config = config.extension.rank
+        # Roles referenced by config must exist
+        role_names = list(dict.fromkeys(bot_config.control.roles + rank_config.ignored + rank_config.required +
+                                        list(rank_config.role.keys())))
+        self.roles = [self.role_payload(self.guild_id, '@everyone', 0)]
+        self.roles += [self.role_payload(self.snowflake(), name, i + 1) for i, name in enumerate(role_names)]
+        self._rank_roles = [r['id'] for r in self.roles if r['name'] in rank_config.role]
+        self._required_roles = [r['id'] for r in self.roles if r['name'] in rank_config.required]
+        # Channels, control and log channels come from config
+        special = {bot_config.control.channel, config.logger.discord.channel} - {0}
+        self.text_channels = [self.channel_payload(cid, f'control-{i}', 0, i) for i, cid in enumerate(special)]
+        self._special_channel_count = len(self.text_channels)
+        self.text_channels += [self.channel_payload(self.snowflake(), f'text-{i}', 0, i + 10) for i in range(8)]
+        self.voice_channels = [self.channel_payload(self.snowflake(), f'voice-{i}', 2, i) for i in range(4)]
+        # Members, the first one is maintainer
+        self.bot_payload = self.member_payload(self.snowflake(), 'overlord', bot=True)
+        self.members = [self.member_payload(self.snowflake(), f'member-{i}') for i in range(members)]
+        self.members[0]['roles'].append(self.roles[1]['id'])
+        self._member_weights = zipf_cum_weights(members, skew)
+
+    def snowflake(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    @property
+    def maintainer_id(self) -> int:
+        return int(self.members[0]['user']['id'])
+
+    def role_payload(self, role_id: int, name: str, position: int) -> Dict[str, Any]:
+        return {'id': str(role_id), 'name': name, 'position': position, 'permissions': '0', 'color': 0,
+                'hoist': False, 'managed': False, 'mentionable': False}
+
+    def channel_payload(self, channel_id: int, name: str, type_: int, position: int) -> Dict[str, Any]:
+        return {'id': str(channel_id), 'guild_id': str(self.guild_id), 'name': name, 'type': type_,
+                'position': position, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None}
+
+    def member_payload(self, user_id: int, name: str, bot: bool = False) -> Dict[str, Any]:
+        roles = [] if bot else self._required_roles + self._rnd.sample(self._rank_roles, min(1, len(self._rank_roles)))
+        return {'user': {'id': str(user_id), 'username': name, 'discriminator': f'{user_id % 10000:04d}',
+                         'avatar': None, 'bot': bot},
+                'roles': roles, 'joined_at': iso(BASE_TIME - timedelta(days=self._rnd.randint(1, 1000))),
+                'nick': None, 'deaf': False, 'mute': False}
+
+    def guild_payload(self) -> Dict[str, Any]:
+        return {'id': str(self.guild_id), 'name': 'Overlord Benchmark', 'owner_id': self.members[0]['user']['id'],
+                'roles': self.roles, 'channels': self.text_channels + self.voice_channels,
+                'members': self.members + [self.bot_payload], 'member_count': len(self.members) + 1,
+                'voice_states': [], 'emojis': [], 'features': [], 'afk_channel_id': None, 'large': True}
+
+    def ready_payload(self) -> Dict[str, Any]:
+        return {'v': 8, 'user': dict(self.bot_payload['user'], verified=True, mfa_enabled=False),
+                'guilds': [{'id': str(self.guild_id), 'unavailable': True}], 'session_id': 'benchmark'}
+
+    ################
+    # Event stream #
+    ################
+
+    def _pick_member(self) -> Dict[str, Any]:
+        return self.members[bisect(self._member_weights, self._rnd.random() * self._member_weights[-1])]
+
+    def _member_data(self, member: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in member.items() if k != 'user'}
+
+    def message_payload(self, message_id: int, channel_id: str, member: Dict[str, Any], at: datetime) \
+            -> Dict[str, Any]:
+        return {'id': str(message_id), 'channel_id': channel_id, 'guild_id': str(self.guild_id),
+                'author': member['user'], 'member': self._member_data(member), 'content': f'message {message_id}',
+                'timestamp': iso(at), 'edited_timestamp': None, 'tts': False, 'mention_everyone': False,
+                'mentions': [], 'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0}
+
+    def stream(self, count: int, rate: float) -> Iterator[GatewayEvent]:
+        rnd = self._rnd
+        names = list(EVENT_MIX.keys())
+        mix = list(accumulate(EVENT_MIX.values()))
+        channels = [c['id'] for c in self.text_channels[self._special_channel_count:]]
+        voice = [c['id'] for c in self.voice_channels]
+        messages: List[Tuple[int, str]] = []
+        in_voice: Dict[str, str] = {}
+        reacted: List[Tuple[Dict[str, Any], int, str]] = []
+        guild_id = str(self.guild_id)
+        yield 0.0, 'READY', self.ready_payload()
+        yield 0.0, 'GUILD_CREATE', self.guild_payload()
+        t = 0.0
+        for _ in range(count):
+            # Poisson arrivals
+            t += rnd.expovariate(rate)
+            at = BASE_TIME + timedelta(seconds=t)
+            name = names[bisect(mix, rnd.random() * mix[-1])]
+            member = self._pick_member()
+            if name != 'MESSAGE_CREATE' and name.startswith('MESSAGE') and not messages:
+                name = 'MESSAGE_CREATE'
+            if name == 'MESSAGE_CREATE':
+                message_id, channel_id = self.snowflake(), rnd.choice(channels)
+                messages.append((message_id, channel_id))
+                yield t, name, self.message_payload(message_id, channel_id, member, at)
+            elif name == 'MESSAGE_UPDATE':
+                message_id, channel_id = messages[-1 - min(int(rnd.expovariate(0.05)), len(messages) - 1)]
+                yield t, name, {'id': str(message_id), 'channel_id': channel_id, 'guild_id': guild_id,
+                                'content': 'edited', 'edited_timestamp': iso(at)}
+            elif name == 'MESSAGE_DELETE':
+                message_id, channel_id = messages.pop(rnd.randrange(len(messages)))
+                yield t, name, {'id': str(message_id), 'channel_id': channel_id, 'guild_id': guild_id}
+            elif name == 'MESSAGE_REACTION_ADD':
+                # Reaction storms hit the latest messages
+                message_id, channel_id = messages[-1 - min(int(rnd.expovariate(0.5)), len(messages) - 1)]
+                reacted.append((member, message_id, channel_id))
+                yield t, name, {'user_id': member['user']['id'], 'channel_id': channel_id,
+                                'message_id': str(message_id), 'guild_id': guild_id,
+                                'emoji': {'id': None, 'name': '👍'}, 'member': member}
+            elif name == 'MESSAGE_REACTION_REMOVE':
+                if not reacted:
+                    continue
+                member, message_id, channel_id = reacted.pop(rnd.randrange(len(reacted)))
+                yield t, name, {'user_id': member['user']['id'], 'channel_id': channel_id,
+                                'message_id': str(message_id), 'guild_id': guild_id,
+                                'emoji': {'id': None, 'name': '👍'}}
+            elif name == 'VOICE_STATE_UPDATE':
+                user_id = member['user']['id']
+                channel_id = None if user_id in in_voice else rnd.choice(voice)
+                if channel_id is None:
+                    del in_voice[user_id]
+                else:
+                    in_voice[user_id] = channel_id
+                yield t, name, {'guild_id': guild_id, 'channel_id': channel_id, 'user_id': user_id,
+                                'session_id': 'benchmark', 'deaf': False, 'mute': False, 'self_deaf': False,
+                                'self_mute': False, 'self_video': False, 'suppress': False, 'member': member}
+            elif name == 'GUILD_MEMBER_UPDATE':
+                member['nick'] = f'nick-{rnd.randrange(1000)}'
+                yield t, name, dict(self._member_data(member), guild_id=guild_id, user=member['user'])
+
+
+#############
+# Fake REST #
+#############
+
+class FakeResponse(object):
+    status = 404
+    reason = 'Not Found'
+
+
+class FakeDiscordREST(object):
+
+    calls: int
+    latency: float
+    me: Optional[Dict[str, Any]]
+    members: Dict[int, Dict[str, Any]]
+    channels: Dict[int, Dict[str, Any]]
+    messages: Dict[int, Dict[str, Any]]
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.calls = 0
+        self.latency = latency
+        self.me = None
+        self.members = {}
+        self.channels = {}
+        self.messages = {}
+        self._next_id = SNOWFLAKE_BASE * 2
+
+    # REST answers are derived from the gateway payloads passing through
+    def observe(self, name: str, data: Dict[str, Any]) -> None:
+        if name == 'READY':
+            self.me = data['user']
+        elif name == 'GUILD_CREATE':
+            for channel in data.get('channels', []):
+                self.channels[int(channel['id'])] = dict(channel, guild_id=data['id'])
+            for member in data.get('members', []):
+                self.members[int(member['user']['id'])] = member
+        elif name == 'GUILD_MEMBERS_CHUNK':
+            for member in data.get('members', []):
+                self.members[int(member['user']['id'])] = member
+        elif name in ('GUILD_MEMBER_ADD', 'GUILD_MEMBER_UPDATE'):
+            self.members[int(data['user']['id'])] = {k: v for k, v in data.items() if k != 'guild_id'}
+        elif name == 'GUILD_MEMBER_REMOVE':
+            self.members.pop(int(data['user']['id']), None)
+        elif name == 'MESSAGE_CREATE':
+            self.messages[int(data['id'])] = data
+        elif name == 'MESSAGE_DELETE':
+            self.messages.pop(int(data['id']), None)
+        elif name in ('CHANNEL_CREATE', 'CHANNEL_UPDATE'):
+            self.channels[int(data['id'])] = data
+
+    @staticmethod
+    def _route_params(route) -> Dict[str, str]:
+        template = route.path.split('/')
+        actual = route.url[len(route.BASE):].split('?')[0].split('/')
+        return {t[1:-1]: a for t, a in zip(template, actual) if t.startswith('{')}
+
+    def _not_found(self) -> None:
+        raise discord.NotFound(FakeResponse(), 'Unknown')
+
+    def _message(self, channel_id: str, content: Any) -> Dict[str, Any]:
+        self._next_id += 1
+        return {'id': str(self._next_id), 'channel_id': channel_id, 'author': self.me, 'content': content or '',
+                'timestamp': iso(datetime.utcnow()), 'edited_timestamp': None, 'tts': False,
+                'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [], 'embeds': [],
+                'pinned': False, 'type': 0}
+
+    async def request(self, route, **kwargs) -> Any:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = self._route_params(route)
+        key = (route.method, route.path)
+        if key == ('GET', '/guilds/{guild_id}/members/{member_id}'):
+            member = self.members.get(int(params['member_id']))
+            return member if member is not None else self._not_found()
+        if key == ('GET', '/guilds/{guild_id}/members'):
+            query = kwargs.get('params', {})
+            after = int(query.get('after') or 0)
+            ids = sorted(i for i in self.members if i > after)[:query.get('limit', 1000)]
+            return [self.members[i] for i in ids]
+        if key == ('GET', '/channels/{channel_id}'):
+            channel = self.channels.get(int(params['channel_id']))
+            return channel if channel is not None else self._not_found()
+        if key == ('GET', '/channels/{channel_id}/messages/{message_id}'):
+            message = self.messages.get(int(params['message_id']))
+            return message if message is not None else self._not_found()
+        if key == ('POST', '/users/@me/channels'):
+            self._next_id += 1
+            recipient = self.members[int(kwargs['json']['recipient_id'])]['user']
+            return {'id': str(self._next_id), 'type': 1, 'recipients': [recipient], 'last_message_id': None}
+        if key == ('POST', '/channels/{channel_id}/messages'):
+            payload = kwargs.get('json') or {}
+            return self._message(params['channel_id'], payload.get('content'))
+        if key == ('PATCH', '/channels/{channel_id}/messages/{message_id}'):
+            return self._message(params['channel_id'], (kwargs.get('json') or {}).get('content'))
+        return {}
+
+
+###################
+# Offline harness #
+###################
+
+class ReplayHarness(object):
+
+    bot: Any
+    rest: FakeDiscordREST
+    queries: int
+    latencies: Dict[str, List[float]]
+    query_counts: Dict[str, int]
+
+    def __init__(self, bot, rest: FakeDiscordREST, connection: DBConnection) -> None:
+        self.bot = bot
+        self.rest = rest
+        self.queries = 0
+        self.latencies = {}
+        self.query_counts = {}
+        self._scheduled = []
+        # Collect handler tasks spawned by dispatch
+        schedule_event = bot._schedule_event
+
+        def schedule(coro, event_name, *args, **kwargs):
+            task = schedule_event(coro, event_name, *args, **kwargs)
+            self._scheduled.append(task)
+            return task
+
+        bot._schedule_event = schedule
+        bot.http.request = rest.request
+        bot._meter_http()
+        engine = connection._db_sync_engine if connection._wrap_sync else connection._db_async_engine.sync_engine
+        event.listen(engine, 'before_cursor_execute', self._count_query)
+
+    def _count_query(self, *args) -> None:
+        self.queries += 1
+
+    def load_state(self, name: str, data: Dict[str, Any]) -> None:
+        # Ready machinery (chunking, delayed ready) needs a live gateway, state is built directly
+        state = self.bot._connection
+        if name == 'READY':
+            state.user = ClientUser(state=state, data=data['user'])
+        elif name == 'GUILD_CREATE':
+            state._add_guild_from_data(data)
+
+    async def ready(self) -> float:
+        started_at = time.perf_counter()
+        await self.bot.on_ready()
+        return time.perf_counter() - started_at
+
+    def _feed(self, name: str, data: Dict[str, Any]) -> List[asyncio.Future]:
+        self.rest.observe(name, data)
+        if name in ('READY', 'GUILD_CREATE'):
+            self.load_state(name, data)
+            return []
+        parser = self.bot._connection.parsers.get(name)
+        if parser is None:
+            return []
+        self._scheduled = []
+        parser(data)
+        return self._scheduled
+
+    # With queued dispatch mode latency covers only the gateway handler up to queue submission
+    async def _measure(self, name: str, tasks: List[asyncio.Future], started_at: float, queries: int) -> None:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started_at)
+        self.query_counts[name] = self.query_counts.get(name, 0) + self.queries - queries
+
+    async def replay(self, events: Iterator[GatewayEvent], speed: float = 0.0, concurrency: int = 1) -> float:
+        # speed 0 replays as fast as possible, otherwise stream time is scaled by 1/speed
+        pending: Set[asyncio.Future] = set()
+        started_at = time.perf_counter()
+        origin = None
+        for t, name, data in events:
+            origin = t if origin is None else origin
+            if speed > 0:
+                delay = started_at + (t - origin) / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            fed_at, queries = time.perf_counter(), self.queries
+            tasks = self._feed(name, data)
+            if name in STATE_EVENTS:
+                continue
+            # Queries are attributed exactly only with concurrency 1
+            pending.add(asyncio.ensure_future(self._measure(name, tasks, fed_at, queries)))
+            if len(pending) >= concurrency:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            await asyncio.wait(pending)
+        return time.perf_counter() - started_at
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        def summary(values: List[float], queries: int) -> Dict[str, float]:
+            values = sorted(values)
+            return {
+                'count': len(values),
+                'events_per_sec': len(values) / elapsed if elapsed > 0 else 0.0,
+                'p50_ms': values[int(0.5 * (len(values) - 1))] * 1000 if values else 0.0,
+                'p99_ms': values[int(0.99 * (len(values) - 1))] * 1000 if values else 0.0,
+                'queries_per_event': queries / len(values) if values else 0.0,
+            }
+        result = {name: summary(values, self.query_counts[name]) for name, values in sorted(self.latencies.items())}
+        everything = [v for values in self.latencies.values() for v in values]
+        result['total'] = summary(everything, sum(self.query_counts.values()))
+        result['total']['rest_calls'] = self.rest.calls
+        return result
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f'{"event":<26} {"count":>8} {"events/s":>10} {"p50 ms":>8} {"p99 ms":>8} {"queries/event":>14}')
+    for name, s in report.items():
+        print(f'{name:<26} {s["count"]:>8} {s["events_per_sec"]:>10.1f} {s["p50_ms"]:>8.2f} {s["p99_ms"]:>8.2f} '
+              f'{s["queries_per_event"]:>14.2f}')
+    print(f'REST calls: {report["total"]["rest_calls"]}')
+
+
+def make_bot(config_path: str, url: str, reset: bool, guild_id: int, maintainer_id: int):
+    from main import Configuration
+    from overlord.bot import Overlord
+    from extensions import UtilityExtension, RankingExtension, ConfigExtension, StatsExtension
+
+    os.environ['DISCORD_TOKEN'] = 'offline'
+    os.environ['DISCORD_GUILD'] = str(guild_id)
+    os.environ['MAINTAINER_DISCORD_ID'] = str(maintainer_id)
+    if 'sqlite' in url:
+        q.MODE = q.MODE_SQLITE
+    if 'postgresql' in url:
+        q.MODE = q.MODE_POSTGRESQL
+    if reset:
+        engine = create_engine(url.replace('+asyncpg', ''))
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+    connection = DBConnection(url)
+    bot = Overlord(Configuration(config_path), ServiceProvider(connection))
+    bot.extend(UtilityExtension(bot=bot))
+    bot.extend(ConfigExtension(bot=bot))
+    bot.extend(StatsExtension(bot=bot))
+    bot.extend(RankingExtension(bot=bot, priority=1))
+    return bot, connection
+
+
+async def run_benchmark(args, work_dir: str) -> Dict[str, Any]:
+    from main import Configuration
+    config_path = os.path.join(work_dir, 'overlord.cfg')
+    shutil.copy(args.config, config_path)
+    manager = Configuration(config_path)
+    # Replayed events must not be captured again
+    manager.config.bot.recorder.file = ''
+    manager.save()
+    if args.capture:
+        events = read_capture(args.capture)
+        # Guild and maintainer are taken from captured guild
+        initial = []
+        for item in events:
+            initial.append(item)
+            if item[1] == 'GUILD_CREATE':
+                break
+        else:
+            raise ValueError(f'No GUILD_CREATE in capture: {args.capture}')
+        guild = initial[-1][2]
+        guild_id, maintainer_id = int(guild['id']), args.maintainer or int(guild['owner_id'])
+        members = guild.get('member_count', 0)
+        events = chain(initial, events)
+    else:
+        world = SyntheticGuild(manager.config, args.members, args.seed, args.skew)
+        guild_id, maintainer_id, members = world.guild_id, world.maintainer_id, args.members
+        events = world.stream(args.events, args.rate)
+    url = args.url or f'sqlite:///{os.path.join(work_dir, "benchmark.db")}'
+    bot, connection = make_bot(config_path, url, args.reset, guild_id, maintainer_id)
+    logging.getLogger().setLevel(args.log_level)
+    harness = ReplayHarness(bot, FakeDiscordREST(args.rest_latency / 1000), connection)
+    # Guild state goes first
+    item = next(events, None)
+    while item is not None and item[1] in STATE_EVENTS:
+        harness._feed(*item[1:])
+        item = next(events, None)
+    events = chain([item] if item is not None else [], events)
+    if not args.tasks:
+        # Periodic extension tasks skew handler latency, keep handlers only
+        for ext in bot._extensions:
+            ext._tasks = []
+    ready_time = await harness.ready()
+    print(f'on_ready: {ready_time:.2f} s ({members} members)')
+    elapsed = await harness.replay(events, args.speed, args.concurrency)
+    await bot.logout()
+    return harness.report(elapsed)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Overlord offline gateway replay benchmark')
+    parser.add_argument('--capture', type=str, default=None, help='replay recorded capture instead of synthetic stream')
+    parser.add_argument('--maintainer', type=int, default=0, help='maintainer id for capture (guild owner by default)')
+    parser.add_argument('-n', '--events', type=int, default=5000, help='synthetic events count')
+    parser.add_argument('-m', '--members', type=int, default=500, help='synthetic guild members')
+    parser.add_argument('-s', '--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--skew', type=float, default=1.1, help='member activity zipf exponent')
+    parser.add_argument('--rate', type=float, default=50.0, help='synthetic stream events per second')
+    parser.add_argument('--speed', type=float, default=0.0, help='replay speed multiplier (0 - max speed, 1 - recorded pace)')
+    parser.add_argument('--concurrency', type=int, default=1, help='events in flight')
+    parser.add_argument('--tasks', action='store_true', help='keep periodic extension tasks running')
+    parser.add_argument('--rest-latency', type=float, default=0.0, help='fake REST latency (ms)')
+    parser.add_argument('-u', '--url', type=str, default=None, help='database url (temporary sqlite by default)')
+    parser.add_argument('--reset', action='store_true', help='drop all tables before run')
+    parser.add_argument('-c', '--config', type=str, default=DEFAULT_CONFIG, help='bot config')
+    parser.add_argument('--log-level', type=str, default='WARNING', help='root log level during replay')
+    parser.add_argument('--json', type=str, default=None, help='write report to json file')
+    args = parser.parse_args(argv[1:])
+    args.config = os.path.abspath(args.config)
+    if args.capture:
+        args.capture = os.path.abspath(args.capture)
+
+    work_dir = tempfile.mkdtemp(prefix='overlord-bench-')
+    cwd = os.getcwd()
+    # Bot log files land in work dir
+    os.chdir(work_dir)
+    try:
+        report = asyncio.get_event_loop().run_until_complete(run_benchmark(args, work_dir))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    res = main(sys.argv)
+    exit(res)
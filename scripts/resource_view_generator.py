@@ -69,8 +69,11 @@ def gen_header() -> str:
     return '''\
 __author__ = None
     
+import hashlib
+import marshal
 import os.path
-from typing import Dict
+import sys
+from typing import Dict, Optional
 import xml.etree.ElementTree as ET
 from .exceptions import MissingResourceException
 
@@ -78,6 +81,65 @@ from .exceptions import MissingResourceException
 def res_path(local_path: str):
     path = os.getenv('RESOURCE_PATH')
     return os.path.join(path, local_path)
+
+
+def cache_dir() -> Optional[str]:
+    # Derived data only, safe to delete
+    default_root = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.getenv('CACHE_PATH') or os.path.join(default_root, 'overlord')
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Grammar cache is a pickle, directory writable by anyone else is not trusted
+    if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+        return None
+    return path
+
+
+def cache_path(local_path: str) -> Optional[str]:
+    path = cache_dir()
+    return path and os.path.join(path, local_path)
+
+
+def build_string_index(path: str) -> Dict[str, Dict[str, str]]:
+    # lang -> 'section.type.name' -> text
+    index = {}
+    for section in ET.parse(path).getroot():
+        for string in section:
+            key = f'{section.tag}.{string.attrib["type"]}.{string.attrib["name"]}'
+            index.setdefault(string.attrib['lang'], {})[key] = string.text
+    return index
+
+
+def load_string_index(path: str, cache: bool = True) -> Dict[str, Dict[str, str]]:
+    if not cache:
+        return build_string_index(path)
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    source = [path, stat.st_mtime_ns, stat.st_size]
+    path_hash = hashlib.sha1(path.encode()).hexdigest()[:12]
+    cache_file = cache_path(f'{os.path.basename(path)}.{path_hash}.{sys.implementation.cache_tag}.marshal')
+    if cache_file is None:
+        return build_string_index(path)
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_source, index = marshal.load(f)
+        if cached_source == source:
+            return index
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    index = build_string_index(path)
+    # Cache is an optimization only, read-only locations are fine
+    try:
+        tmp_file = f'{cache_file}.{os.getpid()}'
+        with open(tmp_file, 'wb') as f:
+            marshal.dump([source, index], f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return index
 '''
 
 
@@ -93,9 +155,11 @@ class TypeViewGenerator(CodeGenerator):
     _code: List[str]
     _class_name: str
     _property_name: str
+    _section_name: str
     _type_name: str
 
-    def __init__(self, type_name: str, declaration: List[str]):
+    def __init__(self, section_name: str, type_name: str, declaration: List[str]):
+        self._section_name = section_name
         self._type_name = type_name
         self._strings = declaration
         self._code = []
@@ -116,7 +180,7 @@ class TypeViewGenerator(CodeGenerator):
                           ''
                       ] + indent_all(
             gen_function(
-                '__init__', args=['self', 'section'], body=['self._section = section']
+                '__init__', args=['self', 'section'], body=['self._section = section', 'self._res = section._res']
             )
         ) + ['']
 
@@ -129,11 +193,13 @@ class TypeViewGenerator(CodeGenerator):
         ) + ['']
 
     def _gen_property(self, name: str) -> None:
+        # Keys are resolved at generation time, lookup is a single dict access
+        key = f'{self._section_name}.{self._type_name}.{name}'
         self._code += indent_all(
             ['@property'] +
             gen_function(
                 gen_property_name(name), args=['self'], ret_type=str,
-                body=[f'return self.get("{name}")']
+                body=[f'return self._res._strings.get("{key}", "{key}")']
             )
         ) + ['']
 
@@ -169,7 +235,7 @@ class SectionViewGenerator(CodeGenerator):
     def __init__(self, parent_class_name: str, section_name: str, declaration: Dict[str, List[str]]):
         self._code = []
         self._section_name = section_name
-        self._types = [TypeViewGenerator(k, v) for k, v in declaration.items()]
+        self._types = [TypeViewGenerator(section_name, k, v) for k, v in declaration.items()]
         self._class_name = SectionViewGenerator._gen_section_class_name(self._section_name)
         self._property_name = SectionViewGenerator._gen_section_property_name(self._section_name)
         self._parent_class_name = parent_class_name
@@ -280,8 +346,8 @@ class StringResourceViewGenerator(CodeGenerator):
     def _gen_private_fields(self):
         self._code += indent_all([
             '_lang: str',
-            '_root: ET.Element',
-            '_path_cache: Dict[str, str]'
+            '_index: Dict[str, Dict[str, str]]',
+            '_strings: Dict[str, str]'
         ])
 
     def _gen_class_name(self) -> None:
@@ -289,12 +355,12 @@ class StringResourceViewGenerator(CodeGenerator):
 
     def _gen_constructor(self) -> None:
         self._code += indent_all(
-            gen_function('__init__', args=['self', 'lang: str = \'en\''],
+            gen_function('__init__', args=['self', 'lang: str = \'en\'', 'cache: bool = True'],
                          body=[
                              f'self._strings_path = res_path("{self._name}.xml")',
                              'if not os.path.isfile(self._strings_path):',
                              indent(f'raise MissingResourceException(self._strings_path, "{self._name}.xml")'),
-                             'self._root = ET.parse(self._strings_path).getroot()'
+                             'self._index = load_string_index(self._strings_path, cache)'
                          ] + [
                              f'self.{s.property_name} = {self._class_name}.{s.class_name}(self)' for s in self._sections
                          ] + [
@@ -304,20 +370,16 @@ class StringResourceViewGenerator(CodeGenerator):
 
     def _gen_switch_lang(self):
         self._code += indent_all(
-            gen_function('switch_lang', args=['self', 'lang: str'], body=['self._lang = lang', 'self._path_cache = {}'])
+            gen_function('switch_lang', args=['self', 'lang: str'],
+                         body=['self._lang = lang', 'self._strings = self._index.get(lang, {})'])
         )
 
     def _gen_get(self):
         self._code += indent_all(gen_function(
             'get', args=['self', 'section_name', 'type_name', 'string_name'], ret_type=str,
             body=[
-                'path = \'.\'.join([section_name, type_name, string_name])',
-                'if path in self._path_cache:',
-                indent('return self._path_cache[path]'),
-                'res = self._root.find(f\'.//{section_name}/string[@lang="{self._lang}"]'
-                '[@type="{type_name}"][@name="{string_name}"]\')',
-                'self._path_cache[path] = res.text if res is not None else path',
-                'return self._path_cache[path]'
+                'key = f\'{section_name}.{type_name}.{string_name}\'',
+                'return self._strings.get(key, key)'
             ]
         )
         )
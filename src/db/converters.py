@@ -29,8 +29,8 @@ SOFTWARE.
 
 __author__ = "Mathtin"
 
-from datetime import datetime
-from typing import Any, Dict, List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 import discord as d
 
@@ -69,6 +69,27 @@ def role_mask(user: d.Member, role_map: Dict[int, Dict[str, Any]]) -> str:
 # Users
 #
 
+def naive_utc(date: Optional[datetime]) -> Optional[datetime]:
+    if date is None or date.tzinfo is None:
+        return date
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def aware_utc(date: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps written by the bot, naive ones would be shifted by a non-UTC session time zone
+    if date is None or date.tzinfo is not None:
+        return date
+    return date.replace(tzinfo=timezone.utc)
+
+
+def user_fingerprint(row: Dict[str, Any]) -> int:
+    # created_at of member rows is the guild join date, so rejoins are caught too.
+    # Truncated to seconds, default MySQL TIMESTAMP drops microseconds of gateway joined_at
+    created_at = naive_utc(row['created_at'])
+    created_at = created_at and created_at.replace(microsecond=0)
+    return hash((row['name'], row['disc'], row['display_name'], row['roles'], created_at))
+
+
 def user_row(user: d.User) -> Dict[str, Any]:
     return {
         'did': user.id,
@@ -98,6 +119,14 @@ def member_join_row(user: User, joined: datetime, events: Dict[str, int]) -> Dic
     }
 
 
+def member_join_history_row(user_id: int, joined: datetime, events: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        'type_id': events["member_join"],
+        'user_id': user_id,
+        'created_at': joined
+    }
+
+
 def user_leave_row(user: User, events: Dict[str, int]) -> Dict[str, Any]:
     return {
         'type_id': events["member_leave"],
@@ -141,19 +170,34 @@ def message_delete_row(msg: MessageEvent, events: Dict[str, int]) -> Dict[str, A
 # VC
 #
 
-def vc_join_row(user: User, channel: d.VoiceChannel, events: Dict[str, int]) -> Dict[str, Any]:
+def vc_join_row(user: User, channel: d.VoiceChannel, events: Dict[str, int], at: datetime) -> Dict[str, Any]:
     return {
         'type_id': events["vc_join"],
         'user_id': user.id,
-        'channel_id': channel.id
+        'channel_id': channel.id,
+        'created_at': at,
+        'updated_at': at
+    }
+
+
+def vc_session_row(user_id: int, channel_id: int, event: str, events: Dict[str, int],
+                   at: datetime) -> Dict[str, Any]:
+    return {
+        'type_id': events[event],
+        'user_id': user_id,
+        'channel_id': channel_id,
+        'created_at': at,
+        'updated_at': at
     }
 
 
-def vc_leave_row(user: User, channel: d.VoiceChannel, events: Dict[str, int]) -> Dict[str, Any]:
+def vc_leave_row(user: User, channel: d.VoiceChannel, events: Dict[str, int], at: datetime) -> Dict[str, Any]:
     return {
         'type_id': events["vc_leave"],
         'user_id': user.id,
-        'channel_id': channel.id
+        'channel_id': channel.id,
+        'created_at': at,
+        'updated_at': at
     }
 
 
@@ -169,6 +213,16 @@ def new_reaction_to_row(user: User, msg: MessageEvent, events: Dict[str, int]) -
     }
 
 
+def reaction_history_row(user_id: int, msg_event_id: int, created_at: datetime,
+                         events: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        'type_id': events["new_reaction"],
+        'user_id': user_id,
+        'message_event_id': msg_event_id,
+        'created_at': created_at
+    }
+
+
 def reaction_delete_row(user: User, msg: MessageEvent, events: Dict[str, int]) -> Dict[str, Any]:
     return {
         'type_id': events["reaction_delete"],
@@ -187,3 +241,11 @@ def empty_user_stat_row(user_id: int, type_id: int) -> Dict[str, Any]:
         'user_id': user_id,
         'value': 0
     }
+
+
+def user_stat_row(user_id: int, type_id: int, value: int) -> Dict[str, Any]:
+    return {
+        'type_id': type_id,
+        'user_id': user_id,
+        'value': value
+    }
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+from logging import getLogger
+from typing import Callable, List, Tuple, Type
+
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from .models import *
+from .models.base import BaseModel
+
+log = getLogger('db-migration')
+
+Migration = Callable[[Connection], None]
+
+
+# metadata.create_all skips existing tables, so indexes declared
+# later on must be created explicitly
+def ensure_indexes(*model_types: Type[BaseModel]) -> Migration:
+    def migration(conn: Connection) -> None:
+        inspector = inspect(conn)
+        for model_type in model_types:
+            existing = {index['name'] for index in inspector.get_indexes(model_type.table_name())}
+            for index in model_type.__table__.indexes:
+                if index.name not in existing:
+                    log.info(f'Creating index {index.name} on {model_type.table_name()}')
+                    index.create(conn)
+    return migration
+
+
+##############
+# MIGRATIONS #
+##############
+
+# Append only, versions must be increasing; every migration should
+# be idempotent since fresh databases already match the models
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, 'composite lookup indexes for events and users',
+     ensure_indexes(MessageEvent, ReactionEvent, User)),
+]
+
+
+def migrate(engine: Engine) -> None:
+    with engine.begin() as conn:
+        applied = set(conn.execute(select(SchemaMigration.version)).scalars().all())
+        for version, description, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            log.info(f'Applying schema migration {version}: {description}')
+            migration(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(version=version, description=description))
@@ -33,6 +33,7 @@ from .event import EventType, MemberEvent, MessageEvent, VoiceChatEvent, Reactio
 from .role import Role
 from .user import User
 from .stat import UserStatType, UserStat
+from .migration import SchemaMigration
 
 INFO_MODELS = [EventType, UserStatType]
 RELATION_MODELS = [Role, User, MemberEvent, MessageEvent, ReactionEvent, VoiceChatEvent, UserStat]
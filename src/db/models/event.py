@@ -84,7 +84,8 @@ class MessageEvent(Event, BaseModel):
     message_id = Column(BigInteger, nullable=False, index=True)
     channel_id = Column(BigInteger, nullable=False, index=True)
 
-    __table_args__ = (Index('cix_message_events', "user_id"),)
+    __table_args__ = (Index('cix_message_events', "user_id"),
+                      Index('cix_message_events_message', "message_id", "type_id"))
 
     def __repr__(self):
         s = super().__repr__()[:-2]
@@ -112,7 +113,8 @@ class ReactionEvent(Event, BaseModel):
 
     message_event = relationship("MessageEvent", lazy="select")
 
-    __table_args__ = (Index('cix_reaction_events', "message_event_id"),)
+    __table_args__ = (Index('cix_reaction_events', "message_event_id"),
+                      Index('cix_reaction_events_type', "type_id", "user_id"))
 
     def __repr__(self):
         s = super().__repr__()[:-2]
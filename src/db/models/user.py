@@ -30,6 +30,7 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 from sqlalchemy import Column, Integer, VARCHAR, BigInteger, Unicode
+from sqlalchemy.sql.schema import Index
 from .base import BaseModel
 
 
@@ -42,6 +43,9 @@ class User(BaseModel):
     display_name = Column(Unicode(127), nullable=True)
     roles = Column(VARCHAR(127), nullable=True)
 
+    __table_args__ = (Index('ix_users_display_name', "display_name"),
+                      Index('cix_users_name', "name", "disc"))
+
     def __repr__(self):
         s = super().__repr__()[:-2]
         f = ",did={0.did!r},name={0.name!r},disc={0.disc!r},display_name={0.display_name!r},roles={0.roles!r}".format(
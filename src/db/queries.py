@@ -30,13 +30,14 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 from datetime import datetime
-from typing import Any, Tuple, List, Type
+from typing import Any, Dict, Tuple, List, Type
 
-from sqlalchemy import func, and_, literal_column, Column
-from sqlalchemy.sql import Select, Insert, Update, Delete
+from sqlalchemy import func, and_, or_, literal_column, Column, lambda_stmt, bindparam, type_coerce
+from sqlalchemy.sql import Select, Insert, Delete
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 from sqlalchemy.sql.expression import cast, delete, text, extract
 from sqlalchemy.sql.expression import insert, select, update
-from sqlalchemy.sql.sqltypes import Integer
+from sqlalchemy.sql.sqltypes import Integer, BigInteger, TIMESTAMP
 
 from .models import *
 from .models.base import BaseModel
@@ -73,8 +74,14 @@ def date_to_secs(col: Column):
 # SELECT QUERIES #
 ##################
 
-def select_role(role_name: str) -> Select:
-    return select(Role).where(Role.name == role_name)
+# Per-event lookups and updates are built with lambda_stmt so their SQL is compiled
+# once per call site and cached; filters use type ids instead of joining type names.
+# Closure values are bound with their python type, discord ids and timestamps go
+# through type_coerce to be sent as BIGINT and TIMESTAMP WITH TIME ZONE. Stat aggregations below stay plain selects: they only run on
+# stat reload and are embedded into INSERT ... FROM SELECT, which takes no lambda_stmt
+
+def select_role(role_name: str) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(Role).where(Role.name == role_name))
 
 
 def select_event_type(event_type: str) -> Select:
@@ -89,20 +96,35 @@ def select_stat_types() -> Select:
     return select(UserStatType)
 
 
-def select_user_by_did(did: int) -> Select:
-    return select(User).where(User.did == did)
+def select_user_by_did(did: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(User).where(User.did == type_coerce(did, BigInteger)))
+
+
+def select_user_fingerprint_rows() -> Select:
+    return select(User.did, User.name, User.disc, User.display_name, User.roles, User.created_at)
+
 
+def select_user_ids_by_dids(dids: List[int]) -> Select:
+    return select(User.did, User.id).where(User.did.in_(dids))
 
-def select_user_by_display_name(display_name: str) -> Select:
-    return select(User).where(User.display_name == display_name)
 
+def select_user_by_display_name(display_name: str) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(User).where(User.display_name == display_name))
 
-def select_user_by_q_name(name: str, disc: int) -> Select:
-    return select(User).where(User.name == name, User.disc == disc)
 
+def select_user_by_q_name(name: str, disc: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(User).where(and_(User.name == name, User.disc == disc)))
 
-def select_message_event_by_did(type_id: int, did: int) -> Select:
-    return select(MessageEvent).where(and_(MessageEvent.message_id == did, MessageEvent.type_id == type_id))
+
+def select_message_event_by_did(type_id: int, did: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(MessageEvent)
+                       .where(and_(MessageEvent.message_id == type_coerce(did, BigInteger),
+                                   MessageEvent.type_id == type_id)))
+
+
+def select_message_event_ids_by_dids(type_id: int, dids: List[int]) -> Select:
+    return select(MessageEvent.message_id, MessageEvent.id) \
+        .where(and_(MessageEvent.message_id.in_(dids), MessageEvent.type_id == type_id))
 
 
 def select_last_member_event_by_user_did(user_did: int) -> Select:
@@ -113,37 +135,59 @@ def select_last_member_event_by_user_did(user_did: int) -> Select:
         .limit(1)
 
 
-def select_last_member_event_by_user_id(user_id: int) -> Select:
-    return select(MemberEvent) \
-        .where(MemberEvent.user_id == user_id) \
-        .order_by(MemberEvent.created_at.desc()) \
-        .limit(1)
+def select_last_member_event_by_user_id(user_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(MemberEvent)
+                       .where(MemberEvent.user_id == user_id)
+                       .order_by(MemberEvent.created_at.desc())
+                       .limit(1))
 
 
-def select_any_last_vc_event_by_user_id(user_id: int, channel_id: int) -> Select:
-    return select(VoiceChatEvent) \
-        .where(and_(VoiceChatEvent.user_id == user_id, VoiceChatEvent.channel_id == channel_id)) \
-        .order_by(VoiceChatEvent.created_at.desc()) \
-        .limit(1)
+def select_any_last_vc_event_by_user_id(user_id: int, channel_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(VoiceChatEvent)
+                       .where(and_(VoiceChatEvent.user_id == user_id,
+                                   VoiceChatEvent.channel_id == type_coerce(channel_id, BigInteger)))
+                       .order_by(VoiceChatEvent.created_at.desc())
+                       .limit(1))
+
+
+def select_last_vc_event_by_user_id(channel_id: int, type_id: int, user_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(VoiceChatEvent)
+                       .where(and_(VoiceChatEvent.user_id == user_id,
+                                   VoiceChatEvent.channel_id == type_coerce(channel_id, BigInteger),
+                                   VoiceChatEvent.type_id == type_id))
+                       .order_by(VoiceChatEvent.created_at.desc())
+                       .limit(1))
+
+
+def select_open_vc_sessions(join_type_id: int) -> Select:
+    last_events = select(func.max(VoiceChatEvent.id).label('id')) \
+        .group_by(VoiceChatEvent.user_id, VoiceChatEvent.channel_id) \
+        .subquery()
+    return select(VoiceChatEvent.id, VoiceChatEvent.user_id, VoiceChatEvent.channel_id, VoiceChatEvent.created_at) \
+        .join(last_events, VoiceChatEvent.id == last_events.c.id) \
+        .where(VoiceChatEvent.type_id == join_type_id)
+
 
+def select_vc_events_updated_at(ids: List[int]) -> Select:
+    return select(VoiceChatEvent.id, VoiceChatEvent.updated_at).where(VoiceChatEvent.id.in_(ids))
 
-def select_last_vc_event_by_user_id(channel_id: int, event_name: str, user_id: int) -> Select:
-    return select(VoiceChatEvent) \
-        .join(EventType) \
-        .where(and_(VoiceChatEvent.user_id == user_id,
-                    VoiceChatEvent.channel_id == channel_id,
-                    EventType.name == event_name)) \
-        .order_by(VoiceChatEvent.created_at.desc())
 
+def select_last_event_time(model_type: Type[BaseModel]) -> Select:
+    last_id = select(func.max(model_type.id)).scalar_subquery()
+    return select(model_type.created_at).where(model_type.id == last_id)
 
-def select_user_stat_by_user_id(stat_name: str, user_id: int) -> Select:
-    return select(UserStat) \
-        .join(UserStatType) \
-        .where(and_(UserStat.user_id == user_id,
-                    UserStatType.name == stat_name))
 
+def select_user_stat_by_user_id(type_id: int, user_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(UserStat)
+                       .where(and_(UserStat.user_id == user_id,
+                                   UserStat.type_id == type_id)))
 
-def select_membership_time_per_user(event_name: str, lit_values: List[Tuple[str, Any]] = None) -> Select:
+
+def select_user_stat_user_ids(type_id: int, user_ids: List[int]) -> Select:
+    return select(UserStat.user_id).where(and_(UserStat.type_id == type_id, UserStat.user_id.in_(user_ids)))
+
+
+def select_membership_time_per_user(type_id: int, lit_values: List[Tuple[str, Any]] = None) -> Select:
     if lit_values is None:
         lit_values = []
     join_time = date_to_secs(func.max(MemberEvent.created_at))
@@ -152,35 +196,32 @@ def select_membership_time_per_user(event_name: str, lit_values: List[Tuple[str,
     return select([membership_value, MemberEvent.user_id] +
                   [literal_column(str(v)).label(label) for label, v in lit_values]) \
         .join(User) \
-        .join(EventType) \
-        .where(and_(EventType.name == event_name,
+        .where(and_(MemberEvent.type_id == type_id,
                     User.roles.isnot(None))) \
         .group_by(MemberEvent.user_id)
 
 
-def select_message_event_count_per_user(event_name: str, lit_values: List[Tuple[str, Any]] = None) -> Select:
+def select_message_event_count_per_user(type_id: int, lit_values: List[Tuple[str, Any]] = None) -> Select:
     if lit_values is None:
         lit_values = []
     value_column = func.count(MessageEvent.id).label('value')
     return select([value_column, MessageEvent.user_id] +
                   [literal_column(str(v)).label(label) for label, v in lit_values]) \
-        .join(EventType) \
-        .where(EventType.name == event_name) \
+        .where(MessageEvent.type_id == type_id) \
         .group_by(MessageEvent.user_id)
 
 
-def select_reaction_event_count_per_user(event_name: str, lit_values: List[Tuple[str, Any]] = None) -> Select:
+def select_reaction_event_count_per_user(type_id: int, lit_values: List[Tuple[str, Any]] = None) -> Select:
     if lit_values is None:
         lit_values = []
     value_column = func.count(ReactionEvent.id).label('value')
     return select([value_column, ReactionEvent.user_id] +
                   [literal_column(str(v)).label(label) for label, v in lit_values]) \
-        .join(EventType) \
-        .where(EventType.name == event_name) \
+        .where(ReactionEvent.type_id == type_id) \
         .group_by(ReactionEvent.user_id)
 
 
-def select_vc_time_per_user(event_name: str, lit_values: List[Tuple[str, Any]] = None) -> Select:
+def select_vc_time_per_user(type_id: int, lit_values: List[Tuple[str, Any]] = None) -> Select:
     if lit_values is None:
         lit_values = []
     join_time = date_to_secs(VoiceChatEvent.created_at)
@@ -188,8 +229,7 @@ def select_vc_time_per_user(event_name: str, lit_values: List[Tuple[str, Any]] =
     value_column = func.sum(left_time - join_time).label('value')
     return select([value_column, VoiceChatEvent.user_id] +
                   [literal_column(str(v)).label(label) for label, v in lit_values]) \
-        .join(EventType) \
-        .where(EventType.name == event_name) \
+        .where(VoiceChatEvent.type_id == type_id) \
         .group_by(VoiceChatEvent.user_id)
 
 
@@ -197,6 +237,10 @@ def select_vc_time_per_user(event_name: str, lit_values: List[Tuple[str, Any]] =
 # INSERT QUERIES #
 ##################
 
+def insert_vc_event(row: Dict[str, Any]) -> Insert:
+    return insert(VoiceChatEvent).values(**row)
+
+
 def insert_user_stat_from_select(select_query: Select, values: list = None) -> Insert:
     if values is None:
         values = ['value', 'user_id', 'type_id']
@@ -207,35 +251,68 @@ def insert_user_stat_from_select(select_query: Select, values: list = None) -> I
 # UPDATE QUERIES #
 ##################
 
-def update_all_users_absent() -> Update:
-    return update(User) \
-        .values(roles=None, display_name=None)
+def update_all_users_absent() -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(User)
+                       .values(roles=None, display_name=None))
+
+
+def update_user_absent(id_: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(User)
+                       .values(roles=None, display_name=None)
+                       .where(User.id == id_))
+
 
+def update_user_absent_by_did(did: int) -> StatementLambdaElement:
+    # Core update, ORM session sync can't evaluate type_coerce
+    table = User.__table__
+    return lambda_stmt(lambda: update(table)
+                       .values(roles=None, display_name=None)
+                       .where(table.c.did == type_coerce(did, BigInteger)))
 
-def update_user_absent(id_: int) -> Update:
-    return update(User) \
-        .values(roles=None, display_name=None) \
-        .where(User.id == id_)
 
+def update_vc_event_closed(id_: int, closed_at: datetime) -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(VoiceChatEvent)
+                       .values(updated_at=type_coerce(closed_at, TIMESTAMP(True)))
+                       .where(VoiceChatEvent.id == id_))
 
-def update_user_absent_by_did(did: int) -> Update:
-    return update(User) \
-        .values(roles=None, display_name=None) \
-        .where(User.did == did)
 
+def update_vc_events_updated_at() -> StatementLambdaElement:
+    # executemany form: [{'event_id': ..., 'updated_at': ...}, ...]
+    # updated_at is close time of finished sessions and checkpoint of open ones
+    table = VoiceChatEvent.__table__
+    return lambda_stmt(lambda: update(table)
+                       .values(updated_at=bindparam('updated_at'))
+                       .where(table.c.id == bindparam('event_id')))
 
-def update_inc_user_member_stat(user_id: int, type_id: int) -> Update:
-    return update(UserStat) \
-        .values(value=UserStat.value + 1) \
-        .where(and_(UserStat.user_id == user_id,
-                    UserStat.type_id == type_id))
 
+def update_add_user_stats(type_id: int) -> StatementLambdaElement:
+    # executemany form: [{'stat_user_id': ..., 'delta': ...}, ...]
+    table = UserStat.__table__
+    return lambda_stmt(lambda: update(table)
+                       .values(value=table.c.value + bindparam('delta'))
+                       .where(and_(table.c.user_id == bindparam('stat_user_id'),
+                                   table.c.type_id == type_id)))
 
-def update_dec_user_member_stat(user_id: int, type_id: int) -> Update:
-    return update(UserStat) \
-        .values(value=UserStat.value - 1) \
-        .where(and_(UserStat.user_id == user_id,
-                    UserStat.type_id == type_id))
+
+def update_users_absent_by_dids(dids: List[int]) -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(User)
+                       .values(roles=None, display_name=None)
+                       .where(and_(User.did.in_(dids),
+                                   or_(User.roles.isnot(None), User.display_name.isnot(None)))))
+
+
+def update_inc_user_member_stat(user_id: int, type_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(UserStat)
+                       .values(value=UserStat.value + 1)
+                       .where(and_(UserStat.user_id == user_id,
+                                   UserStat.type_id == type_id)))
+
+
+def update_dec_user_member_stat(user_id: int, type_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: update(UserStat)
+                       .values(value=UserStat.value - 1)
+                       .where(and_(UserStat.user_id == user_id,
+                                   UserStat.type_id == type_id)))
 
 
 ##################
@@ -252,6 +329,11 @@ def delete_message_events_by_channel_id(channel_id: int) -> Delete:
         .where(MessageEvent.channel_id == channel_id)
 
 
+def delete_vc_event(id_: int) -> Delete:
+    return delete(VoiceChatEvent) \
+        .where(VoiceChatEvent.id == id_)
+
+
 def delete_users_stat(type_id: int) -> Delete:
     return delete(UserStat) \
         .where(UserStat.type_id == type_id)
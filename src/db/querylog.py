@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import re
+import threading
+from collections import deque
+from logging import getLogger
+from types import FrameType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+log = getLogger('db-query')
+
+# Durations kept per statement shape for percentiles (sliding window)
+STATS_WINDOW_SIZE = 1024
+SLOW_QUERY_PARAMS_LIMIT = 512
+
+# Frames of these modules are skipped while resolving query caller
+INTERNAL_MODULES = ('db.session', 'db.querylog', 'services.service', 'sqlalchemy', 'asyncio', 'concurrent',
+                    'threading')
+
+Caller = Tuple[str, str, int]
+
+# Expanded IN lists of any length share one shape
+IN_LIST_REGEX = re.compile(r'\((?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:, (?:\?|%s|%\(\w+\)s|\$\d+|:\w+))+\)')
+
+# Caller resolved on event loop side for statements executed in worker threads
+_worker_local = threading.local()
+
+
+def set_worker_caller(caller: Optional[Caller]) -> None:
+    _worker_local.caller = caller
+
+
+def find_caller(frame: Optional[FrameType]) -> Optional[Caller]:
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(INTERNAL_MODULES):
+            code = frame.f_code
+            return module, getattr(code, 'co_qualname', code.co_name), frame.f_lineno
+        frame = frame.f_back
+    return getattr(_worker_local, 'caller', None)
+
+
+def format_caller(caller: Optional[Caller]) -> str:
+    if caller is None:
+        return 'unknown'
+    return f'{caller[0]}.{caller[1]}:{caller[2]}'
+
+
+# Last statement sent through connection, used as statement shape
+def remember_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    info = conn.info
+    info['statement'] = statement
+    info['parameters'] = parameters
+
+
+class StatementStats(object):
+    __slots__ = ('count', 'total', 'max', 'window')
+
+    count: int
+    total: float
+    max: float
+    window: Deque[float]
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window = deque(maxlen=STATS_WINDOW_SIZE)
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.window.append(elapsed)
+
+    def percentiles(self, *qs: float) -> List[float]:
+        values = sorted(self.window)
+        if not values:
+            return [0.0 for _ in qs]
+        return [values[min(int(q * len(values)), len(values) - 1)] for q in qs]
+
+
+class QueryLog(object):
+
+    enabled: bool
+    slow_threshold: float
+    log_params: bool
+    stats: Dict[str, StatementStats]
+    _shapes: Dict[str, str]
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.slow_threshold = 0.0
+        self.log_params = True
+        self.stats = {}
+        self._shapes = {}
+
+    def configure(self, enabled: bool, slow_query_ms: int, log_params: bool) -> None:
+        self.enabled = enabled or slow_query_ms > 0
+        self.slow_threshold = slow_query_ms / 1000
+        self.log_params = log_params
+
+    def reset(self) -> None:
+        self.stats = {}
+        self._shapes = {}
+
+    def shape(self, statement: str) -> str:
+        shape = self._shapes.get(statement)
+        if shape is None:
+            shape = self._shapes[statement] = IN_LIST_REGEX.sub('(...)', ' '.join(statement.split()))
+        return shape
+
+    def observe(self, info: Dict[str, Any], elapsed: float, caller: Optional[Caller]) -> None:
+        statement = info.get('statement')
+        if statement is None:
+            return
+        shape = self.shape(statement)
+        stats = self.stats.get(shape)
+        if stats is None:
+            stats = self.stats[shape] = StatementStats()
+        stats.add(elapsed)
+        if 0 < self.slow_threshold <= elapsed:
+            params = ''
+            if self.log_params:
+                params = f' {str(info.get("parameters"))[:SLOW_QUERY_PARAMS_LIMIT]}'
+            log.warning(f'Slow query ({elapsed * 1000:.1f} ms) from {format_caller(caller)}: {shape}{params}')
+
+    def top(self, n: int) -> List[Tuple[str, StatementStats]]:
+        return sorted(self.stats.items(), key=lambda kv: kv[1].total, reverse=True)[:n]
+
+    def report(self, n: int) -> str:
+        lines = [f'{"total ms":>10} {"count":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}  statement']
+        for shape, stats in self.top(n):
+            p50, p95, p99 = stats.percentiles(0.5, 0.95, 0.99)
+            lines.append(f'{stats.total * 1000:10.1f} {stats.count:8} {p50 * 1000:8.2f} {p95 * 1000:8.2f} '
+                         f'{p99 * 1000:8.2f} {stats.max * 1000:8.2f}  {shape}')
+        return '\n'.join(lines) + '\n'
+
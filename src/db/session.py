@@ -30,27 +30,35 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 import asyncio
+import sys
+import time
 from concurrent.futures.thread import ThreadPoolExecutor
 from logging import getLogger
 from typing import Type, Optional, Any, Dict, List
 
-from sqlalchemy import engine as SyncEngine, create_engine, select, update, delete
+from sqlalchemy import engine as SyncEngine, create_engine, select, update, delete, insert, event
 from sqlalchemy.engine import Result
 from sqlalchemy.exc import IntegrityError, DataError, InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, AsyncResult, AsyncSessionTransaction
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, SessionTransaction
 
+from .migrations import migrate
+from .querylog import QueryLog, find_caller, remember_statement, set_worker_caller
 from .models.base import Base, BaseModel
 
 log = getLogger('db')
 
+BULK_LOAD_BATCH_SIZE = 1000
+
 
 class DBSyncSession(object):
     _session: Session
+    _query_log: Optional[QueryLog]
 
-    def __init__(self, session: Session) -> None:
+    def __init__(self, session: Session, query_log: Optional[QueryLog] = None) -> None:
         self._session = session
+        self._query_log = query_log
 
     def __enter__(self):
         return self
@@ -62,8 +70,14 @@ class DBSyncSession(object):
     # Base session methods #
     ########################
 
-    def execute(self, statement: Any) -> Result:
-        return self._session.execute(statement)
+    def execute(self, statement: Any, params: Any = None) -> Result:
+        if self._query_log is None or not self._query_log.enabled:
+            return self._session.execute(statement, params)
+        started_at = time.perf_counter()
+        result = self._session.execute(statement, params)
+        elapsed = time.perf_counter() - started_at
+        self._query_log.observe(self._session.connection().info, elapsed, find_caller(sys._getframe(1)))
+        return result
 
     def commit(self) -> None:
         try:
@@ -170,6 +184,10 @@ class DBSyncSession(object):
     # Special methods #
     ###################
 
+    def bulk_insert(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        for i in range(0, len(values), BULK_LOAD_BATCH_SIZE):
+            self.execute(insert(model_type), values[i:i + BULK_LOAD_BATCH_SIZE])
+
     def sync_table(self, model_type: Type[BaseModel],
                    values: List[Dict[str, Any]],
                    pk_col: str = 'id') -> None:
@@ -198,17 +216,24 @@ class DBSyncSession(object):
 class DBAsyncWrappedSession(object):
     _session: DBSyncSession
     _executor: ThreadPoolExecutor
+    _query_log: Optional[QueryLog]
     sync_session: Session
 
-    def __init__(self, session: Session, executor: ThreadPoolExecutor) -> None:
-        self._session = DBSyncSession(session)
+    def __init__(self, session: Session, executor: ThreadPoolExecutor, query_log: Optional[QueryLog] = None) -> None:
+        self._session = DBSyncSession(session, query_log)
         self._executor = executor
+        self._query_log = query_log
         self.sync_session = session
 
     async def _run_in_executor(self, func, *args, **kwargs) -> Any:
         loop = asyncio.get_running_loop()
+        caller = None
+        if self._query_log is not None and self._query_log.enabled:
+            # Caller frames are not reachable from executor thread
+            caller = find_caller(sys._getframe(1))
 
         def wrapped():
+            set_worker_caller(caller)
             return func(*args, **kwargs)
 
         return await loop.run_in_executor(self._executor, wrapped)
@@ -223,8 +248,8 @@ class DBAsyncWrappedSession(object):
     # Base session methods #
     ########################
 
-    async def execute(self, statement: Any) -> Result:
-        return await self._run_in_executor(self._session.execute, statement)
+    async def execute(self, statement: Any, params: Any = None) -> Result:
+        return await self._run_in_executor(self._session.execute, statement, params)
 
     async def scalar(self, statement: Any) -> Result:
         result = await self.execute(statement)
@@ -314,6 +339,9 @@ class DBAsyncWrappedSession(object):
     # Special methods #
     ###################
 
+    async def bulk_insert(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        return await self._run_in_executor(self._session.bulk_insert, model_type=model_type, values=values)
+
     async def sync_table(self, model_type: Type[BaseModel], values: List[Dict[str, Any]], pk_col: str = 'id'):
         return await self._run_in_executor(self._session.sync_table,
                                            model_type=model_type,
@@ -323,9 +351,11 @@ class DBAsyncWrappedSession(object):
 
 class DBAsyncSession(object):
     _session: AsyncSession
+    _query_log: Optional[QueryLog]
 
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: AsyncSession, query_log: Optional[QueryLog] = None) -> None:
         self._session = session
+        self._query_log = query_log
 
     async def __aenter__(self):
         return self
@@ -337,8 +367,16 @@ class DBAsyncSession(object):
     # Base session methods #
     ########################
 
-    async def execute(self, statement: Any) -> Result:
-        return await self._session.execute(statement)
+    async def execute(self, statement: Any, params: Any = None) -> Result:
+        if self._query_log is None or not self._query_log.enabled:
+            return await self._session.execute(statement, params)
+        caller = find_caller(sys._getframe(1))
+        started_at = time.perf_counter()
+        result = await self._session.execute(statement, params)
+        elapsed = time.perf_counter() - started_at
+        connection = await self._session.connection()
+        self._query_log.observe(connection.sync_connection.info, elapsed, caller)
+        return result
 
     async def stream(self, statement: Any) -> AsyncResult:
         return await self._session.stream(statement)
@@ -448,6 +486,38 @@ class DBAsyncSession(object):
     # Special methods #
     ###################
 
+    async def bulk_insert(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        if not values:
+            return
+        connection = await self._session.connection()
+        if connection.dialect.driver == 'asyncpg':
+            raw_connection = await connection.get_raw_connection()
+            if self._driver_connection(raw_connection) is not None:
+                return await self._copy_records(raw_connection, model_type, values)
+        for i in range(0, len(values), BULK_LOAD_BATCH_SIZE):
+            await self.execute(insert(model_type), values[i:i + BULK_LOAD_BATCH_SIZE])
+
+    @staticmethod
+    def _driver_connection(raw_connection: Any) -> Optional[Any]:
+        # SQLAlchemy 1.4.24+ exposes driver_connection, pinned 1.4.0b3 adapter keeps it private
+        driver_connection = getattr(raw_connection, 'driver_connection', None) or \
+            getattr(raw_connection.connection, '_connection', None)
+        if not hasattr(driver_connection, 'copy_records_to_table'):
+            return None
+        return driver_connection
+
+    @staticmethod
+    async def _copy_records(raw_connection: Any, model_type: Type[BaseModel],
+                            values: List[Dict[str, Any]]) -> None:
+        # Omitted columns (id, timestamps) are filled with server defaults by COPY
+        columns = list(values[0].keys())
+        records = [tuple(value[c] for c in columns) for value in values]
+        driver_connection = DBAsyncSession._driver_connection(raw_connection)
+        if not driver_connection.is_in_transaction():
+            # Adapter begins the ORM transaction lazily on first statement, COPY has to run inside it
+            await raw_connection.connection._start_transaction()
+        await driver_connection.copy_records_to_table(model_type.table_name(), records=records, columns=columns)
+
     async def sync_table(self, model_type: Type[BaseModel],
                          values: List[Dict[str, Any]],
                          pk_col: str = 'id') -> None:
@@ -483,6 +553,8 @@ class DBConnection(object):
     _sync_session: Optional[DBSyncSession]
     _async_session: Optional[DBAsyncSession]
 
+    query_log: QueryLog
+
     _wrap_sync: bool
     _single_thread_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='DB_CONNECTION_THREAD_')
 
@@ -493,6 +565,9 @@ class DBConnection(object):
         # Create sync backend
         self._db_sync_engine = create_engine(sync_engine_url)
         Base.metadata.create_all(self._db_sync_engine)
+        migrate(self._db_sync_engine)
+        self.query_log = QueryLog()
+        event.listen(self._db_sync_engine, 'before_cursor_execute', remember_statement)
         self._session_sync_factory = sessionmaker(bind=self._db_sync_engine,
                                                   autocommit=False,
                                                   autoflush=True,
@@ -507,15 +582,30 @@ class DBConnection(object):
                                                        autoflush=True,
                                                        class_=AsyncSession,
                                                        expire_on_commit=False)
+            event.listen(self._db_async_engine.sync_engine, 'before_cursor_execute', remember_statement)
             self._wrap_sync = False
         self._sync_session = None
         self._async_session = None
 
     def sync_session(self):
-        return DBSyncSession(self._session_sync_factory())
+        return DBSyncSession(self._session_sync_factory(), self.query_log)
 
     def async_session(self):
         if self._wrap_sync:
-            return DBAsyncWrappedSession(self._session_sync_factory(), self._single_thread_pool)
+            return DBAsyncWrappedSession(self._session_sync_factory(), self._single_thread_pool, self.query_log)
         else:
-            return DBAsyncSession(self._session_async_factory())
+            return DBAsyncSession(self._session_async_factory(), self.query_log)
+
+    def bulk_load_sync(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        if not values:
+            return
+        with self.sync_session() as session:
+            with session.begin():
+                session.bulk_insert(model_type, values)
+
+    async def bulk_load(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        if not values:
+            return
+        async with self.async_session() as session:
+            async with session.begin():
+                await session.bulk_insert(model_type, values)
@@ -35,7 +35,7 @@ from typing import Dict, List, Optional
 import discord
 
 from overlord.types import OverlordMember
-from util import InvalidConfigException, ConfigView
+from util import InvalidConfigException, ConfigView, ConfigDiff
 from overlord.extension import BotExtension
 
 log = logging.getLogger('config-extension')
@@ -64,6 +64,7 @@ class InviteExtension(BotExtension):
     __extname__ = '🚪 Invite Extension'
     __description__ = 'User invite handling'
     __color__ = 0x7623bc
+    __config_sections__ = [InviteRootConfig]
 
     # State
     _invites = List[discord.Invite]
@@ -102,7 +103,7 @@ class InviteExtension(BotExtension):
     async def on_ready(self) -> None:
         self._invites = await self.bot.guild.invites()
 
-    async def on_config_update(self) -> None:
+    async def on_config_update(self, changes: ConfigDiff) -> None:
         self._invite_role_map = {}
         self.config = self.bot.get_config_section(InviteRootConfig)
         if self.config is None:
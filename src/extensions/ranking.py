@@ -39,7 +39,7 @@ from overlord.types import OverlordMember, OverlordMessageDelete, OverlordMessag
 from services import UserService
 from services.role import RoleService
 from services.stat import StatService
-from util import ConfigView, FORMATTERS
+from util import ConfigView, ConfigDiff, FORMATTERS
 from util.exceptions import InvalidConfigException
 from util.extbot import filter_roles, is_role_applied, qualified_name, is_text_channel
 from util.resources import STRINGS as R
@@ -92,6 +92,7 @@ class RankingExtension(BotExtension):
     __extname__ = '🎖 Ranking Extension'
     __description__ = 'Member ranking system based on stats (check Stats Extension)'
     __color__ = 0xc84e3f
+    __config_sections__ = [RankingRootConfig]
 
     config: RankingRootConfig = RankingRootConfig()
     log_channel: discord.TextChannel
@@ -219,12 +220,12 @@ class RankingExtension(BotExtension):
     # Hooks #
     #########
 
-    async def on_config_update(self) -> None:
+    async def on_config_update(self, changes: ConfigDiff) -> None:
         self.config = self.bot.get_config_section(RankingRootConfig)
         if self.config is None:
             raise InvalidConfigException("RankingRootConfig section not found", "root")
         # Check log_channel
-        if self.config.log_channel != 0:
+        if self.config.log_channel != 0 and changes.touches(self.config.path('log_channel')):
             channel = self.bot.get_channel(self.config.log_channel)
             if channel is None:
                 raise InvalidConfigException(f'Error channel id is invalid', self.config.path('log_channel'))
@@ -234,12 +235,14 @@ class RankingExtension(BotExtension):
             log.info(f'Attached to {channel.name} as rank logging channel ({channel.id})')
             self.log_channel = channel
         # Check rank roles
-        for i, role_name in enumerate(self.ignored_roles):
-            if self.s_roles.get_d_role(role_name) is None:
-                raise InvalidConfigException(f"No such role: '{role_name}'", self.config.path(f"ignored[{i}]"))
-        for i, role_name in enumerate(self.required_roles):
-            if self.s_roles.get_d_role(role_name) is None:
-                raise InvalidConfigException(f"No such role: '{role_name}'", self.config.path(f"required[{i}]"))
+        if changes.touches(self.config.path('ignored')):
+            for i, role_name in enumerate(self.ignored_roles):
+                if self.s_roles.get_d_role(role_name) is None:
+                    raise InvalidConfigException(f"No such role: '{role_name}'", self.config.path(f"ignored[{i}]"))
+        if changes.touches(self.config.path('required')):
+            for i, role_name in enumerate(self.required_roles):
+                if self.s_roles.get_d_role(role_name) is None:
+                    raise InvalidConfigException(f"No such role: '{role_name}'", self.config.path(f"required[{i}]"))
         # Check rank weights
         ranks_weights = {}
         for name, props in self.ranks.items():
@@ -319,7 +322,7 @@ class RankingExtension(BotExtension):
         rank.membership = membership
         rank.messages = msg_count
         rank.vc = vc_time
-        self.ranks[role.name] = rank
+        self.bot.cnf_manager.set(self.config.path(f'role.{role.name}'), rank)
         # Update config properly
         err = await self.bot.safe_update_config()
         if not err:
@@ -334,7 +337,7 @@ class RankingExtension(BotExtension):
         if role.name not in self.ranks:
             await msg.channel.send(R.ERROR_OTHER.UNKNOWN_RANK)
             return
-        del self.ranks[role.name]
+        self.bot.cnf_manager.delete(self.config.path(f'role.{role.name}'))
         # Update config properly
         err = await self.bot.safe_update_config()
         if not err:
@@ -356,11 +359,12 @@ class RankingExtension(BotExtension):
             await msg.channel.send(f'{R.MESSAGE.ERROR_OTHER.DUPLICATE_WEIGHT}: {ranks_weights[weight]}')
             return
         # Update rank
-        rank = self.ranks[role.name]
+        rank = RankConfig()
         rank.weight = weight
         rank.membership = membership
         rank.messages = msg_count
         rank.vc = vc_time
+        self.bot.cnf_manager.set(self.config.path(f'role.{role.name}'), rank)
         # Update config properly
         err = await self.bot.safe_update_config()
         if not err:
@@ -34,7 +34,7 @@ import logging
 import discord
 
 import db as DB
-from overlord import OverlordMessage, OverlordVCState, OverlordMember
+from overlord import OverlordMessage, OverlordMember
 from services import StatService
 from util import FORMATTERS
 from util.extbot import qualified_name
@@ -99,12 +99,6 @@ class StatsExtension(BotExtension):
         async with self.sync():
             await self.s_stats.inc(msg.db.user, 'delete_message_count')
 
-    async def on_vc_leave(self, user: OverlordMember, join: OverlordVCState, leave: OverlordVCState) -> None:
-        async with self.sync():
-            stat_val = await self.s_stats.get(user.db, 'vc_time')
-            stat_val += (leave.db.created_at - join.db.created_at).total_seconds()
-            await self.s_stats.set(user.db, 'vc_time', stat_val)
-
     async def on_reaction_add(self, member: OverlordMember, _, __) -> None:
         async with self.sync():
             await self.s_stats.inc(member.db, 'new_reaction_count')
@@ -125,6 +119,12 @@ class StatsExtension(BotExtension):
                 await self.s_stats.reload_stat(stat_name)
         log.info("Done scheduled stat update")
 
+    @BotExtension.task(minutes=5)
+    async def vc_time_checkpoint_task(self):
+        async with self.sync():
+            sessions = await self.s_stats.checkpoint_vc_time()
+        log.debug(f'VC time checkpoint for {sessions} open sessions')
+
     ############
     # Commands #
     ############
@@ -29,18 +29,101 @@ SOFTWARE.
 
 __author__ = "Mathtin"
 
+import asyncio
+import io
 import logging
 import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
 
 import discord
 
 import db as DB
 from overlord.extension import BotExtension
 from services import UserService, EventService, StatService, RoleService
+from util import pretty_seconds
+from util.extbot import ProgressEmbed
+from util.metrics import METRICS
+from util.profiler import PROFILE_CPU, PROFILE_MODES, profile_event_loop, is_profiling
 from util.resources import STRINGS as R
 
 log = logging.getLogger('utility-extension')
 
+HISTORY_BATCH_SIZE = 100
+HISTORY_PROGRESS_INTERVAL = 5
+METRICS_TOP_N = 8
+PROFILE_MAX_SECONDS = 300
+PROFILE_TOP_N = 50
+QUERY_STATS_SHAPE_LIMIT = 160
+QUERY_STATS_REPORT_SIZE = 100
+
+
+#####################
+# Utility functions #
+#####################
+
+# Busiest histogram children by total time, one line each
+def histogram_summary(metric_name: str, top: int = METRICS_TOP_N) -> str:
+    metric = METRICS.get(metric_name)
+    if metric is None:
+        return ''
+    children = sorted((c for c in metric.children() if c[1].count), key=lambda c: c[1].sum, reverse=True)
+    lines = [f'{"/".join(labels)}: {h.count}x, avg {h.avg * 1000:.1f} ms, p95 {h.quantile(0.95) * 1000:.1f} ms, '
+             f'max {h.max * 1000:.1f} ms' for labels, h in children[:top]]
+    return '\n'.join(lines)
+
+
+#################
+# Utility class #
+#################
+
+class HistoryDumpState(object):
+
+    started_at: datetime
+    channel_progress: Dict[int, float]
+    user_ids: Dict[int, Optional[int]]
+    user_lock: asyncio.Lock
+    messages: int
+    reactions: int
+
+    def __init__(self, channels: List[discord.TextChannel]) -> None:
+        self.started_at = datetime.now()
+        self.channel_progress = {c.id: 0.0 for c in channels}
+        self.user_ids = {}
+        self.user_lock = asyncio.Lock()
+        self.messages = 0
+        self.reactions = 0
+
+    def track(self, channel: discord.TextChannel, message: discord.Message) -> None:
+        # Estimate channel progress by message timestamp (history is loaded oldest first)
+        total = (datetime.utcnow() - channel.created_at).total_seconds()
+        loaded = (message.created_at - channel.created_at).total_seconds()
+        self.channel_progress[channel.id] = min(loaded / total, 1.0) if total > 0 else 1.0
+
+    def finish(self, channel: discord.TextChannel) -> None:
+        self.channel_progress[channel.id] = 1.0
+
+    @property
+    def fraction(self) -> float:
+        if not self.channel_progress:
+            return 1.0
+        return sum(self.channel_progress.values()) / len(self.channel_progress)
+
+    def report(self) -> str:
+        elapsed = (datetime.now() - self.started_at).total_seconds()
+        channels_done = len([p for p in self.channel_progress.values() if p >= 1.0])
+        throughput = self.messages / elapsed if elapsed > 0 else 0
+        lines = [f'{R.NAME.COMMON.CHANNELS}: {channels_done}/{len(self.channel_progress)}',
+                 f'{R.NAME.COMMON.MESSAGES}: {self.messages}',
+                 f'{R.NAME.COMMON.REACTIONS}: {self.reactions}',
+                 f'{R.MESSAGE.STATUS.THROUGHPUT}: {throughput:.1f} msg/s']
+        fraction = self.fraction
+        if 0 < fraction < 1:
+            eta = int(elapsed * (1 - fraction) / fraction)
+            lines.append(f'{R.MESSAGE.STATUS.ETA}: {pretty_seconds(eta)}')
+        return '\n'.join(lines)
+
 
 #####################
 # Utility Extension #
@@ -97,6 +180,130 @@ class UtilityExtension(BotExtension):
             e_count = len(self.bot.extensions)
             await msg.edit(embed=ext.help_embed(f"Overlord Help page [{i + 1}/{e_count}]"))
 
+    def readable_text_channels(self) -> List[discord.TextChannel]:
+        res = []
+        for channel in self.bot.guild.text_channels:
+            if channel == self.bot.control_channel or channel == self.bot.log_channel:
+                continue
+            permissions = channel.permissions_for(self.bot.me)
+            if permissions.read_messages and permissions.read_message_history:
+                res.append(channel)
+        return res
+
+    #################
+    # Async Methods #
+    #################
+
+    async def _resolve_history_user_id(self, d_user: Union[discord.User, discord.Member],
+                                       state: HistoryDumpState) -> Optional[int]:
+        if d_user.id in state.user_ids:
+            return state.user_ids[d_user.id]
+        # Lock prevents concurrent channel loaders from adding same user twice
+        async with state.user_lock:
+            if d_user.id not in state.user_ids:
+                user = await self.s_users.get(d_user)
+                if user is None and self.bot.config.keep_absent_users:
+                    user = await self.s_users.add_user(d_user)
+                state.user_ids[d_user.id] = user.id if user is not None else None
+        return state.user_ids[d_user.id]
+
+    async def _save_history_batch(self, batch: List[discord.Message], state: HistoryDumpState) -> None:
+        # Reaction users are fetched before taking the lock, REST calls do not block live events
+        reaction_users: List[List[Union[discord.User, discord.Member]]] = []
+        for message in batch:
+            d_users = []
+            for reaction in message.reactions:
+                d_users += [d_user async for d_user in reaction.users() if not d_user.bot]
+            reaction_users.append(d_users)
+        # Lock is held per batch, live events are handled in between
+        async with self.bot.sync():
+            # Insert new message events
+            messages, message_reactions = [], []
+            for message, d_users in zip(batch, reaction_users):
+                user_id = await self._resolve_history_user_id(message.author, state)
+                if user_id is not None:
+                    messages.append((user_id, message))
+                    message_reactions.append(d_users)
+            message_event_ids = await self.s_events.bulk_create_new_message_events(messages)
+            # Insert reaction events
+            reactions: List[Tuple[int, int, datetime]] = []
+            for (_, message), d_users in zip(messages, message_reactions):
+                for d_user in d_users:
+                    user_id = await self._resolve_history_user_id(d_user, state)
+                    if user_id is None:
+                        continue
+                    reactions.append((user_id, message_event_ids[message.id], message.created_at))
+            await self.s_events.bulk_create_new_reaction_events(reactions)
+        state.messages += len(messages)
+        state.reactions += len(reactions)
+
+    async def _load_channel_history(self, channel: discord.TextChannel, state: HistoryDumpState,
+                                    before: datetime) -> None:
+        log.info(f'Loading #{channel.name}({channel.id}) history')
+        batch = []
+        # Newer messages are stored by live on_message handler
+        async for message in channel.history(limit=None, before=before, oldest_first=True):
+            # Skip bot messages
+            if message.author.bot:
+                continue
+            batch.append(message)
+            if len(batch) >= HISTORY_BATCH_SIZE:
+                await self._save_history_batch(batch, state)
+                state.track(channel, message)
+                batch = []
+        await self._save_history_batch(batch, state)
+        state.finish(channel)
+        log.info(f'Done loading #{channel.name}({channel.id}) history')
+
+    @staticmethod
+    async def _report_history_progress(progress: ProgressEmbed, state: HistoryDumpState) -> None:
+        while True:
+            await asyncio.sleep(HISTORY_PROGRESS_INTERVAL)
+            progress.set_details(state.report())
+            await progress.update()
+
+    async def load_history(self, channels: List[discord.TextChannel], progress: ProgressEmbed,
+                           before: datetime, concurrency: int = 1) -> None:
+        state = HistoryDumpState(channels)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(channel: discord.TextChannel) -> None:
+            async with semaphore:
+                await self._load_channel_history(channel, state, before)
+            await self.bot.replay_deferred_message_events(channel.id)
+
+        reporter = asyncio.ensure_future(self._report_history_progress(progress, state))
+        loaders = [asyncio.ensure_future(load(c)) for c in channels]
+        try:
+            await asyncio.gather(*loaders)
+        except Exception:
+            for loader in loaders:
+                loader.cancel()
+            raise
+        finally:
+            reporter.cancel()
+            progress.set_details(state.report())
+
+    async def dump_history(self, channels: List[discord.TextChannel], progress: ProgressEmbed,
+                           concurrency: int = 1) -> None:
+        # Edits and deletes of messages not stored yet are held back until their channel is loaded
+        self.bot.defer_missing_message_events(c.id for c in channels)
+        try:
+            async with self.bot.sync():
+                # Drop message history of each channel
+                for channel in channels:
+                    log.warning(f'Dropping #{channel.name}({channel.id}) history')
+                    await self.s_events.clear_text_channel_history(channel)
+                dropped_at = datetime.utcnow()
+
+            # Load all messages, lock is taken per batch
+            await progress.next_step()
+            await self.load_history(channels, progress, dropped_at, concurrency=concurrency)
+        finally:
+            # Channels left unloaded by a failure
+            for channel in channels:
+                await self.bot.replay_deferred_message_events(channel.id)
+
     #########
     # Hooks #
     #########
@@ -210,13 +417,85 @@ class UtilityExtension(BotExtension):
         report += f'{R.NAME.COMMON.CONTROL_CHANNEL}: {self.bot.control_channel.mention}\n'
         if self.bot.log_channel is not None:
             report += f'{R.NAME.COMMON.LOG_CHANNEL}: {self.bot.log_channel.mention}\n'
+        report += f'{R.NAME.COMMON.PRE_READY_EVENTS}: {self.bot.pre_ready_buffered}\n'
         embed = self.bot.new_info_report(R.EMBED.TITLE.SUMMARY, report)
         # Report extensions
         ext_details = [f'✅ {ext.name}' if ext.enabled else f'❌ {ext.name}' for ext in self.bot.extensions]
         embed.add_field(name=R.EMBED.TITLE.EXTENSION_STATUS_LIST, value='\n'.join(ext_details), inline=False)
+        # Report dispatch queues
+        queue_details = [f'{name}: depth {s["depth"]}, handled {s["handled"]}, dropped {s["dropped"]}, '
+                         f'coalesced {s["coalesced"]}, latency {s["latency_avg"] * 1000:.1f}/'
+                         f'{s["latency_max"] * 1000:.1f} ms' for name, s in self.bot.dispatch_stats().items()]
+        if queue_details:
+            embed.add_field(name=R.EMBED.TITLE.DISPATCH_QUEUES, value='\n'.join(queue_details), inline=False)
+        await msg.channel.send(embed=embed)
+
+    @BotExtension.command("metrics", description="Prints performance metrics summary")
+    async def cmd_metrics(self, msg: discord.Message):
+        uptime = time.time() - METRICS.started_at
+        events = sum(c.value for _, c in METRICS.get('overlord_events_total').children())
+        report = f'{R.NAME.COMMON.UPTIME}: {pretty_seconds(int(uptime))}\n'
+        report += f'{R.NAME.COMMON.EVENTS}: {int(events)} ({events / max(uptime, 1):.2f}/s)\n'
+        report += f'{R.NAME.COMMON.PRE_READY_EVENTS}: {self.bot.pre_ready_buffered}\n'
+        embed = self.bot.new_info_report(R.EMBED.TITLE.METRICS, report)
+        sections = [
+            (R.EMBED.TITLE.METRICS_HANDLERS, 'overlord_handler_seconds'),
+            (R.EMBED.TITLE.METRICS_DB, 'overlord_db_call_seconds'),
+            (R.EMBED.TITLE.METRICS_LOCKS, 'overlord_lock_wait_seconds'),
+            (R.EMBED.TITLE.METRICS_TASKS, 'overlord_task_seconds'),
+            (R.EMBED.TITLE.METRICS_REST, 'overlord_rest_seconds'),
+        ]
+        for title, metric_name in sections:
+            summary = histogram_summary(metric_name)
+            if summary:
+                embed.add_field(name=title, value=summary[:1024], inline=False)
         await msg.channel.send(embed=embed)
 
-    @BotExtension.command("dump_channel", description="Fetches whole channel data into db (overwriting)")
+    @BotExtension.command("profile", description="Samples event loop for given seconds (cpu, wall or alloc), "
+                                                 "maintainer only")
+    async def cmd_profile(self, msg: discord.Message, seconds: int, opt_mode: str = PROFILE_CPU):
+        if msg.author.id != self.bot.maintainer.id:
+            await msg.channel.send(R.MESSAGE.ERROR.NO_ACCESS)
+            return
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            await msg.channel.send(f'{R.MESSAGE.ERROR.INVALID_ARGUMENT} "seconds" -> 1..{PROFILE_MAX_SECONDS}')
+            return
+        if opt_mode not in PROFILE_MODES:
+            await msg.channel.send(f'{R.MESSAGE.ERROR.INVALID_ARGUMENT} "mode" -> {", ".join(PROFILE_MODES)}')
+            return
+        if is_profiling():
+            await msg.channel.send(R.MESSAGE.STATUS.BUSY)
+            return
+        await msg.channel.send(f'{R.MESSAGE.STATUS.PROFILING} ({opt_mode}, {seconds}s)')
+        report = await profile_event_loop(seconds, opt_mode)
+        files = [discord.File(io.BytesIO(report.top(PROFILE_TOP_N).encode()), filename=f'profile-{opt_mode}.txt'),
+                 discord.File(io.BytesIO(report.collapsed().encode()), filename=f'profile-{opt_mode}.collapsed')]
+        await msg.channel.send(R.MESSAGE.STATUS.SUCCESS, files=files)
+
+    @BotExtension.command("query_stats", description="Prints slowest statements by total time")
+    async def cmd_query_stats(self, msg: discord.Message, opt_top: int = 5):
+        query_log = self.bot.services.db.query_log
+        if not query_log.enabled:
+            await msg.channel.send(R.MESSAGE.STATUS.QUERY_STATS_DISABLED)
+            return
+        lines = []
+        for shape, stats in query_log.top(opt_top):
+            p50, p95, p99 = stats.percentiles(0.5, 0.95, 0.99)
+            lines.append(f'**{stats.total * 1000:.0f} ms** {stats.count}x, p50/p95/p99 '
+                         f'{p50 * 1000:.1f}/{p95 * 1000:.1f}/{p99 * 1000:.1f} ms\n'
+                         f'`{shape[:QUERY_STATS_SHAPE_LIMIT]}`')
+        embed = self.bot.new_info_report(R.EMBED.TITLE.QUERY_STATS, '\n'.join(lines)[:4096])
+        report = discord.File(io.BytesIO(query_log.report(QUERY_STATS_REPORT_SIZE).encode()),
+                              filename='query-stats.txt')
+        await msg.channel.send(embed=embed, file=report)
+
+    @BotExtension.command("reset_query_stats", description="Clears statement statistics")
+    async def cmd_reset_query_stats(self, msg: discord.Message):
+        self.bot.services.db.query_log.reset()
+        await msg.channel.send(R.MESSAGE.STATUS.SUCCESS)
+
+    @BotExtension.command("dump_channel", description="Fetches whole channel data into db (overwriting), "
+                                                       "reactions are dated by their message")
     async def cmd_dump_channel(self, msg: discord.Message, channel: discord.TextChannel):
         permissions = channel.permissions_for(self.bot.me)
         if not permissions.read_message_history:
@@ -228,37 +507,29 @@ class UtilityExtension(BotExtension):
         progress.add_step(f'{R.MESSAGE.STATUS.DB_LOAD_CHANNEL} {channel.mention}')
         await progress.start(msg.channel)
         try:
-            # Transaction begins
-            async with self.bot.sync():
-
-                # Drop full channel message history
-                log.warning(f'Dropping #{channel.name}({channel.id}) history')
-                await self.s_events.clear_text_channel_history(channel)
-
-                # Load all messages
-                log.warning(f'Loading #{channel.name}({channel.id}) history')
-                await progress.next_step()
-                async for message in channel.history(limit=None, oldest_first=True):
-
-                    # Skip bot messages
-                    if message.author.bot:
-                        continue
-
-                    # Resolve user
-                    user = await self.s_users.get(message.author)
-                    if user is None and self.bot.config.keep_absent_users:
-                        user = await self.s_users.add_user(message.author)
-
-                    # Skip users not in db
-                    if user is None:
-                        continue
+            await self.dump_history([channel], progress)
+            log.info(f'Done')
+        except Exception:
+            await progress.finish(failed=True)
+            raise
+        await progress.finish()
 
-                    # Insert new message event
-                    await self.s_events.create_new_message_event(user, message)
+    @BotExtension.command("dump_guild", description="Fetches all readable text channels data into db "
+                                                     "(overwriting), reactions are dated by their message")
+    async def cmd_dump_guild(self, msg: discord.Message, opt_concurrency: int = 4):
+        if opt_concurrency < 1:
+            await msg.channel.send(f'{R.MESSAGE.ERROR.INVALID_ARGUMENT} "concurrency" -> positive int')
+            return
+        channels = self.readable_text_channels()
 
-                log.info(f'Done')
+        progress = self.new_progress(f'{R.MESSAGE.STATUS.DB_LOAD_GUILD}')
+        progress.add_step(R.MESSAGE.STATUS.DB_CLEAR_CHANNEL)
+        progress.add_step(f'{R.MESSAGE.STATUS.DB_LOAD_GUILD} ({len(channels)} {R.NAME.COMMON.CHANNELS.lower()})')
+        await progress.start(msg.channel)
+        try:
+            await self.dump_history(channels, progress, concurrency=opt_concurrency)
+            log.info(f'Done')
         except Exception:
             await progress.finish(failed=True)
             raise
         await progress.finish()
-
@@ -29,9 +29,15 @@ SOFTWARE.
 
 __author__ = "Mathtin"
 
+import time
+
+# Import time is a startup phase too
+_started_at = time.perf_counter()
+
 import argparse
 import os
 import sys
+from typing import Any
 
 from dotenv import load_dotenv
 
@@ -43,9 +49,13 @@ from db import DBConnection
 from services.provider import ServiceProvider
 from overlord import OverlordRootConfig
 from overlord.bot import Overlord
+from util.startup import STARTUP
 from extensions import UtilityExtension, RankingExtension, ConfigExtension, StatsExtension, InviteExtension
 from extensions import RankingRootConfig, InviteRootConfig
 
+STARTUP.begin(_started_at)
+STARTUP.record('imports', _started_at)
+
 
 class ExtensionsConfig(ConfigView):
     """
@@ -72,9 +82,18 @@ class RootConfig(ConfigView):
 class Configuration(ConfigManager):
     config: RootConfig
 
-    def alter(self, raw: str) -> None:
-        super().alter(raw)
+    def apply(self, raw: str, raw_dict: dict, config: RootConfig) -> None:
+        super().apply(raw, raw_dict, config)
+        update_logger(self.config.logger)
+
+    def set_raw(self, path: str, assignment: str) -> None:
+        super().set_raw(path, assignment)
+        update_logger(self.config.logger)
+
+    def set(self, path: str, value: Any) -> Any:
+        res = super().set(path, value)
         update_logger(self.config.logger)
+        return res
 
 
 def main(argv):
@@ -85,7 +104,8 @@ def main(argv):
     args = parser.parse_args(argv[1:])
 
     # Load config
-    cnf_manager = Configuration(args.config)
+    with STARTUP.phase('config'):
+        cnf_manager = Configuration(args.config)
 
     # Init database
     url = os.getenv('DATABASE_ACCESS_URL')
@@ -95,27 +115,30 @@ def main(argv):
     if 'postgresql' in url:
         import db.queries as q
         q.MODE = q.MODE_POSTGRESQL
-    connection = DBConnection(url)
-    services = ServiceProvider(connection)
-
-    # Init bot
-    discord_bot = Overlord(cnf_manager, services)
-
-    # Init extensions
-    extras_ext = UtilityExtension(bot=discord_bot)
-    stats_ext = StatsExtension(bot=discord_bot)
-    ranking_ext = RankingExtension(bot=discord_bot, priority=1)
-    conf_ext = ConfigExtension(bot=discord_bot)
-    # invite_ext = InviteExtension(bot=discord_bot)
-
-    # Attach extensions
-    discord_bot.extend(extras_ext)
-    discord_bot.extend(conf_ext)
-    discord_bot.extend(stats_ext)
-    discord_bot.extend(ranking_ext)
-    # discord_bot.extend(invite_ext)
-
-    # Start bot
+    with STARTUP.phase('database'):
+        connection = DBConnection(url)
+    with STARTUP.phase('services'):
+        services = ServiceProvider(connection)
+
+    with STARTUP.phase('bot'):
+        # Init bot
+        discord_bot = Overlord(cnf_manager, services)
+
+        # Init extensions
+        extras_ext = UtilityExtension(bot=discord_bot)
+        stats_ext = StatsExtension(bot=discord_bot)
+        ranking_ext = RankingExtension(bot=discord_bot, priority=1)
+        conf_ext = ConfigExtension(bot=discord_bot)
+        # invite_ext = InviteExtension(bot=discord_bot)
+
+        # Attach extensions
+        discord_bot.extend(extras_ext)
+        discord_bot.extend(conf_ext)
+        discord_bot.extend(stats_ext)
+        discord_bot.extend(ranking_ext)
+        # discord_bot.extend(invite_ext)
+
+    # Start bot, gateway connection and ready handling are reported by bot
     discord_bot.run()
 
     return 0
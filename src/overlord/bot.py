@@ -33,25 +33,46 @@ import asyncio
 import logging
 import os
 import sys
+import time
 import traceback
-from typing import Dict, List, Callable, Awaitable, Optional, Union, Any, Tuple
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Callable, Awaitable, Optional, Union, Any, Tuple, Deque, Set, Iterable
 
 import discord
 
 import db as DB
 from services.provider import ServiceProvider
 from util import parse_control_message, limit_traceback
-from util.config import ConfigManager
+from util.config import ConfigManager, ConfigDiff, ConfigWatcher
 from util.exceptions import InvalidConfigException, NotCoroutineException
 from util.extbot import qualified_name, is_dm_message, filter_roles, is_text_channel
 from util.extbot import skip_bots, after_initialized, guild_member_event, get_coroutine_attrs
 from util.logger import DiscordLogConfig
+from util.metrics import METRICS, MeteredLock, MetricsServer
+from util.recorder import GatewayRecorder
+from util.startup import STARTUP
+from util.watchdog import LoopWatchdog, REPORT_STALL, REPORT_LOCK_HOLD
 from util.resources import STRINGS as R
+from .dispatch import ExtensionWorkQueue, run_queued_levels, metered_handler, QUEUE_DEPTH
+from .dispatch import DISPATCH_MODES, DISPATCH_QUEUED, OVERFLOW_POLICIES
 from .types import OverlordMessageDelete, OverlordMember, OverlordMessage, OverlordMessageEdit, OverlordReaction, \
     OverlordRole, OverlordVCState, IBotExtension, OverlordRootConfig
 
 log = logging.getLogger('overlord-bot')
 
+# Events dispatched regardless of initialization state
+PRE_READY_SKIP_EVENTS = ('ready', 'error', 'config_update')
+
+# Lifecycle call plans always run inline (config errors must reach the caller)
+INLINE_CALL_PLANS = ('on_ready',)
+
+EVENTS_TOTAL = METRICS.counter('overlord_events_total', 'Events passed to extension call plans', ('event',))
+PRE_READY_BUFFERED = METRICS.gauge('overlord_pre_ready_buffered', 'Events buffered before ready')
+REST_SECONDS = METRICS.histogram('overlord_rest_seconds', 'Outbound Discord REST call latency', ('method', 'route'))
+REST_ERRORS = METRICS.counter('overlord_rest_errors_total', 'Failed outbound Discord REST calls',
+                              ('method', 'route', 'status'))
+
 
 #############################
 # Main class implementation #
@@ -59,12 +80,24 @@ log = logging.getLogger('overlord-bot')
 
 class Overlord(discord.Client):
     # Internal stuff
-    _async_lock: asyncio.locks
+    _async_lock: MeteredLock
     _initialized: bool
+    _ready_gate: asyncio.Event
+    _pre_ready_events: Deque[Tuple[Callable[..., Awaitable[None]], str, tuple, dict]]
+    _pre_ready_overflow: bool
     _extensions: List[IBotExtension]
     _handlers: Dict[str, Callable[..., Awaitable[None]]]
-    _call_plan_map: Dict[str, List[List[Callable[..., Awaitable[None]]]]]
+    _call_plan_map: Dict[str, List[List[Tuple[IBotExtension, Callable[..., Awaitable[None]]]]]]
+    _work_queues: Dict[IBotExtension, ExtensionWorkQueue]
+    _pending_call_plans: Set[asyncio.Future]
+    _metrics_server: Optional[MetricsServer]
+    _watchdog: Optional[LoopWatchdog]
+    _recorder: Optional[GatewayRecorder]
+    _config_watcher: Optional[ConfigWatcher]
     _cmd_cache: Dict[str, Callable[..., Awaitable[None]]]
+    _applied_config: Optional[dict]
+    # Channel id -> edit/delete payloads of messages not stored yet, replayed after history dump
+    _deferred_message_events: Dict[int, List[Tuple[Callable[[Any], Awaitable[None]], Any]]]
 
     # Members loaded from ENV
     _token: str
@@ -77,6 +110,9 @@ class Overlord(discord.Client):
     log_config: DiscordLogConfig
     services: ServiceProvider
 
+    # Metrics
+    pre_ready_buffered: int
+
     # Values initiated on_ready
     guild: discord.Guild
     control_channel: discord.TextChannel
@@ -95,19 +131,35 @@ class Overlord(discord.Client):
         super().__init__(intents=intents)
 
         # Init internal fields
-        self._async_lock = asyncio.Lock()
+        self._async_lock = MeteredLock('overlord')
         self._initialized = False
+        self._ready_gate = asyncio.Event()
+        self._pre_ready_events = deque()
+        self._pre_ready_overflow = False
+        self.pre_ready_buffered = 0
         self.log_channel = None
         self._extensions = []
         handlers = get_coroutine_attrs(self, name_filter=lambda x: x.startswith('on_'))
         self._handlers = {n.replace('_raw', ''): h for n, h in handlers.items()}
         self._call_plan_map = {}
+        self._work_queues = {}
+        self._pending_call_plans = set()
+        self._metrics_server = None
+        self._watchdog = None
+        self._recorder = None
+        self._config_watcher = None
         self._cmd_cache = {}
+        self._applied_config = None
+        self._deferred_message_events = {}
+        PRE_READY_BUFFERED.set_function(lambda: self.pre_ready_buffered)
+        self._meter_http()
 
         # Set user supplied fields
         self.cnf_manager = cnf_manager
         self.reload_sections()
         self.services = services
+        # Recording starts before login to capture ready payloads
+        self._update_recorder()
 
         # Load env values
         self._token = os.getenv('DISCORD_TOKEN')
@@ -126,7 +178,8 @@ class Overlord(discord.Client):
         for extension in self._extensions:
             if not hasattr(extension, handler_name):
                 continue
-            call_plan[extension.priority].append(getattr(extension, handler_name))
+            handler = metered_handler(handler_name, type(extension).__name__, getattr(extension, handler_name))
+            call_plan[extension.priority].append((extension, handler))
         self._call_plan_map[handler_name] = [call for call in call_plan if call]
 
     def _find_cmd_handler(self, name: str) -> Callable[..., Awaitable[None]]:
@@ -142,10 +195,178 @@ class Overlord(discord.Client):
 
     async def _run_call_plan(self, name: str, *args, **kwargs) -> None:
         call_plan = self._call_plan_map[name]
+        EVENTS_TOTAL.labels(name).inc()
+        if self._work_queues and name not in INLINE_CALL_PLANS:
+            return await self._run_queued_call_plan(call_plan, args, kwargs)
         for handlers in call_plan:
-            calls = [h(*args, **kwargs) for h in handlers]
+            calls = [h(*args, **kwargs) for _, h in handlers]
             await asyncio.gather(*calls)
 
+    async def _run_queued_call_plan(self, call_plan: List[List[Tuple[IBotExtension, Callable[..., Awaitable[None]]]]],
+                                    args: tuple, kwargs: dict) -> None:
+        if not call_plan:
+            return
+        levels = [[(self._work_queues[ext], h) for ext, h in handlers] for handlers in call_plan]
+        # Only the first level is submitted inline, so 'block' overflow throttles the gateway handler
+        pending = [await queue.submit(h, args, kwargs) for queue, h in levels[0]]
+        if len(levels) == 1:
+            return
+        task = asyncio.ensure_future(run_queued_levels(levels[1:], args, kwargs, pending))
+        self._pending_call_plans.add(task)
+        task.add_done_callback(self._pending_call_plans.discard)
+
+    async def _run_config_update_plan(self, changes: ConfigDiff) -> None:
+        EVENTS_TOTAL.labels('on_config_update').inc()
+        for handlers in self._call_plan_map['on_config_update']:
+            calls = []
+            # Extensions are notified only about sections they depend on
+            for ext, h in handlers:
+                ext_changes = ext.config_changes(changes)
+                if ext_changes:
+                    calls.append(h(ext_changes))
+            await asyncio.gather(*calls)
+
+    def _update_dispatch(self) -> None:
+        config = self.config.dispatch
+        if config.mode not in DISPATCH_MODES:
+            raise InvalidConfigException(f"Invalid dispatch mode: '{config.mode}'", config.path('mode'))
+        ext_names = {type(ext).__name__ for ext in self._extensions}
+        for name, ext_config in config.extension.items():
+            if name not in ext_names:
+                raise InvalidConfigException(f"No such extension: '{name}'", config.path(f'extension.{name}'))
+        old_queues, self._work_queues = self._work_queues, {}
+        if config.mode == DISPATCH_QUEUED:
+            for ext in self._extensions:
+                ext_config = config.extension.get(type(ext).__name__)
+                size = ext_config.queue_size if ext_config is not None and ext_config.queue_size else config.queue_size
+                concurrency = ext_config.concurrency if ext_config is not None and ext_config.concurrency \
+                    else config.concurrency
+                overflow = ext_config.overflow if ext_config is not None and ext_config.overflow else config.overflow
+                if overflow not in OVERFLOW_POLICIES:
+                    raise InvalidConfigException(f"Invalid overflow policy: '{overflow}'", config.path('overflow'))
+                queue = old_queues.get(ext)
+                if queue is None or (queue.size, queue.concurrency, queue.overflow) != (size, concurrency, overflow):
+                    queue = ExtensionWorkQueue(ext.name, size, concurrency, overflow, self.on_error)
+                self._work_queues[ext] = queue
+        # Replaced queues finish what is already queued
+        for ext, queue in old_queues.items():
+            if self._work_queues.get(ext) is not queue:
+                asyncio.ensure_future(queue.close())
+            if ext not in self._work_queues:
+                QUEUE_DEPTH.remove(queue.name)
+
+    def _meter_http(self) -> None:
+        request = self.http.request
+
+        async def metered_request(route, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await request(route, **kwargs)
+            except discord.HTTPException as e:
+                REST_ERRORS.labels(route.method, route.path, str(e.status)).inc()
+                raise
+            finally:
+                REST_SECONDS.labels(route.method, route.path).observe(time.perf_counter() - started_at)
+
+        self.http.request = metered_request
+
+    async def _update_metrics_server(self) -> None:
+        config = self.config.metrics
+        server = self._metrics_server
+        if server is not None and (server.host, server.port) == (config.host, config.port):
+            return
+        if server is not None:
+            await server.stop()
+            self._metrics_server = None
+        if config.port == 0:
+            return
+        server = MetricsServer(config.host, config.port)
+        try:
+            await server.start()
+        except OSError as e:
+            raise InvalidConfigException(f'Failed to serve metrics: {e}', self.config.metrics.path('port'))
+        self._metrics_server = server
+
+    def _update_watchdog(self) -> None:
+        config = self.config.watchdog
+        if config.stall_ms <= 0:
+            raise InvalidConfigException(f'Stall threshold should be positive', config.path('stall_ms'))
+        if config.lock_hold_ms <= 0:
+            raise InvalidConfigException(f'Lock hold threshold should be positive', config.path('lock_hold_ms'))
+        if self._watchdog is not None:
+            self._watchdog.stop()
+            self._watchdog = None
+        if not config.enabled:
+            return
+        self._watchdog = LoopWatchdog(config.stall_ms, config.lock_hold_ms, config.report_interval,
+                                      self._send_watchdog_report)
+        self._watchdog.start()
+
+    def _update_recorder(self) -> None:
+        config = self.config.recorder
+        if config.max_bytes < 0:
+            raise InvalidConfigException(f'Negative capture file size', config.path('max_bytes'))
+        if config.backup_count < 0:
+            raise InvalidConfigException(f'Negative capture backup count', config.path('backup_count'))
+        recorder = self._recorder
+        if recorder is not None and \
+                (recorder.path, recorder.max_bytes, recorder.backup_count) == \
+                (config.file, config.max_bytes, config.backup_count):
+            return
+        if recorder is not None:
+            recorder.stop()
+            self._recorder = None
+        if not config.file:
+            return
+        self._recorder = GatewayRecorder(config.file, config.max_bytes, config.backup_count)
+        self._recorder.start()
+
+    def _load_config_file(self) -> Tuple[str, dict, Any]:
+        with open(self.cnf_manager.path, 'r') as f:
+            raw = f.read()
+        return (raw, *self.cnf_manager.load(raw, cache=True))
+
+    def _update_config_watch(self) -> None:
+        config = self.config.config_watch
+        if config.interval_ms <= 0:
+            raise InvalidConfigException(f'Config watch interval should be positive', config.path('interval_ms'))
+        watcher = self._config_watcher
+        if watcher is not None and config.enabled and watcher.interval == config.interval_ms / 1000:
+            return
+        if watcher is not None:
+            watcher.stop()
+            self._config_watcher = None
+        if not config.enabled:
+            return
+        self._config_watcher = ConfigWatcher(self.cnf_manager, config.interval_ms, self._on_config_file_change,
+                                             self._on_config_file_error)
+        self._config_watcher.start()
+
+    async def _on_config_file_change(self, raw: str, raw_dict: dict, config: Any) -> None:
+        if self.cnf_manager.dirty:
+            log.warning(f'Unsaved config edits are discarded by config file change')
+        err = await self.safe_apply_config(raw, raw_dict, config)
+        if err is not None:
+            await self._on_config_file_error(err)
+
+    async def _on_config_file_error(self, e: Exception) -> None:
+        await self.send_error(R.EMBED.TITLE.CONFIG_RELOAD_FAILED, str(e))
+
+    async def _send_watchdog_report(self, kind: str, details: str, stack: List[str]) -> None:
+        if self.log_channel is None:
+            return
+        titles = {REPORT_STALL: R.EMBED.TITLE.LOOP_STALL, REPORT_LOCK_HOLD: R.EMBED.TITLE.LOCK_HOLD}
+        embed = self.new_warn_report(titles.get(kind, kind), details)
+        if stack:
+            # Innermost frames matter most
+            stack_report = ''
+            for frame in reversed(stack):
+                if len(stack_report) + len(frame) > 1000:
+                    break
+                stack_report = frame + stack_report
+            embed.add_field(name=R.NAME.COMMON.TRACEBACK, value=f'```python\n{stack_report}\n```', inline=False)
+        await self.log_channel.send(embed=embed)
+
     ###########
     # Getters #
     ###########
@@ -158,9 +379,12 @@ class Overlord(discord.Client):
     def prefix(self) -> str:
         return self.config.control.prefix
 
-    def sync(self) -> asyncio.Lock:
+    def sync(self) -> MeteredLock:
         return self._async_lock
 
+    def dispatch_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {queue.name: queue.stats() for queue in self._work_queues.values()}
+
     def is_guild_member(self, member: discord.Member) -> bool:
         return member.guild.id == self.guild.id
 
@@ -190,6 +414,20 @@ class Overlord(discord.Client):
     def get_config_section(self, section_type: Any) -> Any:
         return self.cnf_manager.find_section(section_type)
 
+    def defer_missing_message_events(self, channel_ids: Iterable[int]) -> None:
+        for channel_id in channel_ids:
+            self._deferred_message_events.setdefault(channel_id, [])
+
+    def _defer_message_event(self, handler: Callable[[Any], Awaitable[None]], payload: Any) -> None:
+        deferred = self._deferred_message_events.get(payload.channel_id)
+        if deferred is not None:
+            deferred.append((handler, payload))
+
+    async def replay_deferred_message_events(self, channel_id: int) -> None:
+        # Channel is not deferred anymore, replayed events find their messages or are ignored as absent
+        for handler, payload in self._deferred_message_events.pop(channel_id, []):
+            await handler(payload)
+
     ##########
     # Embeds #
     ##########
@@ -319,6 +557,38 @@ class Overlord(discord.Client):
                     raise InvalidConfigException(f"Command alias collision for {alias}: {cmd}", "bot.commands")
                 self._cmd_cache[alias] = handler
 
+    def dispatch(self, event: str, *args, **kwargs) -> None:
+        if event == 'socket_response' and self._recorder is not None:
+            self._recorder.record(args[0])
+        super().dispatch(event, *args, **kwargs)
+
+    def _schedule_event(self, coro, event_name: str, *args, **kwargs):
+        # Only handler invocation is buffered, wait_for listeners are resolved by dispatch right away
+        if not self._initialized and self._buffer_pre_ready_event(coro, event_name, args, kwargs):
+            return None
+        return super()._schedule_event(coro, event_name, *args, **kwargs)
+
+    def _buffer_pre_ready_event(self, coro, event_name: str, args: tuple, kwargs: dict) -> bool:
+        if event_name[len('on_'):] in PRE_READY_SKIP_EVENTS:
+            return False
+        if self._pre_ready_overflow or len(self._pre_ready_events) >= self.config.pre_ready_buffer:
+            # Keep order: once full, later events wait on the gate in their own handlers
+            self._pre_ready_overflow = True
+            return False
+        self._pre_ready_events.append((coro, event_name, args, kwargs))
+        self.pre_ready_buffered += 1
+        return True
+
+    def _open_ready_gate(self) -> None:
+        self._initialized = True
+        if self._pre_ready_events:
+            log.info(f'Replaying {len(self._pre_ready_events)} events received before ready')
+        # Replayed handlers are scheduled before handlers waiting on the gate
+        while self._pre_ready_events:
+            coro, event_name, args, kwargs = self._pre_ready_events.popleft()
+            super()._schedule_event(coro, event_name, *args, **kwargs)
+        self._ready_gate.set()
+
     #################
     # Async methods #
     #################
@@ -326,12 +596,24 @@ class Overlord(discord.Client):
     async def logout(self) -> None:
         for ext in self._extensions:
             ext.stop()
+        for queue in self._work_queues.values():
+            queue.cancel()
+        if self._metrics_server is not None:
+            await self._metrics_server.stop()
+            self._metrics_server = None
+        if self._watchdog is not None:
+            self._watchdog.stop()
+            self._watchdog = None
+        if self._recorder is not None:
+            self._recorder.stop()
+            self._recorder = None
+        if self._config_watcher is not None:
+            self._config_watcher.stop()
+            self._config_watcher = None
         return await super().logout()
 
     async def init_lock(self) -> None:
-        while not self._initialized:
-            await asyncio.sleep(0.1)
-        return
+        await self._ready_gate.wait()
 
     async def send_error(self, from_: str, msg: str) -> None:
         error_report = self.new_error_report(from_, msg)
@@ -358,13 +640,28 @@ class Overlord(discord.Client):
         log.info('Syncing roles')
         await self.services.role.load(self.guild.roles)
         log.info(f'Syncing users')
-        await self.services.user.mark_everyone_absent()
+        await self.services.user.load_fingerprints()
+        present, merged, new_members = set(), 0, []
         async for member in self.guild.fetch_members(limit=None):
             if member.bot:
                 continue
+            present.add(member.id)
+            # Stored row (and its join event) is up to date
+            if not self.services.user.is_member_changed(member):
+                continue
+            # Not stored at all, loaded in bulk below
+            if member.id not in self.services.user.fingerprints:
+                new_members.append(member)
+                continue
             # Update and repair
             user = await self.services.user.merge_member(member)
             await self.services.event.repair_member_joined_event(member, user)
+            merged += 1
+        if new_members:
+            ids = await self.services.user.bulk_create_members(new_members)
+            await self.services.event.bulk_create_member_join_events([(ids[m.id], m.joined_at) for m in new_members])
+        await self.services.user.mark_absent_except(present)
+        log.info(f'Merged {merged} and added {len(new_members)} of {len(present)} members')
         # Remove effectively absent
         if not self.config.keep_absent_users:
             await self.services.user.remove_absent()
@@ -376,6 +673,21 @@ class Overlord(discord.Client):
         async with self.sync():
             await self._sync_users()
 
+    async def _sync_voice_sessions(self, last_seen: Optional[datetime]):
+        log.info(f'Syncing voice sessions')
+        members = [(member, channel) for channel in self.guild.voice_channels for member in channel.members
+                   if not member.bot and member.voice is not None and self.check_afk_state(member.voice)]
+        user_ids = await self.services.user.get_ids([member for member, _ in members])
+        present = {(user_ids[member.id], channel.id) for member, channel in members if member.id in user_ids}
+        closed, opened = await self.services.stat.reconcile_vc_sessions(present, last_seen)
+        log.info(f'Syncing voice sessions is done (closed: {closed}, opened: {opened})')
+
+    async def sync_voice_sessions(self, last_seen: Optional[datetime], no_lock: bool = False) -> None:
+        if no_lock:
+            return await self._sync_voice_sessions(last_seen)
+        async with self.sync():
+            await self._sync_voice_sessions(last_seen)
+
     async def alter_config(self, config: str) -> None:
         log.info(f'Altering configuration')
         self.cnf_manager.alter(config)
@@ -399,7 +711,8 @@ class Overlord(discord.Client):
         await self.on_config_update()
 
     async def safe_update_config(self) -> Optional[Exception]:
-        old_config = self.cnf_manager.raw
+        # In-place edits are already applied, revert goes to last applied document
+        old_config = self.cnf_manager.applied_raw
         try:
             await self.update_config()
         except (InvalidConfigException, TypeError) as e:
@@ -408,12 +721,37 @@ class Overlord(discord.Client):
             return e
         return None
 
-    async def reload_config(self) -> None:
-        log.info(f'Altering configuration')
-        self.cnf_manager.reload()
+    async def apply_config(self, raw: str, raw_dict: dict, config: Any) -> None:
+        log.info(f'Applying configuration')
+        self.cnf_manager.apply(raw, raw_dict, config)
         self.reload_sections()
         await self.on_config_update()
 
+    async def safe_apply_config(self, raw: str, raw_dict: dict, config: Any) -> Optional[Exception]:
+        manager = self.cnf_manager
+        if manager.dirty:
+            # In-place edits are dropped, applied document is parsed off the loop
+            loop = asyncio.get_running_loop()
+            old_raw_dict, old_config = await loop.run_in_executor(None, manager.load, manager.applied_raw, True)
+        else:
+            # Applied document is still parsed in memory
+            old_raw_dict, old_config = manager.raw_dict, manager.config
+        old_raw = manager.applied_raw
+        try:
+            await self.apply_config(raw, raw_dict, config)
+        except Exception as e:
+            log.warning(f'Invalid config data: {e}. Reverting.')
+            await self.apply_config(old_raw, old_raw_dict, old_config)
+            return e
+        return None
+
+    async def reload_config(self) -> None:
+        log.info(f'Reloading configuration')
+        # Parsing is left to worker thread, loop is busy with gateway events
+        loop = asyncio.get_running_loop()
+        raw, raw_dict, config = await loop.run_in_executor(None, self._load_config_file)
+        await self.apply_config(raw, raw_dict, config)
+
     #########
     # Hooks #
     #########
@@ -454,6 +792,7 @@ class Overlord(discord.Client):
 
             Completely initialize bot state
         """
+        STARTUP.mark('connect')
         # Attach guild
         self.guild = self.get_guild(self._guild_id)
         if self.guild is None:
@@ -470,14 +809,20 @@ class Overlord(discord.Client):
         log.info(f'Maintainer is {qualified_name(self.maintainer)} ({self.maintainer.id})')
         # Resolve bot as member
         self.me = await self.guild.fetch_member(self.user.id)
+        # Last event of previous run, taken before syncing writes new ones
+        last_seen = await self.services.event.get_last_event_time()
         # Sync roles and users
         await self.sync_users()
+        # Close sessions left open by a restart and open sessions for members already in voice
+        await self.sync_voice_sessions(last_seen)
         # Start extensions
         for ext in self._extensions:
             ext.start()
         # Check config value
         await self.on_config_update()
-        self._initialized = True
+        self._open_ready_gate()
+        STARTUP.mark('ready')
+        STARTUP.finish()
         # Call 'on_ready' extension handlers
         await self._run_call_plan('on_ready')
         # Report success
@@ -495,21 +840,32 @@ class Overlord(discord.Client):
 
     async def on_config_update(self) -> None:
         log.info(f'Checking configuration')
-        for i, role_name in enumerate(self.config.control.roles):
-            if self.get_role(role_name) is None:
-                raise InvalidConfigException(f"No such role: '{role_name}'", self.config.control.path(f'roles[{i}]'))
-        self.update_command_cache()
+        applied_config = self.cnf_manager.config.to_dict()
+        changes = ConfigDiff.compute(self._applied_config, applied_config)
+        if not changes:
+            log.info(f'Configuration is not changed')
+            return
+        # Failed update leaves state partially applied, so next one is checked from scratch
+        self._applied_config = None
+        if changes.touches(self.config.path('control.roles')):
+            for i, role_name in enumerate(self.config.control.roles):
+                if self.get_role(role_name) is None:
+                    raise InvalidConfigException(f"No such role: '{role_name}'",
+                                                 self.config.control.path(f'roles[{i}]'))
+        if changes.touches(self.config.path('command')):
+            self.update_command_cache()
         # Attach control channel
-        channel = self.get_channel(self.config.control.channel)
-        if channel is None:
-            raise InvalidConfigException(f'Control channel id is invalid', self.config.control.path('channel'))
-        if not is_text_channel(channel):
-            raise InvalidConfigException(f"{channel.name}({channel.id}) is not text channel",
-                                         self.config.control.path('channel'))
-        log.info(f'Attached to {channel.name} as control channel ({channel.id})')
-        self.control_channel = channel
+        if changes.touches(self.config.path('control.channel')):
+            channel = self.get_channel(self.config.control.channel)
+            if channel is None:
+                raise InvalidConfigException(f'Control channel id is invalid', self.config.control.path('channel'))
+            if not is_text_channel(channel):
+                raise InvalidConfigException(f"{channel.name}({channel.id}) is not text channel",
+                                             self.config.control.path('channel'))
+            log.info(f'Attached to {channel.name} as control channel ({channel.id})')
+            self.control_channel = channel
         # Attach error channel
-        if self.log_config.channel != 0:
+        if self.log_config.channel != 0 and changes.touches(self.log_config.path('channel')):
             channel = self.get_channel(self.log_config.channel)
             if channel is None:
                 raise InvalidConfigException(f'Error channel id is invalid', self.log_config.path('channel'))
@@ -518,8 +874,26 @@ class Overlord(discord.Client):
                                              self.log_config.path('channel'))
             log.info(f'Attached to {channel.name} as logging channel ({channel.id})')
             self.log_channel = channel
+        if changes.touches(self.config.path('dispatch')):
+            self._update_dispatch()
+        if changes.touches(self.config.path('metrics')):
+            await self._update_metrics_server()
+        # Configure query log
+        if changes.touches(self.config.path('database')):
+            db_config = self.config.database
+            if db_config.slow_query_ms < 0:
+                raise InvalidConfigException(f'Negative slow query threshold', db_config.path('slow_query_ms'))
+            self.services.db.query_log.configure(db_config.statement_stats, db_config.slow_query_ms,
+                                                 db_config.slow_query_params)
+        if changes.touches(self.config.path('watchdog')):
+            self._update_watchdog()
+        if changes.touches(self.config.path('recorder')):
+            self._update_recorder()
+        if changes.touches(self.config.path('config_watch')):
+            self._update_config_watch()
         # Call extension 'on_config_update' handlers
-        await self._run_call_plan('on_config_update')
+        await self._run_config_update_plan(changes)
+        self._applied_config = applied_config
 
     @after_initialized
     @skip_bots
@@ -580,9 +954,10 @@ class Overlord(discord.Client):
         if self.is_special_channel_id(payload.channel_id):
             return
         async with self.sync():
-            # ignore absent
+            # ignore absent, unless its channel history is being loaded
             msg = await self.services.event.get_new_message_event_by_did(payload.message_id)
             if msg is None:
+                self._defer_message_event(self.on_raw_message_edit, payload)
                 return
             # Save event
             msg_edit = await self.services.event.create_message_edit_event(msg)
@@ -604,6 +979,7 @@ class Overlord(discord.Client):
                 return
             msg = await self.services.event.get_new_message_event_by_did(payload.message_id)
             if msg is None:
+                self._defer_message_event(self.on_raw_message_delete, payload)
                 return
             # Save event
             msg_delete = await self.services.event.create_message_delete_event(msg)
@@ -644,12 +1020,14 @@ class Overlord(discord.Client):
             return
         async with self.sync():
             # Skip absent
-            user = await self.services.user.get(before)
-            if user is None:
+            if not self.services.user.is_member_stored(before):
                 log.warning(f'{qualified_name(after)} does not exist in db! Skipping user update event!')
                 return
-            # Update user
-            await self.services.user.merge_member(after)
+            # Fingerprint is checked first, unchanged users are only read
+            if self.services.user.is_member_changed(after):
+                user = await self.services.user.merge_member(after)
+            else:
+                user = await self.services.user.get(before)
         # Call extension 'on_member_update' handlers
         await self._run_call_plan('on_member_update', OverlordMember(before, user), OverlordMember(after, user))
 
@@ -727,8 +1105,8 @@ class Overlord(discord.Client):
             if user is None:
                 log.warning(f'{qualified_name(member)} does not exist in db! Skipping vc leave event!')
                 return
-            # Close event
-            events = await self.services.event.close_vc_join_event(user, state.channel)
+            # Close event and credit session time
+            events = await self.services.stat.close_vc_session(user, state.channel)
             if events is None:
                 return
             join_event, leave_event = events
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from util.metrics import METRICS
+
+log = logging.getLogger('overlord-dispatch')
+
+HANDLER_SECONDS = METRICS.histogram('overlord_handler_seconds', 'Extension event handler run time',
+                                    ('event', 'extension'))
+QUEUE_DEPTH = METRICS.gauge('overlord_dispatch_queue_depth', 'Jobs waiting in extension queue', ('extension',))
+QUEUE_WAIT_SECONDS = METRICS.histogram('overlord_dispatch_queue_wait_seconds', 'Time jobs spent queued',
+                                       ('extension',))
+QUEUE_DROPPED = METRICS.counter('overlord_dispatch_queue_dropped_total', 'Jobs dropped by overflow policy',
+                                ('extension',))
+QUEUE_COALESCED = METRICS.counter('overlord_dispatch_queue_coalesced_total', 'Jobs merged into pending ones',
+                                  ('extension',))
+
+DISPATCH_INLINE = 'inline'
+DISPATCH_QUEUED = 'queued'
+DISPATCH_MODES = (DISPATCH_INLINE, DISPATCH_QUEUED)
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_OLDEST = 'drop-oldest'
+OVERFLOW_COALESCE = 'coalesce'
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+def _event_key(obj: Any) -> Hashable:
+    # Overlord* wrappers carry the discord object
+    obj = getattr(obj, 'discord', obj)
+    if isinstance(obj, (str, int)):
+        return obj
+    for attr in ('id', 'message_id'):
+        value = getattr(obj, attr, None)
+        if value is not None:
+            return attr, value
+    # No stable identity (voice states, db events), never merged with other jobs
+    return id(obj)
+
+
+def coalesce_key(handler: Callable[..., Awaitable[None]], args: tuple) -> Hashable:
+    # Jobs are merged only if every argument refers to the same object,
+    # e.g. edits of one message, not two reactions of one member
+    return (handler,) + tuple(_event_key(arg) for arg in args)
+
+
+def metered_handler(event: str, extension: str, handler: Callable[..., Awaitable[None]]) \
+        -> Callable[..., Awaitable[None]]:
+    run_time = HANDLER_SECONDS.labels(event, extension)
+
+    async def metered(*args, **kwargs) -> None:
+        with run_time.time():
+            await handler(*args, **kwargs)
+    metered.__name__ = event
+    return metered
+
+
+class DispatchJob(object):
+    __slots__ = ('handler', 'args', 'kwargs', 'key', 'future', 'queued_at')
+
+    def __init__(self, handler: Callable[..., Awaitable[None]], args: tuple, kwargs: dict, key: Hashable) -> None:
+        self.handler = handler
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.future = asyncio.get_event_loop().create_future()
+        self.queued_at = time.perf_counter()
+
+    def finish(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+# Bounded job queue with a pool of workers for a single extension
+class ExtensionWorkQueue(object):
+
+    name: str
+    size: int
+    concurrency: int
+    overflow: str
+
+    # Metrics
+    handled: int
+    dropped: int
+    coalesced: int
+    latency_total: float
+    latency_max: float
+    wait_total: float
+
+    _jobs: Deque[DispatchJob]
+    _pending_keys: Dict[Hashable, DispatchJob]
+    _cond: asyncio.Condition
+    _workers: List[asyncio.Future]
+    _closed: bool
+    _on_error: Optional[Callable[..., Awaitable[None]]]
+
+    def __init__(self, name: str, size: int, concurrency: int, overflow: str,
+                 on_error: Optional[Callable[..., Awaitable[None]]] = None) -> None:
+        self.name = name
+        self.size = max(size, 1)
+        self.concurrency = max(concurrency, 1)
+        self.overflow = overflow
+        self.handled = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.wait_total = 0.0
+        self._jobs = deque()
+        self._pending_keys = {}
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._on_error = on_error
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        self._wait_time = QUEUE_WAIT_SECONDS.labels(name)
+        self._dropped = QUEUE_DROPPED.labels(name)
+        self._coalesced = QUEUE_COALESCED.labels(name)
+        QUEUE_DEPTH.labels(name).set_function(lambda: self.depth)
+
+    @property
+    def depth(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.handled if self.handled else 0.0
+
+    def _pop(self) -> DispatchJob:
+        job = self._jobs.popleft()
+        if self._pending_keys.get(job.key) is job:
+            del self._pending_keys[job.key]
+        return job
+
+    async def submit(self, handler: Callable[..., Awaitable[None]], args: tuple, kwargs: dict) -> asyncio.Future:
+        key = coalesce_key(handler, args)
+        async with self._cond:
+            if len(self._jobs) >= self.size:
+                if self.overflow == OVERFLOW_COALESCE and key in self._pending_keys:
+                    # Queue is full and the same event is not started yet, latest one wins
+                    job = self._pending_keys[key]
+                    job.args, job.kwargs = args, kwargs
+                    self.coalesced += 1
+                    self._coalesced.inc()
+                    return job.future
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._pop().finish()
+                    self.dropped += 1
+                    self._dropped.inc()
+                else:
+                    await self._cond.wait_for(lambda: len(self._jobs) < self.size)
+            job = DispatchJob(handler, args, kwargs, key)
+            self._jobs.append(job)
+            self._pending_keys[key] = job
+            self._cond.notify_all()
+            return job.future
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._jobs or self._closed)
+                if not self._jobs:
+                    return
+                job = self._pop()
+                self._cond.notify_all()
+            started_at = time.perf_counter()
+            try:
+                await job.handler(*job.args, **job.kwargs)
+            except asyncio.CancelledError:
+                job.finish()
+                raise
+            except Exception:
+                # Reported the same way as inline handler errors
+                await self._report_error(job)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                self.handled += 1
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+                self.wait_total += started_at - job.queued_at
+                self._wait_time.observe(started_at - job.queued_at)
+                job.finish()
+
+    async def _report_error(self, job: DispatchJob) -> None:
+        # Called inside except block, error handler reads sys.exc_info()
+        if self._on_error is None:
+            log.exception(f'Unhandled error in {self.name} {job.handler.__name__}')
+            return
+        try:
+            await self._on_error(job.handler.__name__, *job.args, **job.kwargs)
+        except Exception:
+            log.exception(f'Failed to report error in {self.name} {job.handler.__name__}')
+
+    async def close(self) -> None:
+        # Pending jobs are drained before workers exit
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def cancel(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        for job in self._jobs:
+            job.finish()
+        self._jobs.clear()
+        self._pending_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'depth': self.depth,
+            'handled': self.handled,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'latency_avg': self.latency_avg,
+            'latency_max': self.latency_max,
+        }
+
+
+async def run_queued_levels(levels: List[List[Tuple[ExtensionWorkQueue, Callable[..., Awaitable[None]]]]],
+                            args: tuple, kwargs: dict,
+                            pending: Optional[List[asyncio.Future]] = None) -> None:
+    # Level N+1 is submitted only after every handler of level N is done (__priority__ semantics)
+    if pending:
+        await asyncio.gather(*pending)
+    for level in levels:
+        futures = [await queue.submit(handler, args, kwargs) for queue, handler in level]
+        await asyncio.gather(*futures)
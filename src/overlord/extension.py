@@ -33,7 +33,7 @@ import asyncio
 import logging
 import sys
 import traceback
-from typing import Dict, List, Optional, Callable, Awaitable
+from typing import Dict, List, Optional, Callable, Awaitable, Type
 
 import discord
 from discord.errors import InvalidArgument
@@ -43,9 +43,11 @@ from overlord.bot import Overlord
 from overlord.task import OverlordTask
 from overlord.command import OverlordCommand
 from overlord.types import IBotExtension
+from util.config import ConfigView, ConfigDiff
 from util.exceptions import InvalidConfigException
 from util.extbot import ProgressEmbed, get_coroutine_attrs
 from util.resources import STRINGS as R
+from util.metrics import MeteredLock
 
 log = logging.getLogger('overlord-extension')
 
@@ -60,6 +62,8 @@ class BotExtension(IBotExtension):
     __extname__ = 'Base Extension'
     __description__ = 'Base bot extension class'
     __color__ = 0x7B838A
+    # Config sections extension depends on, None means whole config
+    __config_sections__: Optional[List[Type[ConfigView]]] = None
 
     _skip_init_lock = ['on_config_update', 'on_ready', 'on_error']
 
@@ -72,13 +76,13 @@ class BotExtension(IBotExtension):
     _commands: Dict[str, OverlordCommand]
     _command_handlers: Dict[str, Callable[..., Awaitable[None]]]
     _task_instances: List[Loop]
-    _async_lock: asyncio.Lock
+    _async_lock: MeteredLock
 
     def __init__(self, bot: Overlord, priority=None) -> None:
         super().__init__()
         self._bot = bot
         self._enabled = False
-        self._async_lock = asyncio.Lock()
+        self._async_lock = MeteredLock(type(self).__name__)
 
         attrs = [getattr(self, attr) for attr in dir(self) if not attr.startswith('_')]
 
@@ -132,6 +136,7 @@ class BotExtension(IBotExtension):
             async def wrapped(self, *args, **kwargs) -> None:
                 await self.bot.init_lock()
                 await func(self, *args, **kwargs)
+            wrapped.__name__ = func.__name__
 
             return OverlordTask(wrapped, seconds=seconds, minutes=minutes, hours=hours, count=count,
                                 reconnect=reconnect)
@@ -168,9 +173,15 @@ class BotExtension(IBotExtension):
         for task in self._task_instances:
             task.stop()
 
-    def sync(self) -> asyncio.Lock:
+    def sync(self) -> MeteredLock:
         return self._async_lock
 
+    def config_changes(self, changes: ConfigDiff) -> ConfigDiff:
+        if self.__config_sections__ is None:
+            return changes
+        paths = [self.bot.cnf_manager.find_section_path(s) for s in self.__config_sections__]
+        return changes.filter(p for p in paths if p is not None)
+
     def help_embed(self, name) -> discord.Embed:
         title = f'{self.__extname__}'
         help_page = self.bot.new_embed(title, self.__description__, header=name, color=self.__color__)
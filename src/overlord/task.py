@@ -36,6 +36,10 @@ from discord.ext import tasks
 from discord.ext.tasks import Loop
 
 from overlord.types import IOverlordTask
+from util.metrics import METRICS
+
+TASK_SECONDS = METRICS.histogram('overlord_task_seconds', 'Extension task run time', ('task',))
+TASK_ERRORS = METRICS.counter('overlord_task_errors_total', 'Failed extension task runs', ('task',))
 
 
 class OverlordTask(IOverlordTask):
@@ -62,12 +66,17 @@ class OverlordTask(IOverlordTask):
     def task(self, ext) -> Loop:
         self.kwargs['loop'] = asyncio.get_running_loop()
 
+        task_name = f'{type(ext).__name__}.{self.func.__name__}'
+        run_time = TASK_SECONDS.labels(task_name)
+
         async def method(*args, **kwargs):
             try:
-                await self.func(ext, *args, **kwargs)
+                with run_time.time():
+                    await self.func(ext, *args, **kwargs)
             except KeyboardInterrupt:
                 raise
             except:
+                TASK_ERRORS.labels(task_name).inc()
                 await ext.on_error(self.func.__name__, *args, **kwargs)
 
         return tasks.loop(**self.kwargs)(method)
@@ -106,12 +106,115 @@ class OverlordControlConfig(ConfigView):
     channel: int = 0
 
 
+class OverlordExtensionDispatchConfig(ConfigView):
+    """
+    ... {
+        queue_size = ...
+        concurrency = ...
+        overflow = "..."
+    }
+    """
+    # 0 or empty values fall back to dispatch defaults
+    queue_size: int = 0
+    concurrency: int = 0
+    overflow: str = ""
+
+
+class OverlordDispatchConfig(ConfigView):
+    """
+    dispatch {
+        mode = "..."
+        queue_size = ...
+        concurrency = ...
+        overflow = "..."
+        extension {
+            ... : OverlordExtensionDispatchConfig
+        }
+    }
+    """
+    mode: str = "inline"
+    queue_size: int = 1000
+    concurrency: int = 1
+    overflow: str = "block"
+    extension: Dict[str, OverlordExtensionDispatchConfig] = {}
+
+
+class OverlordMetricsConfig(ConfigView):
+    """
+    metrics {
+        host = "..."
+        port = ...
+    }
+    """
+    host: str = "127.0.0.1"
+    port: int = 0
+
+
+class OverlordDatabaseConfig(ConfigView):
+    """
+    database {
+        statement_stats = ...
+        slow_query_ms = ...
+        slow_query_params = ...
+    }
+    """
+    statement_stats: bool = False
+    slow_query_ms: int = 0
+    slow_query_params: bool = True
+
+
+class OverlordWatchdogConfig(ConfigView):
+    """
+    watchdog {
+        enabled = ...
+        stall_ms = ...
+        lock_hold_ms = ...
+        report_interval = ...
+    }
+    """
+    enabled: bool = False
+    stall_ms: int = 250
+    lock_hold_ms: int = 10000
+    report_interval: int = 300
+
+
+class OverlordRecorderConfig(ConfigView):
+    """
+    recorder {
+        file = ...
+        max_bytes = ...
+        backup_count = ...
+    }
+    """
+    file: str = ''
+    max_bytes: int = 64 * 1024 * 1024
+    backup_count: int = 8
+
+
+class OverlordConfigWatchConfig(ConfigView):
+    """
+    config_watch {
+        enabled = ...
+        interval_ms = ...
+    }
+    """
+    enabled: bool = False
+    interval_ms: int = 1000
+
+
 class OverlordRootConfig(ConfigView):
     """
     bot {
         control : OverlordControlConfig
+        dispatch : OverlordDispatchConfig
+        metrics : OverlordMetricsConfig
+        database : OverlordDatabaseConfig
+        watchdog : OverlordWatchdogConfig
+        recorder : OverlordRecorderConfig
+        config_watch : OverlordConfigWatchConfig
         keep_absent_users = ...
         ignore_afk_vc = ...
+        pre_ready_buffer = ...
         command {
             help = ["help", ...]
             ...
@@ -119,8 +222,15 @@ class OverlordRootConfig(ConfigView):
     }
     """
     control: OverlordControlConfig = OverlordControlConfig()
+    dispatch: OverlordDispatchConfig = OverlordDispatchConfig()
+    metrics: OverlordMetricsConfig = OverlordMetricsConfig()
+    database: OverlordDatabaseConfig = OverlordDatabaseConfig()
+    watchdog: OverlordWatchdogConfig = OverlordWatchdogConfig()
+    recorder: OverlordRecorderConfig = OverlordRecorderConfig()
+    config_watch: OverlordConfigWatchConfig = OverlordConfigWatchConfig()
     keep_absent_users: bool = True
     ignore_afk_vc: bool = True
+    pre_ready_buffer: int = 0
     egg_done: str = "change this part"
     command: Dict[str, List[str]] = {}
 
@@ -181,6 +291,9 @@ class IBotExtension(object):
     def sync(self) -> asyncio.Lock:
         raise NotImplementedError()
 
+    def config_changes(self, changes: Any) -> Any:
+        raise NotImplementedError()
+
     def help_embed(self, name) -> DIS.Embed:
         raise NotImplementedError()
 
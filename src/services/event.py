@@ -30,7 +30,8 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 import logging
-from typing import Dict, Tuple, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Set, Tuple, Optional
 
 import discord
 
@@ -42,6 +43,8 @@ from .service import DBService
 
 log = logging.getLogger('event-service')
 
+EVENT_MODELS = [DB.MemberEvent, DB.MessageEvent, DB.VoiceChatEvent, DB.ReactionEvent]
+
 
 ##########################
 # Service implementation #
@@ -50,6 +53,8 @@ log = logging.getLogger('event-service')
 class EventService(DBService):
     # State
     event_type_map: Dict[str, int]
+    # (user id, channel id) -> (vc_join event id, join time)
+    vc_sessions: Dict[Tuple[int, int], Tuple[int, datetime]]
 
     def __init__(self, db: DB.DBConnection) -> None:
         super().__init__(db)
@@ -58,6 +63,7 @@ class EventService(DBService):
             session.commit()
             self.event_type_map = {row.name: row.id for row in
                                    session.execute(q.select_event_types()).scalars().all()}
+        self.reload_vc_sessions_sync()
 
     def check_event_name(self, name: str) -> None:
         if name not in self.event_type_map:
@@ -77,10 +83,10 @@ class EventService(DBService):
         return await self.get_optional(q.select_any_last_vc_event_by_user_id(user.id, channel.id))
 
     def get_last_vc_join_event_sync(self, user: DB.User, channel: discord.VoiceChannel) -> Optional[DB.VoiceChatEvent]:
-        return self.get_optional_sync(q.select_last_vc_event_by_user_id(channel.id, 'vc_join', user.id))
+        return self.get_optional_sync(q.select_last_vc_event_by_user_id(channel.id, self.type_id('vc_join'), user.id))
 
     async def get_last_vc_join_event(self, user: DB.User, channel: discord.VoiceChannel) -> Optional[DB.VoiceChatEvent]:
-        return await self.get_optional(q.select_last_vc_event_by_user_id(channel.id, 'vc_join', user.id))
+        return await self.get_optional(q.select_last_vc_event_by_user_id(channel.id, self.type_id('vc_join'), user.id))
 
     def get_last_member_event_sync(self, member: discord.Member) -> Optional[DB.MemberEvent]:
         return self.get_optional_sync(q.select_last_member_event_by_user_did(member.id))
@@ -153,16 +159,140 @@ class EventService(DBService):
         return await self.create(DB.ReactionEvent, conv.reaction_delete_row(user, msg, self.event_type_map))
 
     def create_vc_join_event_sync(self, user: DB.User, channel: discord.VoiceChannel) -> DB.VoiceChatEvent:
-        return self.create_sync(DB.VoiceChatEvent, conv.vc_join_row(user, channel, self.event_type_map))
+        now = datetime.now(timezone.utc)
+        row = conv.vc_join_row(user, channel, self.event_type_map, now)
+        with self.sync_session() as session:
+            with session.begin():
+                id_ = session.execute(q.insert_vc_event(row)).inserted_primary_key[0]
+        self.vc_sessions[(user.id, channel.id)] = (id_, conv.naive_utc(now))
+        return DB.VoiceChatEvent(id=id_, **row)
 
     async def create_vc_join_event(self, user: DB.User, channel: discord.VoiceChannel) -> DB.VoiceChatEvent:
-        return await self.create(DB.VoiceChatEvent, conv.vc_join_row(user, channel, self.event_type_map))
+        now = datetime.now(timezone.utc)
+        row = conv.vc_join_row(user, channel, self.event_type_map, now)
+        async with self.session() as session:
+            async with session.begin():
+                id_ = (await session.execute(q.insert_vc_event(row))).inserted_primary_key[0]
+        self.vc_sessions[(user.id, channel.id)] = (id_, conv.naive_utc(now))
+        return DB.VoiceChatEvent(id=id_, **row)
 
     def create_vc_leave_event_sync(self, user: DB.User, channel: discord.VoiceChannel) -> DB.VoiceChatEvent:
-        return self.create_sync(DB.VoiceChatEvent, conv.vc_leave_row(user, channel, self.event_type_map))
+        return self.create_sync(DB.VoiceChatEvent,
+                                conv.vc_leave_row(user, channel, self.event_type_map, datetime.now(timezone.utc)))
 
     async def create_vc_leave_event(self, user: DB.User, channel: discord.VoiceChannel) -> DB.VoiceChatEvent:
-        return await self.create(DB.VoiceChatEvent, conv.vc_leave_row(user, channel, self.event_type_map))
+        return await self.create(DB.VoiceChatEvent,
+                                 conv.vc_leave_row(user, channel, self.event_type_map, datetime.now(timezone.utc)))
+
+    ########
+    # BULK #
+    ########
+
+    def bulk_create_new_message_events_sync(self, messages: List[Tuple[int, discord.Message]]) -> Dict[int, int]:
+        if not messages:
+            return {}
+        rows = [conv.new_message_to_row(user_id, message, self.event_type_map) for user_id, message in messages]
+        ids_stmt = q.select_message_event_ids_by_dids(self.type_id('new_message'), [m.id for _, m in messages])
+        with self.sync_session() as session:
+            with session.begin():
+                session.bulk_insert(DB.MessageEvent, rows)
+                return {did: id_ for did, id_ in session.execute(ids_stmt).all()}
+
+    async def bulk_create_new_message_events(self, messages: List[Tuple[int, discord.Message]]) -> Dict[int, int]:
+        if not messages:
+            return {}
+        rows = [conv.new_message_to_row(user_id, message, self.event_type_map) for user_id, message in messages]
+        ids_stmt = q.select_message_event_ids_by_dids(self.type_id('new_message'), [m.id for _, m in messages])
+        async with self.session() as session:
+            async with session.begin():
+                await session.bulk_insert(DB.MessageEvent, rows)
+                return {did: id_ for did, id_ in (await session.execute(ids_stmt)).all()}
+
+    def bulk_create_member_join_events_sync(self, joins: List[Tuple[int, datetime]]) -> None:
+        rows = [conv.member_join_history_row(user_id, joined, self.event_type_map) for user_id, joined in joins]
+        self.bulk_create_sync(DB.MemberEvent, rows)
+
+    async def bulk_create_member_join_events(self, joins: List[Tuple[int, datetime]]) -> None:
+        rows = [conv.member_join_history_row(user_id, joined, self.event_type_map) for user_id, joined in joins]
+        await self.bulk_create(DB.MemberEvent, rows)
+
+    def bulk_create_new_reaction_events_sync(self, reactions: List[Tuple[int, int, datetime]]) -> None:
+        rows = [conv.reaction_history_row(*r, self.event_type_map) for r in reactions]
+        self.bulk_create_sync(DB.ReactionEvent, rows)
+
+    async def bulk_create_new_reaction_events(self, reactions: List[Tuple[int, int, datetime]]) -> None:
+        rows = [conv.reaction_history_row(*r, self.event_type_map) for r in reactions]
+        await self.bulk_create(DB.ReactionEvent, rows)
+
+    ###############
+    # VC SESSIONS #
+    ###############
+
+    def _vc_session_rows(self, rows: List[Any]) -> Dict[Tuple[int, int], Tuple[int, datetime]]:
+        return {(row.user_id, row.channel_id): (row.id, conv.naive_utc(row.created_at)) for row in rows}
+
+    def vc_session_events(self, join_event_id: int, joined_at: datetime,
+                           leave_event_id: int, leave_event_row: Dict[str, Any]) -> \
+            Tuple[DB.VoiceChatEvent, DB.VoiceChatEvent]:
+        join_event = DB.VoiceChatEvent(id=join_event_id,
+                                       type_id=self.type_id('vc_join'),
+                                       user_id=leave_event_row['user_id'],
+                                       channel_id=leave_event_row['channel_id'],
+                                       created_at=conv.aware_utc(joined_at),
+                                       updated_at=leave_event_row['created_at'])
+        return join_event, DB.VoiceChatEvent(id=leave_event_id, **leave_event_row)
+
+    def vc_reconcile_plan(self, present: Set[Tuple[int, int]]) -> \
+            Tuple[Dict[int, Tuple[int, int, datetime]], List[Tuple[int, int]]]:
+        orphans = {id_: (user_id, channel_id, joined_at)
+                   for (user_id, channel_id), (id_, joined_at) in self.vc_sessions.items()
+                   if (user_id, channel_id) not in present}
+        missing = [key for key in present if key not in self.vc_sessions]
+        return orphans, missing
+
+    def vc_reconcile_rows(self, orphans: Dict[int, Tuple[int, int, datetime]],
+                          missing: List[Tuple[int, int]],
+                          last_seen: Optional[datetime],
+                          orphan_updated_at: Dict[int, datetime]) -> \
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[int, int]]:
+        # Orphaned sessions are closed at the last moment the bot is known to have been alive,
+        # time between last checkpoint and that moment is not counted in vc_time yet
+        last_seen = conv.naive_utc(last_seen)
+        closed, rows, uncounted = [], [], {}
+        for id_, (user_id, channel_id, joined_at) in orphans.items():
+            counted_until = max(joined_at, conv.naive_utc(orphan_updated_at.get(id_)) or joined_at)
+            closed_at = max(counted_until, last_seen) if last_seen is not None else counted_until
+            closed.append({'event_id': id_, 'updated_at': conv.aware_utc(closed_at)})
+            rows.append(conv.vc_session_row(user_id, channel_id, 'vc_leave', self.event_type_map,
+                                            conv.aware_utc(closed_at)))
+            uncounted[user_id] = uncounted.get(user_id, 0) + int((closed_at - counted_until).total_seconds())
+        now = datetime.now(timezone.utc)
+        rows += [conv.vc_session_row(user_id, channel_id, 'vc_join', self.event_type_map, now)
+                 for user_id, channel_id in missing]
+        return closed, rows, uncounted
+
+    def set_open_vc_sessions(self, rows: List[Any]) -> None:
+        self.vc_sessions = self._vc_session_rows(rows)
+
+    def get_last_event_time_sync(self) -> Optional[datetime]:
+        with self.sync_session() as session:
+            times = [session.execute(q.select_last_event_time(m)).scalar() for m in EVENT_MODELS]
+        return max((conv.naive_utc(t) for t in times if t is not None), default=None)
+
+    async def get_last_event_time(self) -> Optional[datetime]:
+        async with self.session() as session:
+            times = [(await session.execute(q.select_last_event_time(m))).scalar() for m in EVENT_MODELS]
+        return max((conv.naive_utc(t) for t in times if t is not None), default=None)
+
+    def reload_vc_sessions_sync(self) -> None:
+        with self.sync_session() as session:
+            rows = session.execute(q.select_open_vc_sessions(self.type_id('vc_join'))).all()
+        self.vc_sessions = self._vc_session_rows(rows)
+
+    async def reload_vc_sessions(self) -> None:
+        async with self.session() as session:
+            rows = (await session.execute(q.select_open_vc_sessions(self.type_id('vc_join')))).all()
+        self.vc_sessions = self._vc_session_rows(rows)
 
     #########
     # OTHER #
@@ -194,64 +324,19 @@ class EventService(DBService):
                     last_event = session.add(model_type=DB.MemberEvent, value=member_join_row)
                 last_event.created_at = member.joined_at
 
-    def close_vc_join_event_sync(self,
-                                 user: DB.User,
-                                 channel: discord.VoiceChannel) -> \
-            Optional[Tuple[DB.VoiceChatEvent, DB.VoiceChatEvent]]:
-        with self.sync_session() as session:
-            with session.begin():
-                join_event_stmt = q.select_any_last_vc_event_by_user_id(user.id, channel.id)
-                join_event = session.execute_sync(join_event_stmt).scalar_one_or_none()
-                if join_event is None or join_event.type_id != self.type_id("vc_join"):
-                    log.warning(f'VC join event is absent for {user} in <{channel.name}! Skipping vc leave event!')
-                    return None
-                # Save event + update previous
-                leave_event_row = conv.vc_leave_row(user, channel, self.event_type_map)
-                leave_event = session.add(model_type=DB.VoiceChatEvent, value=leave_event_row)
-            session.detach(join_event)
-            session.detach(leave_event)
-            return join_event, leave_event
-
-    async def close_vc_join_event(self,
-                                  user: DB.User,
-                                  channel: discord.VoiceChannel) -> \
-            Optional[Tuple[DB.VoiceChatEvent, DB.VoiceChatEvent]]:
-        async with self.session() as session:
-            async with session.begin():
-                join_event_stmt = q.select_any_last_vc_event_by_user_id(user.id, channel.id)
-                join_event = (await session.execute(join_event_stmt)).scalar_one_or_none()
-                if join_event is None or join_event.type_id != self.type_id("vc_join"):
-                    log.warning(f'VC join event is absent for {user} in <{channel.name}! Skipping vc leave event!')
-                    return None
-                # Save event + update previous
-                leave_event_row = conv.vc_leave_row(user, channel, self.event_type_map)
-                leave_event = session.add(model_type=DB.VoiceChatEvent, value=leave_event_row)
-                await session.flush([leave_event])
-                await session.refresh(leave_event)
-                join_event.updated_at = leave_event.created_at
-            await session.detach(join_event)
-            await session.detach(leave_event)
-            return join_event, leave_event
-
     def repair_vc_leave_event_sync(self, user: DB.User, channel: discord.VoiceChannel) -> None:
-        with self.sync_session() as session:
-            with session.begin():
-                last_event_stmt = q.select_any_last_vc_event_by_user_id(user.id, channel.id)
-                last_event = session.execute(last_event_stmt).scalar_one_or_none()
-                if last_event is not None and last_event.type_id == self.type_id("vc_join"):
-                    log.warning(f'Closing VC leave event not found for {user} in <{channel.name} (removing vc_join '
-                                f'event)')
-                    session.delete(model=last_event)
+        vc_session = self.vc_sessions.get((user.id, channel.id))
+        if vc_session is not None:
+            log.warning(f'Closing VC leave event not found for {user} in <{channel.name} (removing vc_join event)')
+            self.execute_sync(q.delete_vc_event(vc_session[0]))
+            self.vc_sessions.pop((user.id, channel.id), None)
 
     async def repair_vc_leave_event(self, user: DB.User, channel: discord.VoiceChannel) -> None:
-        async with self.session() as session:
-            async with session.begin():
-                last_event_stmt = q.select_any_last_vc_event_by_user_id(user.id, channel.id)
-                last_event = (await session.execute(last_event_stmt)).scalar_one_or_none()
-                if last_event is not None and last_event.type_id == self.type_id("vc_join"):
-                    log.warning(f'Closing VC leave event not found for {user} in <{channel.name} (removing vc_join '
-                                f'event)')
-                    await session.delete(model=last_event)
+        vc_session = self.vc_sessions.get((user.id, channel.id))
+        if vc_session is not None:
+            log.warning(f'Closing VC leave event not found for {user} in <{channel.name} (removing vc_join event)')
+            await self.execute(q.delete_vc_event(vc_session[0]))
+            self.vc_sessions.pop((user.id, channel.id), None)
 
     def clear_all_sync(self):
         with self.sync_session() as session:
@@ -260,6 +345,7 @@ class EventService(DBService):
                 session.execute(q.delete_all(DB.ReactionEvent))
                 session.execute(q.delete_all(DB.MessageEvent))
                 session.execute(q.delete_all(DB.MemberEvent))
+        self.vc_sessions = {}
 
     async def clear_all(self):
         async with self.session() as session:
@@ -268,3 +354,4 @@ class EventService(DBService):
                 await session.execute(q.delete_all(DB.ReactionEvent))
                 await session.execute(q.delete_all(DB.MessageEvent))
                 await session.execute(q.delete_all(DB.MemberEvent))
+        self.vc_sessions = {}
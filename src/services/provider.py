@@ -53,6 +53,10 @@ class ServiceProvider(object):
         self._s_events = EventService(self._db)
         self._s_stats = StatService(self._db, self._s_events)
 
+    @property
+    def db(self) -> DBConnection:
+        return self._db
+
     @property
     def role(self) -> RoleService:
         return self._s_roles
@@ -30,13 +30,28 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 import logging
-from typing import Any, Type, Dict, Optional
+from typing import Any, Type, Dict, List, Optional
 
 import db as DB
 from db.models.base import BaseModel
+from util.metrics import METRICS
 
 log = logging.getLogger('event-service')
 
+DB_CALL_SECONDS = METRICS.histogram('overlord_db_call_seconds', 'DBService call latency', ('op', 'target'))
+
+
+def _statement_target(stmt: Any) -> str:
+    # Lambda statements expose the underlying statement via _resolved
+    stmt = getattr(stmt, '_resolved', stmt)
+    table = getattr(stmt, 'table', None)
+    if table is None:
+        froms = getattr(stmt, 'froms', None)
+        table = froms[0] if froms else None
+    name = getattr(table, 'name', None)
+    kind = getattr(stmt, '__visit_name__', type(stmt).__name__)
+    return f'{kind} {name}' if name else kind
+
 
 ##########################
 # Service implementation #
@@ -57,71 +72,89 @@ class DBService(object):
         return self._db.sync_session()
 
     def execute_sync(self, stmt: Any) -> None:
-        with self.sync_session() as session:
-            with session.begin():
-                session.execute(stmt)
+        with DB_CALL_SECONDS.labels('execute', _statement_target(stmt)).time():
+            with self.sync_session() as session:
+                with session.begin():
+                    session.execute(stmt)
 
     async def execute(self, stmt: Any) -> None:
-        async with self.session() as session:
-            async with session.begin():
-                await session.execute(stmt)
+        with DB_CALL_SECONDS.labels('execute', _statement_target(stmt)).time():
+            async with self.session() as session:
+                async with session.begin():
+                    await session.execute(stmt)
 
     def get_optional_sync(self, stmt: Any) -> Any:
-        with self.sync_session() as session:
-            obj = session.execute(stmt).scalar_one_or_none()
-            session.detach(obj)
-            return obj
+        with DB_CALL_SECONDS.labels('get_optional', _statement_target(stmt)).time():
+            with self.sync_session() as session:
+                obj = session.execute(stmt).scalar_one_or_none()
+                session.detach(obj)
+                return obj
 
     async def get_optional(self, stmt: Any) -> Any:
-        async with self.session() as session:
-            obj = (await session.execute(stmt)).scalar_one_or_none()
-            await session.detach(obj)
-            return obj
+        with DB_CALL_SECONDS.labels('get_optional', _statement_target(stmt)).time():
+            async with self.session() as session:
+                obj = (await session.execute(stmt)).scalar_one_or_none()
+                await session.detach(obj)
+                return obj
 
     def create_sync(self, model_type: Type[BaseModel], value: Dict[str, Any]) -> BaseModel:
-        with self.sync_session() as session:
-            with session.begin():
-                obj = session.add(model_type=model_type, value=value)
-            session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('create', model_type.__tablename__).time():
+            with self.sync_session() as session:
+                with session.begin():
+                    obj = session.add(model_type=model_type, value=value)
+                session.detach(obj)
+            return obj
 
     async def create(self, model_type: Type[BaseModel], value: Dict[str, Any]) -> BaseModel:
-        async with self.session() as session:
-            async with session.begin():
-                obj = session.add(model_type=model_type, value=value)
-            await session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('create', model_type.__tablename__).time():
+            async with self.session() as session:
+                async with session.begin():
+                    obj = session.add(model_type=model_type, value=value)
+                await session.detach(obj)
+            return obj
+
+    def bulk_create_sync(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        with DB_CALL_SECONDS.labels('bulk_create', model_type.__tablename__).time():
+            self._db.bulk_load_sync(model_type, values)
+
+    async def bulk_create(self, model_type: Type[BaseModel], values: List[Dict[str, Any]]) -> None:
+        with DB_CALL_SECONDS.labels('bulk_create', model_type.__tablename__).time():
+            await self._db.bulk_load(model_type, values)
 
     def merge_sync(self, model_type: Type[BaseModel],
                    value: Dict[str, Any],
                    pk_col: str = 'id') -> BaseModel:
-        with self.sync_session() as session:
-            with session.begin():
-                obj = session.merge(model_type=model_type, value=value, pk_col=pk_col)
-            session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('merge', model_type.__tablename__).time():
+            with self.sync_session() as session:
+                with session.begin():
+                    obj = session.merge(model_type=model_type, value=value, pk_col=pk_col)
+                session.detach(obj)
+            return obj
 
     async def merge(self, model_type: Type[BaseModel],
                     value: Dict[str, Any],
                     pk_col: str = 'id') -> BaseModel:
-        async with self.session() as session:
-            async with session.begin():
-                obj = await session.merge(model_type=model_type, value=value, pk_col=pk_col)
-            await session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('merge', model_type.__tablename__).time():
+            async with self.session() as session:
+                async with session.begin():
+                    obj = await session.merge(model_type=model_type, value=value, pk_col=pk_col)
+                await session.detach(obj)
+            return obj
 
     def delete_sync(self, model_type: Type[BaseModel], pk: int) -> Optional[BaseModel]:
-        with self.sync_session() as session:
-            with session.begin():
-                obj = session.delete(model_type=model_type, pk=pk)
-            if obj is not None:
-                session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('delete', model_type.__tablename__).time():
+            with self.sync_session() as session:
+                with session.begin():
+                    obj = session.delete(model_type=model_type, pk=pk)
+                if obj is not None:
+                    session.detach(obj)
+            return obj
 
     async def delete(self, model_type: Type[BaseModel], pk: int) -> Optional[BaseModel]:
-        async with self.session() as session:
-            async with session.begin():
-                obj = await session.delete(model_type=model_type, pk=pk)
-            if obj is not None:
-                await session.detach(obj)
-        return obj
+        with DB_CALL_SECONDS.labels('delete', model_type.__tablename__).time():
+            async with self.session() as session:
+                async with session.begin():
+                    obj = await session.delete(model_type=model_type, pk=pk)
+                if obj is not None:
+                    await session.detach(obj)
+            return obj
@@ -30,13 +30,15 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import discord
 
 import db as DB
 import db.converters as conv
 import db.queries as q
 
-from typing import Dict
-
 from db.predefined import USER_STAT_TYPES
 from .event import EventService
 from .service import DBService
@@ -51,6 +53,8 @@ log = logging.getLogger('stat-service')
 class StatService(DBService):
     # State
     user_stat_type_map: Dict[str, int]
+    # vc_join event id -> time up to which the session is already counted in vc_time
+    vc_checkpoints: Dict[int, datetime]
 
     # Members passed via constructor
     events: EventService
@@ -63,28 +67,31 @@ class StatService(DBService):
             session.commit()
             self.user_stat_type_map = {row.name: row.id for row in
                                        session.execute(q.select_stat_types()).scalars().all()}
+            self.vc_checkpoints = self._vc_checkpoint_rows(
+                session.execute(q.select_vc_events_updated_at(self._open_vc_session_ids())).all())
 
     def check_stat_name(self, name: str) -> None:
         if name not in self.user_stat_type_map:
             raise NameError(f"No such stat name: {name}")
 
     def type_id(self, stat_name) -> int:
+        self.check_stat_name(stat_name)
         return self.user_stat_type_map[stat_name]
 
     def get_sync(self, user: DB.User, stat_name: str) -> int:
-        self.check_stat_name(stat_name)
-        stat = self.get_optional_sync(q.select_user_stat_by_user_id(stat_name, user.id))
-        return stat.value if stat is not None else 0
+        stat = self.get_optional_sync(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id))
+        value = stat.value if stat is not None else 0
+        return value + self.vc_time_elapsed(user) if stat_name == 'vc_time' else value
 
     async def get(self, user: DB.User, stat_name: str) -> int:
-        self.check_stat_name(stat_name)
-        stat = await self.get_optional(q.select_user_stat_by_user_id(stat_name, user.id))
-        return stat.value if stat is not None else 0
+        stat = await self.get_optional(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id))
+        value = stat.value if stat is not None else 0
+        return value + self.vc_time_elapsed(user) if stat_name == 'vc_time' else value
 
     def set_sync(self, user: DB.User, stat_name: str, value: int) -> None:
         with self.sync_session() as session:
             with session.begin():
-                stat = session.execute(q.select_user_stat_by_user_id(stat_name, user.id)).scalar_one_or_none()
+                stat = session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id)).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
@@ -93,7 +100,7 @@ class StatService(DBService):
     async def set(self, user: DB.User, stat_name: str, value: int) -> None:
         async with self.session() as session:
             async with session.begin():
-                stat = (await session.execute(q.select_user_stat_by_user_id(stat_name, user.id))).scalar_one_or_none()
+                stat = (await session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id))).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
@@ -108,7 +115,7 @@ class StatService(DBService):
     def inc_sync(self, user: DB.User, stat_name: str) -> None:
         with self.sync_session() as session:
             with session.begin():
-                stat = session.execute(q.select_user_stat_by_user_id(stat_name, user.id)).scalar_one_or_none()
+                stat = session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id)).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
@@ -117,7 +124,7 @@ class StatService(DBService):
     async def inc(self, user: DB.User, stat_name: str) -> None:
         async with self.session() as session:
             async with session.begin():
-                stat = (await session.execute(q.select_user_stat_by_user_id(stat_name, user.id))).scalar_one_or_none()
+                stat = (await session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id))).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
@@ -126,7 +133,7 @@ class StatService(DBService):
     def dec_sync(self, user: DB.User, stat_name: str) -> None:
         with self.sync_session() as session:
             with session.begin():
-                stat = session.execute(q.select_user_stat_by_user_id(stat_name, user.id)).scalar_one_or_none()
+                stat = session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id)).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
@@ -135,18 +142,197 @@ class StatService(DBService):
     async def dec(self, user: DB.User, stat_name: str) -> None:
         async with self.session() as session:
             async with session.begin():
-                stat = (await session.execute(q.select_user_stat_by_user_id(stat_name, user.id))).scalar_one_or_none()
+                stat = (await session.execute(q.select_user_stat_by_user_id(self.type_id(stat_name), user.id))).scalar_one_or_none()
                 if stat is None:
                     empty_stat_row = conv.empty_user_stat_row(user.id, self.type_id(stat_name))
                     stat = session.add(model_type=DB.UserStat, value=empty_stat_row)
                 stat.value -= 1
 
+    ###########
+    # VC TIME #
+    ###########
+
+    def _vc_counted_until(self, join_event_id: int, joined_at: datetime) -> datetime:
+        return max(joined_at, self.vc_checkpoints.get(join_event_id, joined_at))
+
+    def vc_time_elapsed(self, user: DB.User, now: Optional[datetime] = None) -> int:
+        # Time of open sessions not yet stored in vc_time
+        now = now or datetime.utcnow()
+        elapsed = sum((now - self._vc_counted_until(id_, joined_at)).total_seconds()
+                      for (user_id, _), (id_, joined_at) in self.events.vc_sessions.items() if user_id == user.id)
+        return int(elapsed)
+
+    def _add_stat_sync(self, session, type_id: int, user_id: int, delta: int) -> None:
+        # Single increment, row is inserted only if there was nothing to update
+        params = {'stat_user_id': user_id, 'delta': delta}
+        if session.execute(q.update_add_user_stats(type_id), params).rowcount == 0:
+            session.bulk_insert(DB.UserStat, [conv.user_stat_row(user_id, type_id, delta)])
+
+    async def _add_stat(self, session, type_id: int, user_id: int, delta: int) -> None:
+        # Single increment, row is inserted only if there was nothing to update
+        params = {'stat_user_id': user_id, 'delta': delta}
+        if (await session.execute(q.update_add_user_stats(type_id), params)).rowcount == 0:
+            await session.bulk_insert(DB.UserStat, [conv.user_stat_row(user_id, type_id, delta)])
+
+    def _close_vc_session_plan(self, user: DB.User, channel: discord.VoiceChannel) -> \
+            Optional[Tuple[int, datetime, Dict[str, Any], int]]:
+        vc_session = self.events.vc_sessions.get((user.id, channel.id))
+        if vc_session is None:
+            log.warning(f'VC join event is absent for {user} in <{channel.name}! Skipping vc leave event!')
+            return None
+        join_event_id, joined_at = vc_session
+        leave_event_row = conv.vc_leave_row(user, channel, self.events.event_type_map, datetime.now(timezone.utc))
+        counted_until = self._vc_counted_until(join_event_id, joined_at)
+        value = int((conv.naive_utc(leave_event_row['created_at']) - counted_until).total_seconds())
+        return join_event_id, joined_at, leave_event_row, value
+
+    def _drop_vc_session(self, user: DB.User, channel: discord.VoiceChannel, join_event_id: int) -> None:
+        # Open session and its credited time are swapped without yielding to the loop,
+        # so vc_time_elapsed never counts the session twice or misses it
+        self.events.vc_sessions.pop((user.id, channel.id), None)
+        self.vc_checkpoints.pop(join_event_id, None)
+
+    def close_vc_session_sync(self, user: DB.User, channel: discord.VoiceChannel) -> \
+            Optional[Tuple[DB.VoiceChatEvent, DB.VoiceChatEvent]]:
+        plan = self._close_vc_session_plan(user, channel)
+        if plan is None:
+            return None
+        join_event_id, joined_at, leave_event_row, value = plan
+        with self.sync_session() as session:
+            with session.begin():
+                session.execute(q.update_vc_event_closed(join_event_id, leave_event_row['created_at']))
+                leave_event_id = session.execute(q.insert_vc_event(leave_event_row)).inserted_primary_key[0]
+                self._add_stat_sync(session, self.type_id('vc_time'), user.id, value)
+        # Session stays open in memory if closing it failed
+        self._drop_vc_session(user, channel, join_event_id)
+        return self.events.vc_session_events(join_event_id, joined_at, leave_event_id, leave_event_row)
+
+    async def close_vc_session(self, user: DB.User, channel: discord.VoiceChannel) -> \
+            Optional[Tuple[DB.VoiceChatEvent, DB.VoiceChatEvent]]:
+        plan = self._close_vc_session_plan(user, channel)
+        if plan is None:
+            return None
+        join_event_id, joined_at, leave_event_row, value = plan
+        async with self.session() as session:
+            async with session.begin():
+                await session.execute(q.update_vc_event_closed(join_event_id, leave_event_row['created_at']))
+                leave_event_id = (await session.execute(q.insert_vc_event(leave_event_row))).inserted_primary_key[0]
+                await self._add_stat(session, self.type_id('vc_time'), user.id, value)
+        # Session stays open in memory if closing it failed
+        self._drop_vc_session(user, channel, join_event_id)
+        return self.events.vc_session_events(join_event_id, joined_at, leave_event_id, leave_event_row)
+
+    def _open_vc_session_ids(self) -> List[int]:
+        return [id_ for id_, _ in self.events.vc_sessions.values()]
+
+    @staticmethod
+    def _vc_checkpoint_rows(rows: List[Any]) -> Dict[int, datetime]:
+        # Checkpointed open sessions have updated_at moved past created_at
+        return {id_: conv.naive_utc(updated_at) for id_, updated_at in rows}
+
+    def _vc_checkpoint_plan(self, now: datetime) -> Tuple[Dict[int, int], Dict[int, datetime]]:
+        # Checkpoints advance by whole seconds credited, fractions are carried to the next one
+        deltas, checkpoints = {}, {}
+        for (user_id, _), (id_, joined_at) in self.events.vc_sessions.items():
+            counted_until = self._vc_counted_until(id_, joined_at)
+            elapsed = int((now - counted_until).total_seconds())
+            deltas[user_id] = deltas.get(user_id, 0) + elapsed
+            checkpoints[id_] = counted_until + timedelta(seconds=elapsed)
+        return deltas, checkpoints
+
+    def _add_stats_sync(self, session, type_id: int, deltas: Dict[int, int]) -> None:
+        stored = set(session.execute(q.select_user_stat_user_ids(type_id, list(deltas))).scalars().all())
+        updates = [{'stat_user_id': u, 'delta': d} for u, d in deltas.items() if u in stored]
+        if updates:
+            session.execute(q.update_add_user_stats(type_id), updates)
+        session.bulk_insert(DB.UserStat, [conv.user_stat_row(u, type_id, d)
+                                          for u, d in deltas.items() if u not in stored])
+
+    async def _add_stats(self, session, type_id: int, deltas: Dict[int, int]) -> None:
+        stored = set((await session.execute(q.select_user_stat_user_ids(type_id, list(deltas)))).scalars().all())
+        updates = [{'stat_user_id': u, 'delta': d} for u, d in deltas.items() if u in stored]
+        if updates:
+            await session.execute(q.update_add_user_stats(type_id), updates)
+        await session.bulk_insert(DB.UserStat, [conv.user_stat_row(u, type_id, d)
+                                                for u, d in deltas.items() if u not in stored])
+
+    def checkpoint_vc_time_sync(self) -> int:
+        deltas, checkpoints = self._vc_checkpoint_plan(datetime.utcnow())
+        if not checkpoints:
+            return 0
+        params = [{'event_id': id_, 'updated_at': conv.aware_utc(at)} for id_, at in checkpoints.items()]
+        with self.sync_session() as session:
+            with session.begin():
+                self._add_stats_sync(session, self.type_id('vc_time'), deltas)
+                session.execute(q.update_vc_events_updated_at(), params)
+        self.vc_checkpoints.update(checkpoints)
+        return len(checkpoints)
+
+    async def checkpoint_vc_time(self) -> int:
+        deltas, checkpoints = self._vc_checkpoint_plan(datetime.utcnow())
+        if not checkpoints:
+            return 0
+        params = [{'event_id': id_, 'updated_at': conv.aware_utc(at)} for id_, at in checkpoints.items()]
+        async with self.session() as session:
+            async with session.begin():
+                await self._add_stats(session, self.type_id('vc_time'), deltas)
+                await session.execute(q.update_vc_events_updated_at(), params)
+        self.vc_checkpoints.update(checkpoints)
+        return len(checkpoints)
+
+    def reconcile_vc_sessions_sync(self, present: Set[Tuple[int, int]],
+                                   last_seen: Optional[datetime]) -> Tuple[int, int]:
+        orphans, missing = self.events.vc_reconcile_plan(present)
+        if not orphans and not missing:
+            return 0, 0
+        with self.sync_session() as session:
+            with session.begin():
+                orphan_updated_at = dict(session.execute(q.select_vc_events_updated_at(list(orphans))).all())
+                closed, rows, uncounted = self.events.vc_reconcile_rows(orphans, missing, last_seen, orphan_updated_at)
+                if closed:
+                    session.execute(q.update_vc_events_updated_at(), closed)
+                session.bulk_insert(DB.VoiceChatEvent, rows)
+                # Closed sessions are credited in the same transaction
+                self._add_stats_sync(session, self.type_id('vc_time'), uncounted)
+                open_sessions = session.execute(q.select_open_vc_sessions(self.events.type_id('vc_join'))).all()
+                stmt = q.select_vc_events_updated_at([row.id for row in open_sessions])
+                checkpoints = self._vc_checkpoint_rows(session.execute(stmt).all())
+        self.events.set_open_vc_sessions(open_sessions)
+        self.vc_checkpoints = checkpoints
+        return len(orphans), len(missing)
+
+    async def reconcile_vc_sessions(self, present: Set[Tuple[int, int]],
+                                    last_seen: Optional[datetime]) -> Tuple[int, int]:
+        orphans, missing = self.events.vc_reconcile_plan(present)
+        if not orphans and not missing:
+            return 0, 0
+        async with self.session() as session:
+            async with session.begin():
+                stmt = q.select_vc_events_updated_at(list(orphans))
+                orphan_updated_at = dict((await session.execute(stmt)).all())
+                closed, rows, uncounted = self.events.vc_reconcile_rows(orphans, missing, last_seen, orphan_updated_at)
+                if closed:
+                    await session.execute(q.update_vc_events_updated_at(), closed)
+                await session.bulk_insert(DB.VoiceChatEvent, rows)
+                # Closed sessions are credited in the same transaction
+                await self._add_stats(session, self.type_id('vc_time'), uncounted)
+                open_sessions = (await session.execute(q.select_open_vc_sessions(self.events.type_id('vc_join')))).all()
+                stmt = q.select_vc_events_updated_at([row.id for row in open_sessions])
+                checkpoints = self._vc_checkpoint_rows((await session.execute(stmt)).all())
+        self.events.set_open_vc_sessions(open_sessions)
+        self.vc_checkpoints = checkpoints
+        return len(orphans), len(missing)
+
+    ##########
+    # RELOAD #
+    ##########
+
     def _reload_stat_sync(self, query, stat_name: str, event: str) -> None:
         stat_id = self.type_id(stat_name)
         with self.sync_session() as session:
             with session.begin():
                 session.execute(q.delete_users_stat(stat_id))
-                select_query = query(event, [('type_id', stat_id)])
+                select_query = query(self.events.type_id(event), [('type_id', stat_id)])
                 session.execute(q.insert_user_stat_from_select(select_query))
 
     async def _reload_stat(self, query, stat_name: str, event: str) -> None:
@@ -154,7 +340,7 @@ class StatService(DBService):
         async with self.session() as session:
             async with session.begin():
                 await session.execute(q.delete_users_stat(stat_id))
-                select_query = query(event, [('type_id', stat_id)])
+                select_query = query(self.events.type_id(event), [('type_id', stat_id)])
                 await session.execute(q.insert_user_stat_from_select(select_query))
 
     def reload_stat_sync(self, name: str) -> None:
@@ -36,7 +36,9 @@ import db as DB
 import db.converters as conv
 import db.queries as q
 
-from typing import Optional, Union, Tuple
+from typing import Any, Dict, List, Optional, Set, Union, Tuple
+
+from db.session import BULK_LOAD_BATCH_SIZE
 from .role import RoleService
 from .service import DBService
 
@@ -48,6 +50,9 @@ log = logging.getLogger('user-service')
 ##########################
 
 class UserService(DBService):
+    # State
+    # did -> fingerprint of the stored row (see conv.user_fingerprint)
+    fingerprints: Dict[int, int]
 
     # Members passed via constructor
     db: DB.DBConnection
@@ -56,6 +61,7 @@ class UserService(DBService):
     def __init__(self, db: DB.DBConnection, roles: RoleService) -> None:
         super().__init__(db)
         self.roles = roles
+        self.fingerprints = {}
 
     @staticmethod
     def parse_qualified_name(qualified_name: str) -> Tuple[str, int]:
@@ -68,12 +74,38 @@ class UserService(DBService):
     def is_absent(user: DB.User) -> bool:
         return user.roles is None and user.display_name is None
 
+    def _fingerprint_rows(self, rows: List[Any]) -> Dict[int, int]:
+        return {row.did: conv.user_fingerprint(row._mapping) for row in rows}
+
+    def load_fingerprints_sync(self) -> None:
+        with self.sync_session() as session:
+            self.fingerprints = self._fingerprint_rows(session.execute(q.select_user_fingerprint_rows()).all())
+
+    async def load_fingerprints(self) -> None:
+        async with self.session() as session:
+            self.fingerprints = self._fingerprint_rows((await session.execute(q.select_user_fingerprint_rows())).all())
+
+    def is_member_stored(self, member: discord.Member) -> bool:
+        return member.id in self.fingerprints
+
+    def is_member_changed(self, member: discord.Member) -> bool:
+        row = conv.member_row(member, self.roles.role_rows_did_map)
+        return self.fingerprints.get(member.id) != conv.user_fingerprint(row)
+
     def get_sync(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
         return self.get_optional_sync(q.select_user_by_did(d_user.id))
 
     async def get(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
         return await self.get_optional(q.select_user_by_did(d_user.id))
 
+    def get_ids_sync(self, d_users: List[Union[discord.User, discord.Member]]) -> Dict[int, int]:
+        with self.sync_session() as session:
+            return dict(session.execute(q.select_user_ids_by_dids([u.id for u in d_users])).all())
+
+    async def get_ids(self, d_users: List[Union[discord.User, discord.Member]]) -> Dict[int, int]:
+        async with self.session() as session:
+            return dict((await session.execute(q.select_user_ids_by_dids([u.id for u in d_users]))).all())
+
     def get_by_display_name_sync(self, display_name: str) -> Optional[DB.User]:
         return self.get_optional_sync(q.select_user_by_display_name(display_name))
 
@@ -94,15 +126,67 @@ class UserService(DBService):
 
     def mark_everyone_absent_sync(self) -> None:
         self.execute_sync(q.update_all_users_absent())
+        self.fingerprints = {}
 
     async def mark_everyone_absent(self) -> None:
         await self.execute(q.update_all_users_absent())
+        self.fingerprints = {}
+
+    def mark_absent_except_sync(self, present_dids: Set[int]) -> None:
+        absent = [did for did in self.fingerprints if did not in present_dids]
+        with self.sync_session() as session:
+            with session.begin():
+                for i in range(0, len(absent), BULK_LOAD_BATCH_SIZE):
+                    session.execute(q.update_users_absent_by_dids(absent[i:i + BULK_LOAD_BATCH_SIZE]))
+        for did in absent:
+            self.fingerprints.pop(did)
+
+    async def mark_absent_except(self, present_dids: Set[int]) -> None:
+        absent = [did for did in self.fingerprints if did not in present_dids]
+        async with self.session() as session:
+            async with session.begin():
+                for i in range(0, len(absent), BULK_LOAD_BATCH_SIZE):
+                    await session.execute(q.update_users_absent_by_dids(absent[i:i + BULK_LOAD_BATCH_SIZE]))
+        for did in absent:
+            self.fingerprints.pop(did)
 
     def merge_member_sync(self, d_user: discord.Member) -> DB.User:
-        return self.merge_sync(DB.User, conv.member_row(d_user, self.roles.role_rows_did_map), 'did')
+        row = conv.member_row(d_user, self.roles.role_rows_did_map)
+        user = self.merge_sync(DB.User, row, 'did')
+        self.fingerprints[d_user.id] = conv.user_fingerprint(row)
+        return user
 
     async def merge_member(self, d_user: discord.Member) -> DB.User:
-        return await self.merge(DB.User, conv.member_row(d_user, self.roles.role_rows_did_map), 'did')
+        row = conv.member_row(d_user, self.roles.role_rows_did_map)
+        user = await self.merge(DB.User, row, 'did')
+        self.fingerprints[d_user.id] = conv.user_fingerprint(row)
+        return user
+
+    def bulk_create_members_sync(self, d_users: List[discord.Member]) -> Dict[int, int]:
+        # Members not stored yet, stored ones are merged row by row
+        rows = [conv.member_row(d_user, self.roles.role_rows_did_map) for d_user in d_users]
+        ids = {}
+        with self.sync_session() as session:
+            with session.begin():
+                session.bulk_insert(DB.User, rows)
+                for i in range(0, len(rows), BULK_LOAD_BATCH_SIZE):
+                    dids = [row['did'] for row in rows[i:i + BULK_LOAD_BATCH_SIZE]]
+                    ids.update(session.execute(q.select_user_ids_by_dids(dids)).all())
+        self.fingerprints.update({row['did']: conv.user_fingerprint(row) for row in rows})
+        return ids
+
+    async def bulk_create_members(self, d_users: List[discord.Member]) -> Dict[int, int]:
+        # Members not stored yet, stored ones are merged row by row
+        rows = [conv.member_row(d_user, self.roles.role_rows_did_map) for d_user in d_users]
+        ids = {}
+        async with self.session() as session:
+            async with session.begin():
+                await session.bulk_insert(DB.User, rows)
+                for i in range(0, len(rows), BULK_LOAD_BATCH_SIZE):
+                    dids = [row['did'] for row in rows[i:i + BULK_LOAD_BATCH_SIZE]]
+                    ids.update((await session.execute(q.select_user_ids_by_dids(dids))).all())
+        self.fingerprints.update({row['did']: conv.user_fingerprint(row) for row in rows})
+        return ids
 
     def add_user_sync(self, d_user: discord.User) -> DB.User:
         return self.create_sync(DB.User, conv.user_row(d_user))
@@ -111,19 +195,23 @@ class UserService(DBService):
         return await self.create(DB.User, conv.user_row(d_user))
 
     def remove_sync(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
+        self.fingerprints.pop(d_user.id, None)
         user = self.get_sync(d_user)
         return user and self.delete_sync(DB.User, user.id)
 
     async def remove(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
+        self.fingerprints.pop(d_user.id, None)
         user = await self.get(d_user)
         return user and await self.delete(DB.User, user.id)
 
     def make_user_absent_sync(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
         self.execute_sync(q.update_user_absent_by_did(d_user.id))
+        self.fingerprints.pop(d_user.id, None)
         return self.get_sync(d_user)
 
     async def make_user_absent(self, d_user: Union[discord.User, discord.Member]) -> Optional[DB.User]:
         await self.execute(q.update_user_absent_by_did(d_user.id))
+        self.fingerprints.pop(d_user.id, None)
         return await self.get(d_user)
 
     def remove_absent_sync(self) -> None:
@@ -134,6 +222,8 @@ class UserService(DBService):
 
     def clear_all_sync(self):
         self.execute_sync(q.delete_all(DB.User))
+        self.fingerprints = {}
 
     async def clear_all(self):
         await self.execute(q.delete_all(DB.User))
+        self.fingerprints = {}
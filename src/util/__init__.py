@@ -29,7 +29,7 @@ SOFTWARE.
 
 __author__ = "Mathtin"
 
-from .config import ConfigView, ConfigParser, ConfigManager
+from .config import ConfigView, ConfigParser, ConfigManager, ConfigDiff
 from .exceptions import InvalidConfigException, NotCoroutineException
 from .resources import STRINGS as R
 from .common import get_module_element, dict_fancy_table, pretty_days, pretty_seconds, parse_control_message, \
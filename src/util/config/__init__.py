@@ -32,4 +32,6 @@ __author__ = "Mathtin"
 from .view import ConfigView
 from .parser import ConfigParser
 from .manager import ConfigManager
+from .diff import ConfigDiff
+from .watcher import ConfigWatcher
 
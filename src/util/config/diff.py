@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+from typing import Any, Iterable, Optional, Set
+
+from .view import ConfigView
+
+
+class ConfigDiff(object):
+    # Changed leaf paths, dict items and lists are reported as a whole
+    paths: Set[str]
+    full: bool
+
+    def __init__(self, paths: Optional[Iterable[str]] = None, full: bool = False) -> None:
+        self.paths = set(paths) if paths is not None else set()
+        self.full = full
+
+    @staticmethod
+    def compute(old: Any, new: Any) -> 'ConfigDiff':
+        diff = ConfigDiff()
+        if old is None:
+            diff.full = True
+        else:
+            ConfigDiff._collect(old, new, '', diff.paths)
+        return diff
+
+    @staticmethod
+    def _collect(old: Any, new: Any, path: str, res: Set[str]) -> None:
+        if isinstance(old, ConfigView):
+            old = dict(old)
+        if isinstance(new, ConfigView):
+            new = dict(new)
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            if old != new:
+                res.add(path)
+            return
+        for key in old.keys() | new.keys():
+            sub_path = f'{path}.{key}' if path else key
+            if key not in old or key not in new:
+                res.add(sub_path)
+            else:
+                ConfigDiff._collect(old[key], new[key], sub_path, res)
+
+    def touches(self, path: str) -> bool:
+        if self.full:
+            return True
+        if path in ('', '.'):
+            return bool(self.paths)
+        prefix = path + '.'
+        return any(p == path or p.startswith(prefix) or path.startswith(p + '.') for p in self.paths)
+
+    def filter(self, sections: Iterable[str]) -> 'ConfigDiff':
+        if self.full:
+            return ConfigDiff(full=True)
+        sections = list(sections)
+        return ConfigDiff(p for p in self.paths if any(ConfigDiff([p]).touches(s) for s in sections))
+
+    def __bool__(self) -> bool:
+        return self.full or bool(self.paths)
+
+    def __repr__(self) -> str:
+        return 'ConfigDiff(full)' if self.full else f'ConfigDiff({sorted(self.paths)})'
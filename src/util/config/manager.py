@@ -31,20 +31,25 @@ __author__ = "Mathtin"
 
 import json
 import typing
-from typing import Any, Dict, Optional, Type, get_type_hints
+from typing import Any, Dict, List, Optional, Tuple, Type, get_type_hints
 
+from ..exceptions import InvalidConfigException
 from .parser import ConfigParser
 from .view import ConfigView
 
 
 class ConfigManager(object):
     path: str
-    raw: str
     raw_dict: dict
+    applied_raw: str
+    dirty: bool
     config: ConfigView
     parser: ConfigParser
     model = None
 
+    # Serialized on demand after in-place edits
+    _raw: Optional[str]
+
     _section_model_cache: Dict[Type[ConfigView], Dict[Type[ConfigView], str]] = {}
 
     def __init__(self, path: str, parser: ConfigParser = None) -> None:
@@ -54,27 +59,52 @@ class ConfigManager(object):
             self.__class__.model = get_type_hints(self.__class__)['config']
         self.path = path
         self.parser = parser
+        self._raw = None
+        self.dirty = False
         self.reload()
 
+    @property
+    def raw(self) -> str:
+        if self._raw is None:
+            self._raw = self.serialize_obj(self.raw_dict)
+        return self._raw
+
+    @raw.setter
+    def raw(self, value: str) -> None:
+        self._raw = value
+
     def reload(self) -> None:
         with open(self.path, 'r') as f:
             raw = f.read()
-        self.alter(raw)
+        # Unchanged file is not parsed again across restarts
+        self.apply(raw, *self.load(raw, cache=True))
 
     def save(self) -> None:
         self.sync()
         with open(self.path, 'w') as f:
             f.write(self.raw)
+        self.applied_raw = self.raw
+        self.dirty = False
 
-    def alter(self, raw: str) -> None:
+    def load(self, raw: str, cache: bool = False) -> Tuple[dict, ConfigView]:
+        # No state is changed, safe to call from worker threads
+        raw_dict = self.parser.parse(raw, cache)
+        return raw_dict, self.model(raw_dict)
+
+    def apply(self, raw: str, raw_dict: dict, config: ConfigView) -> None:
         self.raw = raw
-        self.raw_dict = self.parser.parse(self.raw)
-        self.config = self.model(self.raw_dict)
+        self.raw_dict = raw_dict
+        self.config = config
+        self.applied_raw = raw
+        self.dirty = False
+
+    def alter(self, raw: str) -> None:
+        self.apply(raw, *self.load(raw))
 
     def sync(self) -> None:
-        raw_dict = self.config.to_dict()
-        raw = self.serialize_obj(raw_dict)
-        self.alter(raw)
+        # Views are the source of truth, document is serialized once on demand
+        self.raw_dict = self.config.to_dict()
+        self._raw = None
 
     def get_raw(self, path: str) -> str:
         value = self.config.get(path)
@@ -85,8 +115,7 @@ class ConfigManager(object):
         value_dict = self.parser.parse(assignment)
         # Set root
         if path == '.':
-            self._merge_dict(self.raw_dict, value_dict)
-            return self._explode_raw_dict()
+            return self._apply_section([], self.raw_dict, value_dict)
         # Resolve path node
         parts = path.split('.')
         node = self.raw_dict
@@ -95,8 +124,92 @@ class ConfigManager(object):
                 raise KeyError(f"Invalid path: {path}")
             node = node[part]
         # Update
+        self._apply_section(parts, node, value_dict)
+
+    def _apply_section(self, parts: List[str], node: dict, value_dict: dict) -> None:
+        # Fast path: only the edited section view is rebuilt, document is neither reparsed nor serialized
+        parent, view = None, self.config
+        for part in parts:
+            parent, view = view, getattr(view, part, None)
+            if not isinstance(view, ConfigView):
+                # Dict-typed sections have no view of their own
+                self._merge_dict(node, value_dict)
+                return self._explode_raw_dict()
+        new_node = dict(node)
+        self._merge_dict(new_node, value_dict)
+        # Validate before anything is changed
+        ConfigView.check_type(type(view), new_node, view._path_prefix)
+        new_view = type(view)(new_node, view._path_prefix)
         self._merge_dict(node, value_dict)
-        self._explode_raw_dict()
+        if parent is None:
+            self.config = new_view
+        else:
+            setattr(parent, parts[-1], new_view)
+        self._raw = None
+        self.dirty = True
+
+    ##################
+    # Path mutations #
+    ##################
+
+    @staticmethod
+    def _child(container: Any, key: str, path: str) -> Tuple[Any, Optional[Type[Any]]]:
+        # Returns child value and item type if child is a dict-typed field
+        if isinstance(container, ConfigView):
+            if key not in container._field_constructor_map:
+                raise KeyError(f"Invalid path: {path}")
+            type_ = container._field_types[key]
+            item_type = None
+            if isinstance(type_, typing._GenericAlias) and type_._name == 'Dict':
+                item_type = type_.__args__[1]
+            return getattr(container, key), item_type
+        if isinstance(container, dict) and key in container:
+            return container[key], None
+        raise KeyError(f"Invalid path: {path}")
+
+    def _locate(self, path: str) -> Tuple[Any, dict, str, Type[Any]]:
+        parts = path.split('.')
+        container, node, item_type = self.config, self.raw_dict, None
+        for part in parts[:-1]:
+            container, item_type = self._child(container, part, path)
+            # Sections left at defaults are missing in raw document
+            node = node.setdefault(part, {})
+        key = parts[-1]
+        if isinstance(container, ConfigView):
+            if key not in container._field_constructor_map:
+                raise KeyError(f"Invalid path: {path}")
+            return container, node, key, container._field_types[key]
+        if item_type is None:
+            raise KeyError(f"Invalid path: {path}")
+        return container, node, key, item_type
+
+    def set(self, path: str, value: Any) -> Any:
+        container, node, key, type_ = self._locate(path)
+        value_prim = ConfigView.deconstruct_obj(value)
+        # Validate before anything is changed
+        ConfigView.check_type(type_, value_prim, path)
+        try:
+            new_value = ConfigView.get_type_constructor(type_)(value_prim, path)
+        except (TypeError, ValueError) as e:
+            raise InvalidConfigException(str(e), path) from e
+        if isinstance(container, ConfigView):
+            setattr(container, key, new_value)
+        else:
+            container[key] = new_value
+        node[key] = value_prim
+        self._raw = None
+        self.dirty = True
+        return new_value
+
+    def delete(self, path: str) -> None:
+        container, node, key, _ = self._locate(path)
+        # Only dict-typed section items can be removed, fields fall back to defaults otherwise
+        if not isinstance(container, dict) or key not in container:
+            raise KeyError(f"Invalid path: {path}")
+        del container[key]
+        node.pop(key, None)
+        self._raw = None
+        self.dirty = True
 
     @staticmethod
     def _merge_dict(d1, d2):
@@ -104,8 +217,12 @@ class ConfigManager(object):
             d1[k] = d2[k]
 
     def _explode_raw_dict(self) -> None:
+        applied_raw = self.applied_raw
         raw = self.serialize_obj(self.raw_dict)
         self.alter(raw)
+        # Still an edit on top of applied document
+        self.applied_raw = applied_raw
+        self.dirty = True
 
     def section_path(self, element: Type[ConfigView], source: Type[ConfigView]) -> Optional[str]:
         if source not in self._section_model_cache:
@@ -127,8 +244,11 @@ class ConfigManager(object):
         cache[element] = res
         return res
 
+    def find_section_path(self, model: Type[ConfigView]) -> Optional[str]:
+        return self.section_path(model, self.config.__class__)
+
     def find_section(self, model: Type[ConfigView]) -> Any:
-        path = self.section_path(model, self.config.__class__)
+        path = self.find_section_path(model)
         return self.config.get(path)
 
     @staticmethod
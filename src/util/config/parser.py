@@ -29,15 +29,21 @@ SOFTWARE.
 
 __author__ = "Mathtin"
 
-from typing import Tuple
+import hashlib
+import logging
+import marshal
+import os
+from typing import Any, Optional, Tuple
 
-import lark
 from ..exceptions import InvalidConfigException
-from ..resources import res_path
-from lark import Lark, Transformer
+from ..resources import res_path, cache_path
 
+log = logging.getLogger('config-parser')
 
-class TreeToDict(Transformer):
+
+# Plain callback holder, lark resolves rule callbacks by name, so lark
+# itself is not imported until a document actually has to be parsed
+class TreeToDict(object):
 
     list = list
     assignment = tuple
@@ -78,25 +84,91 @@ class TreeToDict(Transformer):
 
     @staticmethod
     def false(_) -> bool:
-        return True
+        return False
 
 
 class ConfigParser(object):
 
     _grammar: str
-    _parser: Lark
+    _grammar_file: str
+    _start: str
+    _cache: bool
+    _parser: Optional[Any]
 
-    def __init__(self, grammar_file='config_grammar.lark', start='root') -> None:
+    def __init__(self, grammar_file='config_grammar.lark', start='root', cache: bool = True) -> None:
         with open(res_path(grammar_file), 'r') as f:
             self._grammar = f.read()
-        self._parser = Lark(self._grammar, start=start, parser='lalr', transformer=TreeToDict())
+        self._grammar_file = grammar_file
+        self._start = start
+        self._cache = cache
+        # Built on first parse
+        self._parser = None
+
+    def _cache_file(self, suffix: str, *key_parts: str) -> Optional[str]:
+        key = hashlib.sha256('\0'.join((self._grammar, self._start) + key_parts).encode()).hexdigest()[:16]
+        path = cache_path(f'{os.path.splitext(self._grammar_file)[0]}-{key}{suffix}')
+        if path is None:
+            log.warning('Grammar cache is disabled: cache directory is missing or writable by other users')
+        return path
+
+    def _build(self, cache_file: Optional[str]) -> Any:
+        from lark import Lark
+        if cache_file is None:
+            return Lark(self._grammar, start=self._start, parser='lalr', transformer=TreeToDict())
+        try:
+            return Lark(self._grammar, start=self._start, parser='lalr', transformer=TreeToDict(), cache=cache_file)
+        except RuntimeError:
+            # Broken cache file, rebuild it
+            log.warning(f'Removing broken grammar cache: {cache_file}')
+            os.remove(cache_file)
+        except OSError as e:
+            log.warning(f'Failed to write grammar cache: {e}')
+            cache_file = None
+        return self._build(cache_file)
+
+    @property
+    def parser(self) -> Any:
+        if self._parser is None:
+            import lark
+            # Parser tables are keyed by grammar source, start rule and lark version
+            cache_file = self._cache_file('.lark', lark.__version__) if self._cache else None
+            self._parser = self._build(cache_file)
+        return self._parser
 
     @property
     def grammar(self) -> str:
         return self._grammar
 
-    def parse(self, data: str) -> dict:
+    def _parse(self, data: str) -> dict:
+        from lark.exceptions import UnexpectedInput
         try:
-            return self._parser.parse(data)
-        except lark.exceptions.UnexpectedToken as e:
+            return self.parser.parse(data)
+        except UnexpectedInput as e:
             raise InvalidConfigException(str(e), "root")
+
+    def parse(self, data: str, cache: bool = False) -> dict:
+        if not cache or not self._cache:
+            return self._parse(data)
+        # Single document slot, keyed by grammar and transformer source
+        with open(__file__, 'rb') as f:
+            source_key = hashlib.sha256(f.read()).hexdigest()
+        cache_file = self._cache_file('.parsed', source_key)
+        data_key = hashlib.sha256(data.encode()).hexdigest()
+        if cache_file is not None:
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached_key, res = marshal.load(f)
+                if cached_key == data_key:
+                    return res
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+        res = self._parse(data)
+        if cache_file is not None:
+            try:
+                tmp_file = f'{cache_file}.{os.getpid()}'
+                with open(tmp_file, 'wb') as f:
+                    marshal.dump([data_key, res], f)
+                os.replace(tmp_file, cache_file)
+            except (OSError, ValueError) as e:
+                log.warning(f'Failed to write parse cache: {e}')
+        return res
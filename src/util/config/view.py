@@ -30,12 +30,42 @@ SOFTWARE.
 __author__ = "Mathtin"
 
 import typing
+from operator import attrgetter
 
 from ..exceptions import InvalidConfigException
-from typing import Any, Callable, Dict, Type, get_type_hints
+from typing import Any, Callable, Dict, Tuple, Type, get_type_hints
 
+# Field types converted inline by compiled constructors
+INLINE_TYPES = (int, float, bool, str, list, dict)
+# Default values shared between instances as is
+IMMUTABLE_DEFAULTS = (type(None), int, float, bool, str, tuple)
+
+
+def _compile_on_init(self, values: typing.Optional[Dict[str, Any]] = None, path_prefix: str = '') -> None:
+    # First instance compiles specialized methods of its class
+    cls = type(self)
+    cls._compile()
+    cls.__init__(self, values, path_prefix)
+
+
+class ConfigViewMeta(type):
+
+    def __new__(mcs, name, bases, namespace):
+        fields = [f for f in namespace.get('__annotations__', {}) if not f.startswith('_')]
+        # Slots can't shadow class attributes, defaults are kept aside
+        defaults = {}
+        for base in reversed(bases):
+            defaults.update(getattr(base, '_field_defaults', {}))
+        defaults.update({f: namespace.pop(f) for f in fields if f in namespace})
+        namespace['__slots__'] = tuple(namespace.get('__slots__', ())) + tuple(fields)
+        namespace['_field_defaults'] = defaults
+        namespace.setdefault('__init__', _compile_on_init)
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class ConfigView(object, metaclass=ConfigViewMeta):
+    __slots__ = ('_path_prefix',)
 
-class ConfigView(object):
     # Class fields
     _type_constructor_map: Dict[Type[Any], Callable[[Any, str], Any]] = {
         int: lambda v, p: int(v),
@@ -46,49 +76,104 @@ class ConfigView(object):
         dict: lambda v, p: dict(v),
     }
     _field_constructor_map: Dict[str, Callable[[Any, str], Any]] = None
+    _field_types: Dict[str, Type[Any]]
+    _field_defaults: Dict[str, Any]
+    _fields: Tuple[str, ...] = ()
+    _path_getters: Dict[str, Callable[[Any], Any]]
 
     # Instance fields
     _path_prefix: str
 
-    def __init__(self, values: typing.Optional[Dict[str, Any]] = None, path_prefix: str = '') -> None:
-        if values is None:
-            values = {}
-        self._path_prefix = path_prefix
-        # Build {_field_constructor_map} for each class implementation
-        if self._field_constructor_map is None:
-            types = get_type_hints(self.__class__)
-            self.__class__._field_constructor_map = {
-                field: self.get_type_constructor(type_)
-                for field, type_ in types.items()
-                if not field.startswith('_')
-            }
-        # Construct each field value provided by {values}
-        for key, value in values.items():
-            if key not in self._field_constructor_map:
-                raise InvalidConfigException(f"Invalid key: {key}", self.path(key))
-            if value is not None:
-                constructor = self._field_constructor_map[key]
-                field_value = constructor(value, self.path(key))
-                setattr(self, key, field_value)
-
-    def get_type_constructor(self, type_: Type[Any]) -> Callable[[Any, str], Any]:
-        if type_ not in self._type_constructor_map:
-            self._type_constructor_map[type_] = self._resolve_constructor(type_)
-        return self._type_constructor_map[type_]
-
-    def _resolve_constructor(self, type_: Type[Any]) -> Callable[[Any, str], Any]:
+    ###############
+    # Compilation #
+    ###############
+
+    @classmethod
+    def _compile(cls) -> None:
+        types = get_type_hints(cls)
+        cls._field_types = {field: type_ for field, type_ in types.items() if not field.startswith('_')}
+        cls._field_constructor_map = {field: cls.get_type_constructor(type_)
+                                      for field, type_ in cls._field_types.items()}
+        cls._fields = tuple(cls._field_types)
+        cls._path_getters = {}
+        env = {'InvalidConfigException': InvalidConfigException, '_fields': frozenset(cls._fields), '_empty': {},
+               '_deconstruct': cls.deconstruct_obj}
+        init_lines = [
+            'def __init__(self, values=None, path_prefix=""):',
+            '    self._path_prefix = path_prefix',
+            '    if values is None:',
+            '        values = _empty',
+            '    elif not isinstance(values, dict):',
+            '        raise InvalidConfigException(f"Section expected, got: {values!r}", path_prefix or "root")',
+            '    else:',
+            '        for key in values:',
+            '            if key not in _fields:',
+            '                raise InvalidConfigException(f"Invalid key: {key}", self.path(key))',
+        ]
+        to_dict_items = []
+        for field, type_ in cls._field_types.items():
+            env[f'_c_{field}'] = cls._field_constructor_map[field]
+            path = f'(path_prefix + ".{field}" if path_prefix else "{field}")'
+            construct = f'{type_.__name__}(v)' if type_ in INLINE_TYPES else f'_c_{field}(v, {path})'
+            to_dict_items.append(f'"{field}": {cls._deconstruct_expr(type_, f"self.{field}")}')
+            init_lines.append(f'    v = values.get("{field}")')
+            if field not in cls._field_defaults:
+                init_lines.append(f'    if v is not None:')
+                init_lines.append(f'        self.{field} = {construct}')
+                continue
+            default = cls._field_defaults[field]
+            if isinstance(default, IMMUTABLE_DEFAULTS):
+                env[f'_d_{field}'] = default
+                default_expr = f'_d_{field}'
+            else:
+                # Mutable defaults are rebuilt, instances never share them
+                env[f'_d_{field}'] = cls.deconstruct_obj(default)
+                default_expr = f'_c_{field}(_d_{field}, {path})'
+            init_lines.append(f'    self.{field} = {default_expr} if v is None else {construct}')
+        to_dict_lines = ['def to_dict(self):', f'    return {{{", ".join(to_dict_items)}}}']
+        exec('\n'.join(init_lines) + '\n\n' + '\n'.join(to_dict_lines), env)
+        env['__init__'].__qualname__ = f'{cls.__qualname__}.__init__'
+        env['to_dict'].__qualname__ = f'{cls.__qualname__}.to_dict'
+        cls.__init__ = env['__init__']
+        cls.to_dict = env['to_dict']
+
+    @classmethod
+    def _deconstruct_expr(cls, type_: Type[Any], expr: str, depth: int = 0) -> str:
+        # Source expression converting {expr} of {type_} back to primitives
+        if type_ in (int, float, bool, str):
+            return expr
+        if isinstance(type_, type) and issubclass(type_, ConfigView):
+            return f'{expr}.to_dict()'
+        if isinstance(type_, typing._GenericAlias) and type_._name in ('List', 'Dict'):
+            item = f'e{depth}'
+            sub_expr = cls._deconstruct_expr(type_.__args__[-1], item, depth + 1)
+            if type_._name == 'List':
+                return f'list({expr})' if sub_expr == item else f'[{sub_expr} for {item} in {expr}]'
+            if sub_expr == item:
+                return f'dict({expr})'
+            return f'{{k{depth}: {sub_expr} for k{depth}, {item} in {expr}.items()}}'
+        return f'_deconstruct({expr})'
+
+    @classmethod
+    def get_type_constructor(cls, type_: Type[Any]) -> Callable[[Any, str], Any]:
+        if type_ not in cls._type_constructor_map:
+            cls._type_constructor_map[type_] = cls._resolve_constructor(type_)
+        return cls._type_constructor_map[type_]
+
+    @classmethod
+    def _resolve_constructor(cls, type_: Type[Any]) -> Callable[[Any, str], Any]:
         # Primitive types already exist, only ConfigView and complex List/Dict type-hints are supported
         if isinstance(type_, typing._GenericAlias):
             # Resolve complex List type-hint
             if type_._name == 'List':
-                sub_constructor = self.get_type_constructor(type_.__args__[0])
+                sub_constructor = cls.get_type_constructor(type_.__args__[0])
                 return lambda l, p: [sub_constructor(e, f'{p}[{i}]') for i, e in enumerate(l)]
             # Resolve complex Dict type-hint
             elif type_._name == 'Dict':
                 # Check key type
                 if type_.__args__[0] is not str:
                     raise TypeError(f"Unsupported dict key type hint: {type_.__args__[0]}")
-                sub_constructor = self.get_type_constructor(type_.__args__[1])
+                sub_constructor = cls.get_type_constructor(type_.__args__[1])
                 return lambda d, p: {k: sub_constructor(v, f'{p}.{k}') for k, v in d.items()}
             # Other type-hints are not supported
             raise TypeError(f"Unsupported type hint: {type_}")
@@ -97,23 +182,63 @@ class ConfigView(object):
             return type_
         raise TypeError(f"Unsupported type: {type_}")
 
+    ##############
+    # Validation #
+    ##############
+
+    @classmethod
+    def check_type(cls, type_: Type[Any], value: Any, path: str) -> None:
+        # Constructors convert leniently (bool('no') is True), edits are checked strictly before
+        if isinstance(type_, typing._GenericAlias):
+            container = list if type_._name == 'List' else dict
+            if not isinstance(value, container):
+                raise InvalidConfigException(f"Expected {container.__name__}, got: {value!r}", path)
+            if type_._name == 'List':
+                for i, e in enumerate(value):
+                    cls.check_type(type_.__args__[0], e, f'{path}[{i}]')
+            else:
+                for k, v in value.items():
+                    cls.check_type(type_.__args__[1], v, f'{path}.{k}')
+        elif isinstance(type_, type) and issubclass(type_, ConfigView):
+            if not isinstance(value, dict):
+                raise InvalidConfigException(f"Section expected, got: {value!r}", path)
+            if '_field_types' not in type_.__dict__:
+                type_._compile()
+            # Unknown keys are reported by section constructor, missing values fall back to defaults
+            for k, v in value.items():
+                if k in type_._field_types and v is not None:
+                    cls.check_type(type_._field_types[k], v, f'{path}.{k}' if path else k)
+        elif type_ is float:
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise InvalidConfigException(f"Expected float, got: {value!r}", path)
+        elif not isinstance(value, type_) or (type_ is int and isinstance(value, bool)):
+            raise InvalidConfigException(f"Expected {type_.__name__}, got: {value!r}", path)
+
+    ##########
+    # Access #
+    ##########
+
     def path(self, sub_path: str) -> str:
         return f'{self._path_prefix}.{sub_path}' if self._path_prefix else sub_path
 
     def get(self, path: str) -> Any:
         if path == '.':
             return self
-        parts = path.split('.')
-        node = self
-        for part in parts:
-            if not hasattr(node, part):
-                raise KeyError(f"Invalid path: {path}")
-            node = getattr(node, part)
-        return node
+        getter = self._path_getters.get(path)
+        try:
+            if getter is not None:
+                return getter(self)
+            getter = attrgetter(path)
+            res = getter(self)
+        except AttributeError:
+            raise KeyError(f"Invalid path: {path}")
+        # Only valid paths are cached
+        self._path_getters[path] = getter
+        return res
 
     def to_dict(self) -> dict:
         res = {}
-        for field in self._field_constructor_map:
+        for field in self._fields:
             value = getattr(self, field)
             res[field] = self.deconstruct_obj(value)
         return res
@@ -129,5 +254,5 @@ class ConfigView(object):
         return o
 
     def __iter__(self):
-        for field in self._field_constructor_map:
+        for field in self._fields:
             yield field, getattr(self, field)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from ..exceptions import InvalidConfigException
+from ..metrics import METRICS
+from .manager import ConfigManager
+
+log = logging.getLogger('config-watcher')
+
+CONFIG_FILE_RELOADS = METRICS.counter('overlord_config_file_reloads_total', 'Config file changes picked up by watcher',
+                                      ('result',))
+
+# raw document, parsed dict, constructed model
+ApplyCallback = Callable[[str, dict, Any], Awaitable[None]]
+ErrorCallback = Callable[[Exception], Awaitable[None]]
+
+# mtime, size, inode
+FileStat = Tuple[int, int, int]
+
+
+class ConfigWatcher(object):
+
+    manager: ConfigManager
+    interval: float
+    on_apply: ApplyCallback
+    on_error: ErrorCallback
+
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _thread: Optional[threading.Thread]
+    _stop: threading.Event
+    _stat: Optional[FileStat]
+
+    def __init__(self, manager: ConfigManager, interval_ms: int, on_apply: ApplyCallback,
+                 on_error: ErrorCallback) -> None:
+        self.manager = manager
+        self.interval = interval_ms / 1000
+        self.on_apply = on_apply
+        self.on_error = on_error
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._stat = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stat = self._file_stat()
+        # Fresh event per thread, a stopped thread may still be finishing its poll
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, args=(self._stop,), name='overlord-config-watcher',
+                                        daemon=True)
+        self._thread.start()
+        log.info(f'Watching {self.manager.path} for changes')
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        # Not joined: thread may be waiting for the loop this is called from,
+        # it exits on its own within one poll interval
+        self._stop.set()
+        self._thread = None
+
+    ##################
+    # Watcher thread #
+    ##################
+
+    def _file_stat(self) -> Optional[FileStat]:
+        try:
+            st = os.stat(self.manager.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _watch(self, stop: threading.Event) -> None:
+        candidate = None
+        while not stop.wait(self.interval):
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                candidate = None
+                continue
+            # File should stay unchanged for one poll, deployment tools may write it in chunks
+            if stat != candidate:
+                candidate = stat
+                continue
+            candidate = None
+            self._stat = stat
+            try:
+                self._reload(stop)
+            except Exception:
+                log.exception('Config watcher failed to reload config')
+
+    def _reload(self, stop: threading.Event) -> None:
+        try:
+            with open(self.manager.path, 'r') as f:
+                raw = f.read()
+        except OSError as e:
+            log.warning(f'Failed to read {self.manager.path}: {e}')
+            return
+        # Own saves are already applied
+        if raw == self.manager.applied_raw:
+            return
+        log.info(f'{self.manager.path} changed, loading')
+        try:
+            raw_dict, config = self.manager.load(raw, cache=True)
+        except Exception as e:
+            # Model constructors may raise anything on bad values
+            if not isinstance(e, InvalidConfigException):
+                e = InvalidConfigException(f'{type(e).__name__}: {e}', 'root')
+            log.warning(f'Invalid config file: {e}')
+            CONFIG_FILE_RELOADS.labels('invalid').inc()
+            self._call(self.on_error(e), stop)
+            return
+        CONFIG_FILE_RELOADS.labels('loaded').inc()
+        self._call(self.on_apply(raw, raw_dict, config), stop)
+
+    def _call(self, coro: Awaitable[None], stop: threading.Event) -> None:
+        # Applies are serialized, next change is picked up after loop is done with this one
+        if stop.is_set():
+            coro.close()
+            return
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        while True:
+            try:
+                future.result(timeout=self.interval)
+                return
+            except concurrent.futures.TimeoutError:
+                # Loop may be blocked by whoever stops the watcher, callback is left to finish on its own
+                if stop.is_set():
+                    return
+            except Exception:
+                log.exception('Config watcher callback failed')
+                return
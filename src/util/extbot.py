@@ -251,10 +251,12 @@ class ProgressEmbed(object):
     _current_step: int
     _name: str
     _state: int
+    _details: Optional[str]
 
     def __init__(self, name: str, base: discord.Embed) -> None:
         self._embed = base
         self._name = name
+        self._details = None
         self._msg = None
         self._date = None
         self._steps = []
@@ -264,6 +266,8 @@ class ProgressEmbed(object):
     def _format_embed(self) -> None:
         self._embed.title = self._format_step(self._name, self._state)
         self._embed.description = '\n'.join(['\n'.join(self._format_step(*s) for s in step) for step in self._steps])
+        if self._details:
+            self._embed.description += f'\n\n{self._details}'
         elapsed = int((datetime.now() - self._date).total_seconds())
         self._embed.description += f'\n\n{R.NAME.COMMON.STATE}: **{self.state}**\n'
         self._embed.description += f'{R.MESSAGE.STATUS.ELAPSED}: {pretty_seconds(elapsed)}'
@@ -284,6 +288,9 @@ class ProgressEmbed(object):
             return self.add_step([names])
         self._steps.append([(name, ProgressEmbed.NOT_STARTED) for name in names])
 
+    def set_details(self, details: Optional[str]) -> None:
+        self._details = details
+
     async def start(self, channel: discord.TextChannel) -> None:
         if not self._steps:
             raise ValueError("No steps provided")
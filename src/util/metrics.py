@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import bisect
+import logging
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+log = logging.getLogger('overlord-metrics')
+
+# Seconds, suitable for handlers, queries and REST calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+###################
+# Metric children #
+###################
+
+class CounterValue(object):
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class GaugeValue(object):
+    __slots__ = ('_value', '_func')
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._func = None
+
+    @property
+    def value(self) -> float:
+        if self._func is not None:
+            return float(self._func())
+        return self._value
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._value -= amount
+
+    # Value is evaluated on collection
+    def set_function(self, func: Callable[[], float]) -> None:
+        self._func = func
+
+
+class HistogramValue(object):
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+    @property
+    def avg(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    # Estimated from buckets by linear interpolation
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+
+###########
+# Metrics #
+###########
+
+class Metric(object):
+
+    kind: str = 'untyped'
+    name: str
+    description: str
+    label_names: Tuple[str, ...]
+    _children: Dict[LabelValues, object]
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._children = {}
+
+    def _new_child(self):
+        raise NotImplementedError()
+
+    def labels(self, *values: str):
+        try:
+            return self._children[values]
+        except KeyError:
+            if len(values) != len(self.label_names):
+                raise ValueError(f'{self.name} expects labels {self.label_names}, got {values}')
+            child = self._children[values] = self._new_child()
+            return child
+
+    def remove(self, *values: str) -> None:
+        self._children.pop(values, None)
+
+    def children(self) -> List[Tuple[LabelValues, object]]:
+        return list(self._children.items())
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self) -> GaugeValue:
+        return GaugeValue()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        self.labels().set_function(func)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    buckets: Tuple[float, ...]
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+############
+# Registry #
+############
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class MetricsRegistry(object):
+
+    started_at: float
+    _metrics: Dict[str, Metric]
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._metrics = {}
+
+    def _register(self, metric_type, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_type(name, *args, **kwargs)
+        elif type(metric) is not metric_type:
+            raise ValueError(f'Metric {name} already registered as {metric.kind}')
+        return metric
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, description, label_names)
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, description, label_names)
+
+    def histogram(self, name: str, description: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, label_names, buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def metrics(self) -> List[Metric]:
+        return list(self._metrics.values())
+
+    # Prometheus text exposition format (0.0.4)
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for values, child in metric.children():
+                labels = _format_labels(metric.label_names, values)
+                if metric.kind != 'histogram':
+                    lines.append(f'{metric.name}{labels} {child.value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, child.counts):
+                    cumulative += count
+                    le = _format_labels(metric.label_names, values, f'le="{bound}"')
+                    lines.append(f'{metric.name}_bucket{le} {cumulative}')
+                le = _format_labels(metric.label_names, values, 'le="+Inf"')
+                lines.append(f'{metric.name}_bucket{le} {child.count}')
+                lines.append(f'{metric.name}_sum{labels} {child.sum}')
+                lines.append(f'{metric.name}_count{labels} {child.count}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+
+################
+# Metered lock #
+################
+
+LOCK_WAIT_SECONDS = METRICS.histogram('overlord_lock_wait_seconds', 'Time spent waiting for a lock', ('lock',))
+LOCK_HOLD_SECONDS = METRICS.histogram('overlord_lock_hold_seconds', 'Time a lock was held', ('lock',))
+
+# Every live MeteredLock, inspected by the loop watchdog
+METERED_LOCKS = weakref.WeakSet()
+
+
+# asyncio.Lock drop-in recording wait and hold times
+class MeteredLock(object):
+
+    name: str
+    holder: Optional[asyncio.Task]
+    acquired_at: float
+    _lock: asyncio.Lock
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.holder = None
+        self.acquired_at = 0.0
+        self._lock = asyncio.Lock()
+        self._wait = LOCK_WAIT_SECONDS.labels(name)
+        self._hold = LOCK_HOLD_SECONDS.labels(name)
+        METERED_LOCKS.add(self)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    @property
+    def waiters(self) -> int:
+        waiters = getattr(self._lock, '_waiters', None)
+        return len(waiters) if waiters else 0
+
+    async def acquire(self) -> bool:
+        started_at = time.perf_counter()
+        await self._lock.acquire()
+        self.acquired_at = time.perf_counter()
+        self.holder = asyncio.current_task()
+        self._wait.observe(self.acquired_at - started_at)
+        return True
+
+    def release(self) -> None:
+        self._hold.observe(time.perf_counter() - self.acquired_at)
+        self.holder = None
+        self._lock.release()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+##################
+# Metrics server #
+##################
+
+# Minimal HTTP endpoint serving the registry for Prometheus scrapes
+class MetricsServer(object):
+
+    host: str
+    port: int
+    registry: MetricsRegistry
+    _server: Optional[asyncio.AbstractServer]
+
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = METRICS) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request.decode('latin-1').split()
+            # Skip headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/', '/metrics'):
+                status, body = '200 OK', self.registry.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(f'HTTP/1.1 {status}\r\n'
+                         f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         f'Content-Length: {len(body)}\r\n'
+                         f'Connection: close\r\n\r\n'.encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info(f'Serving metrics on http://{self.host}:{self.port}/metrics')
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
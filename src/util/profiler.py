@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_CPU = 'cpu'
+PROFILE_WALL = 'wall'
+PROFILE_ALLOC = 'alloc'
+PROFILE_MODES = (PROFILE_CPU, PROFILE_WALL, PROFILE_ALLOC)
+
+# 200 samples/s keep sampler overhead well below 1% of a core
+DEFAULT_INTERVAL = 0.005
+# Shallow tracebacks keep tracemalloc overhead low under live load
+ALLOC_TRACEBACK_LIMIT = 4
+MAX_STACK_DEPTH = 128
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(filename: str, lineno: int, name: str) -> str:
+    return f'{name} ({os.path.basename(filename)}:{lineno})'
+
+
+# Loop is considered idle while waiting inside the selector
+def _is_idle(frame: FrameType) -> bool:
+    return frame.f_code.co_filename.endswith('selectors.py')
+
+
+def _collapse(frame: FrameType) -> Tuple[str, ...]:
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+##################
+# Profile report #
+##################
+
+class ProfileReport(object):
+
+    mode: str
+    unit: str
+    duration: float
+    samples: int
+    stacks: Counter
+
+    def __init__(self, mode: str, unit: str, duration: float, samples: int, stacks: Counter) -> None:
+        self.mode = mode
+        self.unit = unit
+        self.duration = duration
+        self.samples = samples
+        self.stacks = stacks
+
+    @property
+    def total(self) -> int:
+        return sum(self.stacks.values())
+
+    def functions(self) -> Dict[str, Tuple[int, int]]:
+        # label -> (cumulative, self); recursion is counted once per stack
+        cumulative, own = Counter(), Counter()
+        for stack, weight in self.stacks.items():
+            for label in set(stack):
+                cumulative[label] += weight
+            own[stack[-1]] += weight
+        return {label: (value, own[label]) for label, value in cumulative.items()}
+
+    def top(self, n: int) -> str:
+        total = self.total or 1
+        rows = sorted(self.functions().items(), key=lambda kv: kv[1], reverse=True)[:n]
+        lines = [f'mode: {self.mode}, duration: {self.duration:.1f}s, samples: {self.samples}, '
+                 f'total: {self.total} {self.unit}',
+                 '',
+                 f'{"cum %":>7} {"self %":>7} {"cum":>12} {"self":>12}  function']
+        for label, (cum, own) in rows:
+            lines.append(f'{cum * 100 / total:7.2f} {own * 100 / total:7.2f} {cum:12} {own:12}  {label}')
+        return '\n'.join(lines) + '\n'
+
+    # Brendan Gregg's collapsed format, consumable by flamegraph.pl and speedscope
+    def collapsed(self) -> str:
+        lines = [f'{";".join(stack)} {weight}' for stack, weight in self.stacks.most_common()]
+        return '\n'.join(lines) + '\n'
+
+
+##################
+# Stack sampling #
+##################
+
+class StackSampler(object):
+
+    thread_id: int
+    interval: float
+    skip_idle: bool
+    samples: int
+    stacks: Counter
+    _stop: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL, skip_idle: bool = True) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.skip_idle = skip_idle
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            if self.skip_idle and _is_idle(frame):
+                continue
+            self.stacks[_collapse(frame)] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='overlord-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def is_profiling() -> bool:
+    return _profile_lock.locked()
+
+
+async def profile_event_loop(seconds: float, mode: str = PROFILE_CPU,
+                             interval: float = DEFAULT_INTERVAL) -> ProfileReport:
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'Unknown profile mode: {mode}')
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError('Profiler is already running')
+    try:
+        started_at = time.perf_counter()
+        if mode == PROFILE_ALLOC:
+            return await _profile_alloc(seconds, started_at)
+        sampler = StackSampler(threading.get_ident(), interval, skip_idle=mode == PROFILE_CPU)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        return ProfileReport(mode, 'samples', time.perf_counter() - started_at, sampler.samples, sampler.stacks)
+    finally:
+        _profile_lock.release()
+
+
+def _alloc_stacks(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> Tuple[int, Counter]:
+    stacks = Counter()
+    samples = 0
+    for stat in after.compare_to(before, 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        samples += stat.count_diff
+        # Traceback frames are ordered from the oldest one
+        stack = tuple(f'{os.path.basename(f.filename)}:{f.lineno}' for f in stat.traceback)
+        stacks[stack] += stat.size_diff
+    return samples, stacks
+
+
+async def _profile_alloc(seconds: float, started_at: float) -> ProfileReport:
+    # Memory still allocated at the end of the window, attributed to allocating stacks
+    loop = asyncio.get_running_loop()
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(ALLOC_TRACEBACK_LIMIT)
+    try:
+        # Snapshots are built and compared off the loop, gateway keeps being served meanwhile
+        before = await loop.run_in_executor(None, tracemalloc.take_snapshot)
+        await asyncio.sleep(seconds)
+        after = await loop.run_in_executor(None, tracemalloc.take_snapshot)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    samples, stacks = await loop.run_in_executor(None, _alloc_stacks, before, after)
+    return ProfileReport(PROFILE_ALLOC, 'bytes', time.perf_counter() - started_at, samples, stacks)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import METRICS
+
+log = logging.getLogger('overlord-recorder')
+
+# Gateway opcode of dispatched events
+OP_DISPATCH = 0
+
+RECORDED_EVENTS = METRICS.counter('overlord_recorder_events_total', 'Gateway events written to capture')
+RECORDER_DROPPED = METRICS.counter('overlord_recorder_dropped_total', 'Gateway events dropped by full recorder queue')
+
+# (unix timestamp, gateway event name, raw payload)
+CapturedEvent = Tuple[float, str, Dict[str, Any]]
+
+
+def capture_files(path: str) -> List[str]:
+    # Oldest backup goes first, active file is the last one
+    backups = [p for p in glob.glob(f'{glob.escape(path)}.*') if p[len(path) + 1:].isdigit()]
+    backups.sort(key=lambda p: int(p[len(path) + 1:]), reverse=True)
+    return backups + ([path] if os.path.exists(path) else [])
+
+
+def read_capture(path: str) -> Iterator[CapturedEvent]:
+    for file_path in capture_files(path):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    ts, event, data = json.loads(line)
+                    yield ts, event, data
+            except (EOFError, json.JSONDecodeError):
+                # Capture was not closed properly, tail is lost
+                log.warning(f'Truncated capture file: {file_path}')
+
+
+class GatewayRecorder(object):
+
+    path: str
+    max_bytes: int
+    backup_count: int
+    max_pending: int
+    recorded: int
+    dropped: int
+
+    _queue: queue.Queue
+    _thread: Optional[threading.Thread]
+    _file: Optional[gzip.GzipFile]
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int, max_pending: int = 100000) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_pending = max_pending
+        self.recorded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._file = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='overlord-recorder', daemon=True)
+        self._thread.start()
+        log.info(f'Recording gateway events to {self.path}')
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        # Writer drains the queue before exit
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        self._thread = None
+        log.info(f'Recorded {self.recorded} gateway events ({self.dropped} dropped)')
+
+    def record(self, msg: Dict[str, Any]) -> None:
+        if msg.get('op') != OP_DISPATCH or self._thread is None:
+            return
+        if self._queue.full():
+            self.dropped += 1
+            RECORDER_DROPPED.inc()
+            return
+        # discord.py parsers pop keys from payload right after this event, so it is serialized here
+        line = json.dumps((time.time(), msg['t'], msg['d']), separators=(',', ':'), ensure_ascii=False)
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+            RECORDER_DROPPED.inc()
+
+    #################
+    # Writer thread #
+    #################
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, 'ab')
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f'{self.path}.{i}'
+                if os.path.exists(src):
+                    os.replace(src, f'{self.path}.{i + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, batch: List[str]) -> None:
+        self._file.write(('\n'.join(batch) + '\n').encode('utf-8'))
+        # Sync flush keeps everything written so far readable after a crash
+        self._file.flush()
+        self.recorded += len(batch)
+        RECORDED_EVENTS.inc(len(batch))
+        if self.max_bytes > 0 and self._file.fileobj.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _run(self) -> None:
+        try:
+            self._open()
+        except OSError as e:
+            log.error(f'Failed to open capture file {self.path}: {e}')
+            self._thread = None
+            return
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Drain whatever is queued into one write
+            while len(batch) < 1024:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except OSError as e:
+                log.error(f'Failed to write capture: {e}')
+            except Exception:
+                log.exception('Unexpected capture writer error')
+        self._file.close()
+        self._file = None
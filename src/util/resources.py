@@ -29,8 +29,11 @@ SOFTWARE.
 
 __author__ = "Mathtin"
     
+import hashlib
+import marshal
 import os.path
-from typing import Dict
+import sys
+from typing import Dict, Optional
 import xml.etree.ElementTree as ET
 from .exceptions import MissingResourceException
 
@@ -40,6 +43,65 @@ def res_path(local_path: str):
     return os.path.join(path, local_path)
 
 
+def cache_dir() -> Optional[str]:
+    # Derived data only, safe to delete
+    default_root = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.getenv('CACHE_PATH') or os.path.join(default_root, 'overlord')
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Grammar cache is a pickle, directory writable by anyone else is not trusted
+    if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+        return None
+    return path
+
+
+def cache_path(local_path: str) -> Optional[str]:
+    path = cache_dir()
+    return path and os.path.join(path, local_path)
+
+
+def build_string_index(path: str) -> Dict[str, Dict[str, str]]:
+    # lang -> 'section.type.name' -> text
+    index = {}
+    for section in ET.parse(path).getroot():
+        for string in section:
+            key = f'{section.tag}.{string.attrib["type"]}.{string.attrib["name"]}'
+            index.setdefault(string.attrib['lang'], {})[key] = string.text
+    return index
+
+
+def load_string_index(path: str, cache: bool = True) -> Dict[str, Dict[str, str]]:
+    if not cache:
+        return build_string_index(path)
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    source = [path, stat.st_mtime_ns, stat.st_size]
+    path_hash = hashlib.sha1(path.encode()).hexdigest()[:12]
+    cache_file = cache_path(f'{os.path.basename(path)}.{path_hash}.{sys.implementation.cache_tag}.marshal')
+    if cache_file is None:
+        return build_string_index(path)
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_source, index = marshal.load(f)
+        if cached_source == source:
+            return index
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    index = build_string_index(path)
+    # Cache is an optimization only, read-only locations are fine
+    try:
+        tmp_file = f'{cache_file}.{os.getpid()}'
+        with open(tmp_file, 'wb') as f:
+            marshal.dump([source, index], f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return index
+
+
 class XStrings(object):
     class XName(object):
         class XCommon(object):
@@ -47,53 +109,78 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def TRACEBACK(self) -> str:
-                return self.get("traceback")
+                return self._res._strings.get("names.common.traceback", "names.common.traceback")
         
             @property
             def EXTENSION(self) -> str:
-                return self.get("extension")
+                return self._res._strings.get("names.common.extension", "names.common.extension")
         
             @property
             def GUILD(self) -> str:
-                return self.get("guild")
+                return self._res._strings.get("names.common.guild", "names.common.guild")
         
             @property
             def CHANNEL(self) -> str:
-                return self.get("channel")
+                return self._res._strings.get("names.common.channel", "names.common.channel")
         
             @property
             def ERROR(self) -> str:
-                return self.get("error")
+                return self._res._strings.get("names.common.error", "names.common.error")
         
             @property
             def INFO(self) -> str:
-                return self.get("info")
+                return self._res._strings.get("names.common.info", "names.common.info")
         
             @property
             def LOG_CHANNEL(self) -> str:
-                return self.get("log-channel")
+                return self._res._strings.get("names.common.log-channel", "names.common.log-channel")
         
             @property
             def CONTROL_CHANNEL(self) -> str:
-                return self.get("control-channel")
+                return self._res._strings.get("names.common.control-channel", "names.common.control-channel")
         
             @property
             def MAINTAINER(self) -> str:
-                return self.get("maintainer")
+                return self._res._strings.get("names.common.maintainer", "names.common.maintainer")
         
             @property
             def STATE(self) -> str:
-                return self.get("state")
+                return self._res._strings.get("names.common.state", "names.common.state")
         
             @property
             def PROGRESS(self) -> str:
-                return self.get("progress")
+                return self._res._strings.get("names.common.progress", "names.common.progress")
+        
+            @property
+            def CHANNELS(self) -> str:
+                return self._res._strings.get("names.common.channels", "names.common.channels")
+        
+            @property
+            def MESSAGES(self) -> str:
+                return self._res._strings.get("names.common.messages", "names.common.messages")
+        
+            @property
+            def REACTIONS(self) -> str:
+                return self._res._strings.get("names.common.reactions", "names.common.reactions")
+        
+            @property
+            def PRE_READY_EVENTS(self) -> str:
+                return self._res._strings.get("names.common.pre-ready-events", "names.common.pre-ready-events")
+        
+            @property
+            def UPTIME(self) -> str:
+                return self._res._strings.get("names.common.uptime", "names.common.uptime")
+        
+            @property
+            def EVENTS(self) -> str:
+                return self._res._strings.get("names.common.events", "names.common.events")
         
     
         class XUserStat(object):
@@ -101,49 +188,50 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def MEMBERSHIP(self) -> str:
-                return self.get("membership")
+                return self._res._strings.get("names.user-stat.membership", "names.user-stat.membership")
         
             @property
             def NEW_MESSAGE_COUNT(self) -> str:
-                return self.get("new-message-count")
+                return self._res._strings.get("names.user-stat.new-message-count", "names.user-stat.new-message-count")
         
             @property
             def DELETE_MESSAGE_COUNT(self) -> str:
-                return self.get("delete-message-count")
+                return self._res._strings.get("names.user-stat.delete-message-count", "names.user-stat.delete-message-count")
         
             @property
             def EDIT_MESSAGE_COUNT(self) -> str:
-                return self.get("edit-message-count")
+                return self._res._strings.get("names.user-stat.edit-message-count", "names.user-stat.edit-message-count")
         
             @property
             def NEW_REACTION_COUNT(self) -> str:
-                return self.get("new-reaction-count")
+                return self._res._strings.get("names.user-stat.new-reaction-count", "names.user-stat.new-reaction-count")
         
             @property
             def DELETE_REACTION_COUNT(self) -> str:
-                return self.get("delete-reaction-count")
+                return self._res._strings.get("names.user-stat.delete-reaction-count", "names.user-stat.delete-reaction-count")
         
             @property
             def VC_TIME(self) -> str:
-                return self.get("vc-time")
+                return self._res._strings.get("names.user-stat.vc-time", "names.user-stat.vc-time")
         
             @property
             def MIN_WEIGHT(self) -> str:
-                return self.get("min-weight")
+                return self._res._strings.get("names.user-stat.min-weight", "names.user-stat.min-weight")
         
             @property
             def MAX_WEIGHT(self) -> str:
-                return self.get("max-weight")
+                return self._res._strings.get("names.user-stat.max-weight", "names.user-stat.max-weight")
         
             @property
             def EXACT_WEIGHT(self) -> str:
-                return self.get("exact-weight")
+                return self._res._strings.get("names.user-stat.exact-weight", "names.user-stat.exact-weight")
         
     
         _section_name = "names"
@@ -164,29 +252,30 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def DEFAULT(self) -> str:
-                return self.get("default")
+                return self._res._strings.get("embeds.header.default", "embeds.header.default")
         
             @property
             def ERROR_REPORT(self) -> str:
-                return self.get("error-report")
+                return self._res._strings.get("embeds.header.error-report", "embeds.header.error-report")
         
             @property
             def WARN_REPORT(self) -> str:
-                return self.get("warn-report")
+                return self._res._strings.get("embeds.header.warn-report", "embeds.header.warn-report")
         
             @property
             def INFO_REPORT(self) -> str:
-                return self.get("info-report")
+                return self._res._strings.get("embeds.header.info-report", "embeds.header.info-report")
         
             @property
             def LOG_REPORT(self) -> str:
-                return self.get("log-report")
+                return self._res._strings.get("embeds.header.log-report", "embeds.header.log-report")
         
     
         class XFooter(object):
@@ -194,13 +283,14 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def DEFAULT(self) -> str:
-                return self.get("default")
+                return self._res._strings.get("embeds.footer.default", "embeds.footer.default")
         
     
         class XTitle(object):
@@ -208,61 +298,106 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def SUCCESS(self) -> str:
-                return self.get("success")
+                return self._res._strings.get("embeds.title.success", "embeds.title.success")
         
             @property
             def ERROR(self) -> str:
-                return self.get("error")
+                return self._res._strings.get("embeds.title.error", "embeds.title.error")
         
             @property
             def WARNING(self) -> str:
-                return self.get("warning")
+                return self._res._strings.get("embeds.title.warning", "embeds.title.warning")
         
             @property
             def INFO(self) -> str:
-                return self.get("info")
+                return self._res._strings.get("embeds.title.info", "embeds.title.info")
         
             @property
             def TRACEBACK(self) -> str:
-                return self.get("traceback")
+                return self._res._strings.get("embeds.title.traceback", "embeds.title.traceback")
         
             @property
             def SUMMARY(self) -> str:
-                return self.get("summary")
+                return self._res._strings.get("embeds.title.summary", "embeds.title.summary")
         
             @property
             def CALL_ARGS(self) -> str:
-                return self.get("call-args")
+                return self._res._strings.get("embeds.title.call-args", "embeds.title.call-args")
         
             @property
             def COMMANDS_LIST(self) -> str:
-                return self.get("commands-list")
+                return self._res._strings.get("embeds.title.commands-list", "embeds.title.commands-list")
         
             @property
             def STAT_TYPE_LIST(self) -> str:
-                return self.get("stat-type-list")
+                return self._res._strings.get("embeds.title.stat-type-list", "embeds.title.stat-type-list")
         
             @property
             def STATS_LIST(self) -> str:
-                return self.get("stats-list")
+                return self._res._strings.get("embeds.title.stats-list", "embeds.title.stats-list")
         
             @property
             def RANK_TABLE(self) -> str:
-                return self.get("rank-table")
+                return self._res._strings.get("embeds.title.rank-table", "embeds.title.rank-table")
         
             @property
             def CONFIG_VALUE(self) -> str:
-                return self.get("config-value")
+                return self._res._strings.get("embeds.title.config-value", "embeds.title.config-value")
         
             @property
             def EXTENSION_STATUS_LIST(self) -> str:
-                return self.get("extension-status-list")
+                return self._res._strings.get("embeds.title.extension-status-list", "embeds.title.extension-status-list")
+        
+            @property
+            def DISPATCH_QUEUES(self) -> str:
+                return self._res._strings.get("embeds.title.dispatch-queues", "embeds.title.dispatch-queues")
+        
+            @property
+            def METRICS(self) -> str:
+                return self._res._strings.get("embeds.title.metrics", "embeds.title.metrics")
+        
+            @property
+            def METRICS_HANDLERS(self) -> str:
+                return self._res._strings.get("embeds.title.metrics-handlers", "embeds.title.metrics-handlers")
+        
+            @property
+            def METRICS_DB(self) -> str:
+                return self._res._strings.get("embeds.title.metrics-db", "embeds.title.metrics-db")
+        
+            @property
+            def METRICS_LOCKS(self) -> str:
+                return self._res._strings.get("embeds.title.metrics-locks", "embeds.title.metrics-locks")
+        
+            @property
+            def METRICS_TASKS(self) -> str:
+                return self._res._strings.get("embeds.title.metrics-tasks", "embeds.title.metrics-tasks")
+        
+            @property
+            def METRICS_REST(self) -> str:
+                return self._res._strings.get("embeds.title.metrics-rest", "embeds.title.metrics-rest")
+        
+            @property
+            def QUERY_STATS(self) -> str:
+                return self._res._strings.get("embeds.title.query-stats", "embeds.title.query-stats")
+        
+            @property
+            def LOOP_STALL(self) -> str:
+                return self._res._strings.get("embeds.title.loop-stall", "embeds.title.loop-stall")
+        
+            @property
+            def LOCK_HOLD(self) -> str:
+                return self._res._strings.get("embeds.title.lock-hold", "embeds.title.lock-hold")
+        
+            @property
+            def CONFIG_RELOAD_FAILED(self) -> str:
+                return self._res._strings.get("embeds.title.config-reload-failed", "embeds.title.config-reload-failed")
         
     
         _section_name = "embeds"
@@ -285,77 +420,98 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def COMMITTING(self) -> str:
-                return self.get("committing")
+                return self._res._strings.get("messages.status.committing", "messages.status.committing")
         
             @property
             def BUSY(self) -> str:
-                return self.get("busy")
+                return self._res._strings.get("messages.status.busy", "messages.status.busy")
         
             @property
             def PING(self) -> str:
-                return self.get("ping")
+                return self._res._strings.get("messages.status.ping", "messages.status.ping")
         
             @property
             def SYNC_USERS(self) -> str:
-                return self.get("sync-users")
+                return self._res._strings.get("messages.status.sync-users", "messages.status.sync-users")
         
             @property
             def UPDATING_RANKS(self) -> str:
-                return self.get("updating-ranks")
+                return self._res._strings.get("messages.status.updating-ranks", "messages.status.updating-ranks")
         
             @property
             def UPDATING_RANK(self) -> str:
-                return self.get("updating-rank")
+                return self._res._strings.get("messages.status.updating-rank", "messages.status.updating-rank")
         
             @property
             def DB_CLEAR_CHANNEL(self) -> str:
-                return self.get("db-clear-channel")
+                return self._res._strings.get("messages.status.db-clear-channel", "messages.status.db-clear-channel")
         
             @property
             def DB_LOAD_CHANNEL(self) -> str:
-                return self.get("db-load-channel")
+                return self._res._strings.get("messages.status.db-load-channel", "messages.status.db-load-channel")
+        
+            @property
+            def DB_LOAD_GUILD(self) -> str:
+                return self._res._strings.get("messages.status.db-load-guild", "messages.status.db-load-guild")
         
             @property
             def DB_DROP_TABLE(self) -> str:
-                return self.get("db-drop-table")
+                return self._res._strings.get("messages.status.db-drop-table", "messages.status.db-drop-table")
         
             @property
             def DB_DROP(self) -> str:
-                return self.get("db-drop")
+                return self._res._strings.get("messages.status.db-drop", "messages.status.db-drop")
         
             @property
             def CLEAR_STATS(self) -> str:
-                return self.get("clear-stats")
+                return self._res._strings.get("messages.status.clear-stats", "messages.status.clear-stats")
         
             @property
             def CALC_STATS(self) -> str:
-                return self.get("calc-stats")
+                return self._res._strings.get("messages.status.calc-stats", "messages.status.calc-stats")
         
             @property
             def STOP_EXTENSION(self) -> str:
-                return self.get("stop-extension")
+                return self._res._strings.get("messages.status.stop-extension", "messages.status.stop-extension")
         
             @property
             def REPORTED_TO(self) -> str:
-                return self.get("reported-to")
+                return self._res._strings.get("messages.status.reported-to", "messages.status.reported-to")
         
             @property
             def STARTED(self) -> str:
-                return self.get("started")
+                return self._res._strings.get("messages.status.started", "messages.status.started")
         
             @property
             def SUCCESS(self) -> str:
-                return self.get("success")
+                return self._res._strings.get("messages.status.success", "messages.status.success")
         
             @property
             def ELAPSED(self) -> str:
-                return self.get("elapsed")
+                return self._res._strings.get("messages.status.elapsed", "messages.status.elapsed")
+        
+            @property
+            def THROUGHPUT(self) -> str:
+                return self._res._strings.get("messages.status.throughput", "messages.status.throughput")
+        
+            @property
+            def ETA(self) -> str:
+                return self._res._strings.get("messages.status.eta", "messages.status.eta")
+        
+            @property
+            def PROFILING(self) -> str:
+                return self._res._strings.get("messages.status.profiling", "messages.status.profiling")
+        
+            @property
+            def QUERY_STATS_DISABLED(self) -> str:
+                return self._res._strings.get("messages.status.query-stats-disabled", "messages.status.query-stats-disabled")
         
     
         class XState(object):
@@ -363,37 +519,38 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def FINISHED(self) -> str:
-                return self.get("finished")
+                return self._res._strings.get("messages.state.finished", "messages.state.finished")
         
             @property
             def IN_PROGRESS(self) -> str:
-                return self.get("in-progress")
+                return self._res._strings.get("messages.state.in-progress", "messages.state.in-progress")
         
             @property
             def FAILED(self) -> str:
-                return self.get("failed")
+                return self._res._strings.get("messages.state.failed", "messages.state.failed")
         
             @property
             def SUCCESS(self) -> str:
-                return self.get("success")
+                return self._res._strings.get("messages.state.success", "messages.state.success")
         
             @property
             def NOT_STARTED(self) -> str:
-                return self.get("not-started")
+                return self._res._strings.get("messages.state.not-started", "messages.state.not-started")
         
             @property
             def UNKNOWN(self) -> str:
-                return self.get("unknown")
+                return self._res._strings.get("messages.state.unknown", "messages.state.unknown")
         
             @property
             def SKIPPED(self) -> str:
-                return self.get("skipped")
+                return self._res._strings.get("messages.state.skipped", "messages.state.skipped")
         
     
         class XError(object):
@@ -401,25 +558,26 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def INTERNAL(self) -> str:
-                return self.get("internal")
+                return self._res._strings.get("messages.error.internal", "messages.error.internal")
         
             @property
             def NO_ACCESS(self) -> str:
-                return self.get("no-access")
+                return self._res._strings.get("messages.error.no-access", "messages.error.no-access")
         
             @property
             def INVALID_ARGUMENT(self) -> str:
-                return self.get("invalid-argument")
+                return self._res._strings.get("messages.error.invalid-argument", "messages.error.invalid-argument")
         
             @property
             def UNKNOWN_COMMAND(self) -> str:
-                return self.get("unknown-command")
+                return self._res._strings.get("messages.error.unknown-command", "messages.error.unknown-command")
         
     
         class XDError(object):
@@ -427,61 +585,62 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def UNKNOWN_USER(self) -> str:
-                return self.get("unknown-user")
+                return self._res._strings.get("messages.d-error.unknown-user", "messages.d-error.unknown-user")
         
             @property
             def INVALID_USER(self) -> str:
-                return self.get("invalid-user")
+                return self._res._strings.get("messages.d-error.invalid-user", "messages.d-error.invalid-user")
         
             @property
             def INVALID_USER_MENTION(self) -> str:
-                return self.get("invalid-user-mention")
+                return self._res._strings.get("messages.d-error.invalid-user-mention", "messages.d-error.invalid-user-mention")
         
             @property
             def UNKNOWN_MEMBER(self) -> str:
-                return self.get("unknown-member")
+                return self._res._strings.get("messages.d-error.unknown-member", "messages.d-error.unknown-member")
         
             @property
             def INVALID_MEMBER(self) -> str:
-                return self.get("invalid-member")
+                return self._res._strings.get("messages.d-error.invalid-member", "messages.d-error.invalid-member")
         
             @property
             def INVALID_MEMBER_MENTION(self) -> str:
-                return self.get("invalid-member-mention")
+                return self._res._strings.get("messages.d-error.invalid-member-mention", "messages.d-error.invalid-member-mention")
         
             @property
             def USER_NOT_MEMBER(self) -> str:
-                return self.get("user-not-member")
+                return self._res._strings.get("messages.d-error.user-not-member", "messages.d-error.user-not-member")
         
             @property
             def UNKNOWN_CHANNEL(self) -> str:
-                return self.get("unknown-channel")
+                return self._res._strings.get("messages.d-error.unknown-channel", "messages.d-error.unknown-channel")
         
             @property
             def INVALID_CHANNEL(self) -> str:
-                return self.get("invalid-channel")
+                return self._res._strings.get("messages.d-error.invalid-channel", "messages.d-error.invalid-channel")
         
             @property
             def CHANNEL_NOT_TEXT(self) -> str:
-                return self.get("channel-not-text")
+                return self._res._strings.get("messages.d-error.channel-not-text", "messages.d-error.channel-not-text")
         
             @property
             def CHANNEL_NOT_VOICE(self) -> str:
-                return self.get("channel-not-voice")
+                return self._res._strings.get("messages.d-error.channel-not-voice", "messages.d-error.channel-not-voice")
         
             @property
             def UNKNOWN_ROLE(self) -> str:
-                return self.get("unknown-role")
+                return self._res._strings.get("messages.d-error.unknown-role", "messages.d-error.unknown-role")
         
             @property
             def INVALID_ROLE(self) -> str:
-                return self.get("invalid-role")
+                return self._res._strings.get("messages.d-error.invalid-role", "messages.d-error.invalid-role")
         
     
         class XDbError(object):
@@ -489,17 +648,18 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def UNKNOWN_USER(self) -> str:
-                return self.get("unknown-user")
+                return self._res._strings.get("messages.db-error.unknown-user", "messages.db-error.unknown-user")
         
             @property
             def INVALID_USER(self) -> str:
-                return self.get("invalid-user")
+                return self._res._strings.get("messages.db-error.invalid-user", "messages.db-error.invalid-user")
         
     
         class XConfigError(object):
@@ -507,17 +667,18 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def INVALID_PATH(self) -> str:
-                return self.get("invalid-path")
+                return self._res._strings.get("messages.config-error.invalid-path", "messages.config-error.invalid-path")
         
             @property
             def PARSE_FAIL(self) -> str:
-                return self.get("parse-fail")
+                return self._res._strings.get("messages.config-error.parse-fail", "messages.config-error.parse-fail")
         
     
         class XErrorOther(object):
@@ -525,33 +686,34 @@ class XStrings(object):
         
             def __init__(self, section) -> None:
                 self._section = section
+                self._res = section._res
         
             def get(self, string_name) -> str:
                 return self._section.get(self._type_name, string_name)
         
             @property
             def INVALID_RANK(self) -> str:
-                return self.get("invalid-rank")
+                return self._res._strings.get("messages.error-other.invalid-rank", "messages.error-other.invalid-rank")
         
             @property
             def UNKNOWN_RANK(self) -> str:
-                return self.get("unknown-rank")
+                return self._res._strings.get("messages.error-other.unknown-rank", "messages.error-other.unknown-rank")
         
             @property
             def DUPLICATE_RANK(self) -> str:
-                return self.get("duplicate-rank")
+                return self._res._strings.get("messages.error-other.duplicate-rank", "messages.error-other.duplicate-rank")
         
             @property
             def DUPLICATE_WEIGHT(self) -> str:
-                return self.get("duplicate-weight")
+                return self._res._strings.get("messages.error-other.duplicate-weight", "messages.error-other.duplicate-weight")
         
             @property
             def UNKNOWN_STAT(self) -> str:
-                return self.get("unknown-stat")
+                return self._res._strings.get("messages.error-other.unknown-stat", "messages.error-other.unknown-stat")
         
             @property
             def NEGATIVE_STAT_VALUE(self) -> str:
-                return self.get("negative-stat-value")
+                return self._res._strings.get("messages.error-other.negative-stat-value", "messages.error-other.negative-stat-value")
         
     
         _section_name = "messages"
@@ -577,17 +739,17 @@ class XStrings(object):
             return self._res.get(self._section_name, type_name, string_name)
 
     _lang: str
-    _root: ET.Element
-    _path_cache: Dict[str, str]
+    _index: Dict[str, Dict[str, str]]
+    _strings: Dict[str, str]
     NAME: XName
     EMBED: XEmbed
     MESSAGE: XMessage
 
-    def __init__(self, lang: str = 'en') -> None:
+    def __init__(self, lang: str = 'en', cache: bool = True) -> None:
         self._strings_path = res_path("strings.xml")
         if not os.path.isfile(self._strings_path):
             raise MissingResourceException(self._strings_path, "strings.xml")
-        self._root = ET.parse(self._strings_path).getroot()
+        self._index = load_string_index(self._strings_path, cache)
         self.NAME = XStrings.XName(self)
         self.EMBED = XStrings.XEmbed(self)
         self.MESSAGE = XStrings.XMessage(self)
@@ -595,15 +757,11 @@ class XStrings(object):
 
     def switch_lang(self, lang: str) -> None:
         self._lang = lang
-        self._path_cache = {}
+        self._strings = self._index.get(lang, {})
 
     def get(self, section_name, type_name, string_name) -> str:
-        path = '.'.join([section_name, type_name, string_name])
-        if path in self._path_cache:
-            return self._path_cache[path]
-        res = self._root.find(f'.//{section_name}/string[@lang="{self._lang}"][@type="{type_name}"][@name="{string_name}"]')
-        self._path_cache[path] = res.text if res is not None else path
-        return self._path_cache[path]
+        key = f'{section_name}.{type_name}.{string_name}'
+        return self._strings.get(key, key)
 
 
 STRINGS = XStrings()
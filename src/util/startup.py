@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from .metrics import METRICS
+
+log = logging.getLogger('overlord-startup')
+
+STARTUP_PHASE_SECONDS = METRICS.gauge('overlord_startup_phase_seconds', 'Time spent in startup phase', ('phase',))
+STARTUP_SECONDS = METRICS.gauge('overlord_startup_seconds', 'Time from process start to ready')
+
+
+class StartupProfiler(object):
+
+    started_at: float
+    phases: List[Tuple[str, float]]
+    finished: bool
+
+    _last: float
+
+    def __init__(self, started_at: Optional[float] = None) -> None:
+        self.begin(started_at if started_at is not None else time.perf_counter())
+
+    def begin(self, started_at: float) -> None:
+        self.started_at = started_at
+        self.phases = []
+        self.finished = False
+        self._last = started_at
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def record(self, name: str, started_at: float) -> None:
+        if self.finished:
+            return
+        self._last = time.perf_counter()
+        elapsed = self._last - started_at
+        self.phases.append((name, elapsed))
+        STARTUP_PHASE_SECONDS.labels(name).set(elapsed)
+
+    def mark(self, name: str) -> None:
+        # Phase lasting since the previous one ended
+        self.record(name, self._last)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started_at)
+
+    def report(self) -> str:
+        lines = [f'{name:<12} {elapsed * 1000:>9.1f} ms' for name, elapsed in self.phases]
+        lines.append(f'{"total":<12} {self.elapsed * 1000:>9.1f} ms')
+        return '\n'.join(lines)
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        STARTUP_SECONDS.set(self.elapsed)
+        log.info(f'Started in {self.elapsed:.2f} s\n{self.report()}')
+        self.finished = True
+
+
+# Process wide profiler, main module rebases it to its first line
+STARTUP = StartupProfiler()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MIT License
+
+Copyright (c) 2020-present Daniel [Mathtin] Shiko <wdaniil@mail.ru>
+Project: Overlord discord bot
+Contributors: Danila [DeadBlasoul] Popov <dead.blasoul@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+__author__ = "Mathtin"
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from .metrics import METRICS, METERED_LOCKS
+
+log = logging.getLogger('overlord-watchdog')
+
+STACK_LIMIT = 20
+
+REPORT_STALL = 'Event loop stall'
+REPORT_LOCK_HOLD = 'Lock held too long'
+
+LOOP_STALLS = METRICS.counter('overlord_loop_stalls_total', 'Event loop stalls above watchdog threshold')
+LOOP_LAG_SECONDS = METRICS.histogram('overlord_loop_lag_seconds', 'Event loop scheduling lag')
+LOCK_HOLD_ALERTS = METRICS.counter('overlord_lock_hold_alerts_total', 'Locks held above watchdog threshold',
+                                   ('lock',))
+
+# report kind, details, stack lines
+Reporter = Callable[[str, str, List[str]], Awaitable[None]]
+
+
+def _task_name(task: Optional[asyncio.Task]) -> str:
+    if task is None:
+        return 'no task (callback)'
+    coro = task.get_coro()
+    return f'{task.get_name()} ({getattr(coro, "__qualname__", coro)})'
+
+
+def _task_stack(task: asyncio.Task) -> List[str]:
+    frames = task.get_stack(limit=STACK_LIMIT)
+    summary = traceback.StackSummary.extract((f, f.f_lineno) for f in frames)
+    return summary.format()
+
+
+class LoopWatchdog(object):
+
+    stall_threshold: float
+    lock_hold_threshold: float
+    report_interval: float
+    reporter: Optional[Reporter]
+
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _loop_thread_id: int
+    _last_beat: float
+    _stall: Optional[Tuple[str, List[str]]]
+    _stall_guard: threading.Lock
+    _reported_locks: Set[Tuple[int, float]]
+    _last_report: float
+    _suppressed: int
+    _heartbeat: Optional[asyncio.Future]
+    _monitor: Optional[threading.Thread]
+    _stop: threading.Event
+
+    def __init__(self, stall_ms: int, lock_hold_ms: int, report_interval: int,
+                 reporter: Optional[Reporter] = None) -> None:
+        self.stall_threshold = stall_ms / 1000
+        self.lock_hold_threshold = lock_hold_ms / 1000
+        self.report_interval = report_interval
+        self.reporter = reporter
+        self._loop = None
+        self._loop_thread_id = 0
+        self._last_beat = 0.0
+        self._stall = None
+        self._stall_guard = threading.Lock()
+        self._reported_locks = set()
+        self._last_report = -float('inf')
+        self._suppressed = 0
+        self._heartbeat = None
+        self._monitor = None
+        self._stop = threading.Event()
+
+    @property
+    def interval(self) -> float:
+        return self.stall_threshold / 2
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._heartbeat = asyncio.ensure_future(self._beat())
+        self._monitor = threading.Thread(target=self._watch, name='overlord-watchdog', daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    ###############
+    # Loop thread #
+    ###############
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._last_beat = now
+            lag = now - expected
+            LOOP_LAG_SECONDS.observe(max(lag, 0.0))
+            if lag >= self.stall_threshold:
+                with self._stall_guard:
+                    stall, self._stall = self._stall, None
+                self._on_stall(lag, stall)
+            self._check_locks(now)
+
+    def _on_stall(self, lag: float, stall: Optional[Tuple[str, List[str]]]) -> None:
+        LOOP_STALLS.inc()
+        task, stack = stall if stall is not None else ('unknown (stall ended before sampling)', [])
+        details = f'Event loop blocked for {lag * 1000:.0f} ms\nTask: {task}'
+        self._report(REPORT_STALL, details, stack)
+
+    def _check_locks(self, now: float) -> None:
+        held = set()
+        for lock in list(METERED_LOCKS):
+            if not lock.locked() or now - lock.acquired_at < self.lock_hold_threshold:
+                continue
+            key = (id(lock), lock.acquired_at)
+            held.add(key)
+            if key in self._reported_locks:
+                continue
+            LOCK_HOLD_ALERTS.labels(lock.name).inc()
+            stack = _task_stack(lock.holder) if lock.holder is not None else []
+            details = f'Lock {lock.name} held for {now - lock.acquired_at:.1f} s, ' \
+                      f'{lock.waiters} waiting\nHolder: {_task_name(lock.holder)}'
+            self._report(REPORT_LOCK_HOLD, details, stack)
+        # Each acquisition is reported once
+        self._reported_locks = held
+
+    def _report(self, title: str, details: str, stack: List[str]) -> None:
+        log.warning(f'{title}: {details}\n{"".join(stack)}')
+        if self.reporter is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_report < self.report_interval:
+            self._suppressed += 1
+            return
+        if self._suppressed:
+            details += f'\n{self._suppressed} more reports suppressed'
+        self._last_report = now
+        self._suppressed = 0
+        asyncio.ensure_future(self._send(title, details, stack))
+
+    async def _send(self, title: str, details: str, stack: List[str]) -> None:
+        try:
+            await self.reporter(title, details, stack)
+        except Exception:
+            log.exception('Failed to send watchdog report')
+
+    ##################
+    # Monitor thread #
+    ##################
+
+    def _watch(self) -> None:
+        sampled_beat = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            if time.perf_counter() - last_beat < self.stall_threshold or sampled_beat == last_beat:
+                continue
+            # Loop is stuck right now, its thread stack shows the blocking call
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=STACK_LIMIT)
+            stack.reverse()
+            task = asyncio.current_task(self._loop) if self._loop is not None else None
+            with self._stall_guard:
+                self._stall = (_task_name(task), stack.format())
+            sampled_beat = last_beat